@@ -0,0 +1,50 @@
+"""composite indexes for the hot list queries
+
+Revision ID: 20261018_000002
+Revises: 20260206_000001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261018_000002"
+down_revision = "20260206_000001"
+branch_labels = None
+depends_on = None
+
+# name, table, columns, partial on "archived_at IS NULL"
+INDEXES = [
+    ("ix_ticket_org_active_created", "ticket", ["organization_id", "created_at"], True),
+    ("ix_claim_org_active_created", "claim", ["organization_id", "created_at"], True),
+    ("ix_notification_org_user_read_created", "notification", ["organization_id", "user_id", "is_read", "created_at"], False),
+    ("ix_activity_org_deal_created", "activity", ["organization_id", "deal_id", "created_at"], False),
+    ("ix_deliverable_deal_due", "deliverable", ["deal_id", "due_date"], False),
+]
+
+def _existing(table):
+    insp = sa.inspect(op.get_bind())
+    if not insp.has_table(table):
+        return None
+    return {ix["name"] for ix in insp.get_indexes(table)}
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    for name, table, columns, partial in INDEXES:
+        existing = _existing(table)
+        # tables may still be created by create_all (SPONSOR_OPS_ENABLE_CREATE_ALL), which
+        # already adds these indexes from the model definitions
+        if existing is None or name in existing:
+            continue
+        if partial and dialect in ("sqlite", "postgresql"):
+            where = sa.text("archived_at IS NULL")
+            op.create_index(name, table, columns, sqlite_where=where, postgresql_where=where)
+        elif partial:
+            op.create_index(name, table, [columns[0], "archived_at", *columns[1:]])
+        else:
+            op.create_index(name, table, columns)
+
+def downgrade():
+    for name, table, _, _ in reversed(INDEXES):
+        existing = _existing(table)
+        if existing and name in existing:
+            op.drop_index(name, table_name=table)
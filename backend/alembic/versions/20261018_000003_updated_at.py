@@ -0,0 +1,46 @@
+"""updated_at change markers for the deal portal tables
+
+Revision ID: 20261018_000003
+Revises: 20261018_000002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261018_000003"
+down_revision = "20261018_000002"
+branch_labels = None
+depends_on = None
+
+# table -> column used to backfill existing rows (None: migration time)
+TABLES = {
+    "deal": None,
+    "deliverable": None,
+    "proof": "created_at",
+    "deliverablecomment": "created_at",
+    "ticket": "created_at",
+    "ticketmessage": "created_at",
+    "claim": "created_at",
+}
+
+def upgrade():
+    insp = sa.inspect(op.get_bind())
+    for table, source in TABLES.items():
+        if not insp.has_table(table):
+            continue
+        if "updated_at" not in {c["name"] for c in insp.get_columns(table)}:
+            op.add_column(table, sa.Column("updated_at", sa.DateTime(), nullable=True))
+            op.execute(f"UPDATE {table} SET updated_at = {'COALESCE(' + source + ', CURRENT_TIMESTAMP)' if source else 'CURRENT_TIMESTAMP'}")
+        if f"ix_{table}_updated_at" not in {ix["name"] for ix in insp.get_indexes(table)}:
+            op.create_index(f"ix_{table}_updated_at", table, ["updated_at"])
+
+def downgrade():
+    insp = sa.inspect(op.get_bind())
+    for table in TABLES:
+        if not insp.has_table(table):
+            continue
+        if f"ix_{table}_updated_at" in {ix["name"] for ix in insp.get_indexes(table)}:
+            op.drop_index(f"ix_{table}_updated_at", table_name=table)
+        if "updated_at" in {c["name"] for c in insp.get_columns(table)}:
+            with op.batch_alter_table(table) as batch:
+                batch.drop_column("updated_at")
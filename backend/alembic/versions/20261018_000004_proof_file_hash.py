@@ -0,0 +1,37 @@
+"""size and sha256 of uploaded proof files
+
+Revision ID: 20261018_000004
+Revises: 20261018_000003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261018_000004"
+down_revision = "20261018_000003"
+branch_labels = None
+depends_on = None
+
+COLUMNS = {
+    "size_bytes": sa.Integer(),
+    "sha256": sa.String(),
+}
+
+def upgrade():
+    insp = sa.inspect(op.get_bind())
+    if not insp.has_table("proof"):
+        return
+    existing = {c["name"] for c in insp.get_columns("proof")}
+    for name, type_ in COLUMNS.items():
+        if name not in existing:
+            op.add_column("proof", sa.Column(name, type_, nullable=True))
+
+def downgrade():
+    insp = sa.inspect(op.get_bind())
+    if not insp.has_table("proof"):
+        return
+    existing = {c["name"] for c in insp.get_columns("proof")}
+    with op.batch_alter_table("proof") as batch:
+        for name in COLUMNS:
+            if name in existing:
+                batch.drop_column(name)
@@ -0,0 +1,30 @@
+"""content-addressed proof blob store
+
+Revision ID: 20261018_000005
+Revises: 20261018_000004
+Create Date: 2026-10-18
+
+Existing files are moved into the store by ``python -m app.blobstore backfill``.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261018_000005"
+down_revision = "20261018_000004"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table("proofblob"):
+        return
+    op.create_table(
+        "proofblob",
+        sa.Column("sha256", sa.String(), primary_key=True),
+        sa.Column("size_bytes", sa.Integer(), nullable=False),
+        sa.Column("refcount", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+
+def downgrade():
+    if sa.inspect(op.get_bind()).has_table("proofblob"):
+        op.drop_table("proofblob")
@@ -0,0 +1,37 @@
+"""resumable upload sessions
+
+Revision ID: 20261018_000006
+Revises: 20261018_000005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261018_000006"
+down_revision = "20261018_000005"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table("uploadsession"):
+        return
+    op.create_table(
+        "uploadsession",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("deliverable_id", sa.Integer(), sa.ForeignKey("deliverable.id"), nullable=False),
+        sa.Column("source", sa.String(), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("user.id"), nullable=True),
+        sa.Column("file_name", sa.String(), nullable=False),
+        sa.Column("mime_type", sa.String(), nullable=False),
+        sa.Column("note", sa.String(), nullable=True),
+        sa.Column("size_bytes", sa.Integer(), nullable=False),
+        sa.Column("received_bytes", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_uploadsession_deliverable_id", "uploadsession", ["deliverable_id"])
+    op.create_index("ix_uploadsession_expires_at", "uploadsession", ["expires_at"])
+
+def downgrade():
+    if sa.inspect(op.get_bind()).has_table("uploadsession"):
+        op.drop_table("uploadsession")
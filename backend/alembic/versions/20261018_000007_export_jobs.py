@@ -0,0 +1,39 @@
+"""background org export jobs
+
+Revision ID: 20261018_000007
+Revises: 20261018_000006
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261018_000007"
+down_revision = "20261018_000006"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table("exportjob"):
+        return
+    op.create_table(
+        "exportjob",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("organization_id", sa.Integer(), nullable=False),
+        sa.Column("requested_by", sa.Integer(), sa.ForeignKey("user.id"), nullable=True),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("progress_done", sa.Integer(), nullable=False),
+        sa.Column("progress_total", sa.Integer(), nullable=False),
+        sa.Column("artifact_key", sa.String(), nullable=True),
+        sa.Column("size_bytes", sa.BigInteger(), nullable=True),
+        sa.Column("files_reused", sa.Integer(), nullable=False),
+        sa.Column("error", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_exportjob_organization_id", "exportjob", ["organization_id"])
+
+def downgrade():
+    if sa.inspect(op.get_bind()).has_table("exportjob"):
+        op.drop_table("exportjob")
@@ -0,0 +1,44 @@
+"""updated_at change markers for the remaining export tables
+
+Revision ID: 20261018_000008
+Revises: 20261018_000007
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261018_000008"
+down_revision = "20261018_000007"
+branch_labels = None
+depends_on = None
+
+# table -> column used to backfill existing rows (None: migration time)
+TABLES = {
+    "organization": "created_at",
+    "organizationmember": "created_at",
+    "user": None,
+    "sponsor": None,
+}
+
+def upgrade():
+    insp = sa.inspect(op.get_bind())
+    for table, source in TABLES.items():
+        if not insp.has_table(table):
+            continue
+        if "updated_at" not in {c["name"] for c in insp.get_columns(table)}:
+            op.add_column(table, sa.Column("updated_at", sa.DateTime(), nullable=True))
+            # quoted: "user" is a reserved word on Postgres
+            op.execute(f"UPDATE \"{table}\" SET updated_at = {'COALESCE(' + source + ', CURRENT_TIMESTAMP)' if source else 'CURRENT_TIMESTAMP'}")
+        if f"ix_{table}_updated_at" not in {ix["name"] for ix in insp.get_indexes(table)}:
+            op.create_index(f"ix_{table}_updated_at", table, ["updated_at"])
+
+def downgrade():
+    insp = sa.inspect(op.get_bind())
+    for table in TABLES:
+        if not insp.has_table(table):
+            continue
+        if f"ix_{table}_updated_at" in {ix["name"] for ix in insp.get_indexes(table)}:
+            op.drop_index(f"ix_{table}_updated_at", table_name=table)
+        if "updated_at" in {c["name"] for c in insp.get_columns(table)}:
+            with op.batch_alter_table(table) as batch:
+                batch.drop_column("updated_at")
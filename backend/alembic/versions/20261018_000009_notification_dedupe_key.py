@@ -0,0 +1,56 @@
+"""notification dedupe key
+
+Revision ID: 20261018_000009
+Revises: 20261018_000008
+Create Date: 2026-10-18
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261018_000009"
+down_revision = "20261018_000008"
+branch_labels = None
+depends_on = None
+
+INDEX = "ix_notification_org_user_dedupe"
+# bodies written by sync_notifications_for_org before the key existed
+_BODY = re.compile(r"Deliverable #(\d+) (?:overdue \(due|due) (\d{4}-\d{2}-\d{2})")
+
+def upgrade():
+    insp = sa.inspect(op.get_bind())
+    if not insp.has_table("notification"):
+        return
+    if "dedupe_key" not in {c["name"] for c in insp.get_columns("notification")}:
+        op.add_column("notification", sa.Column("dedupe_key", sa.String(), nullable=True))
+        _backfill()
+    if INDEX not in {ix["name"] for ix in insp.get_indexes("notification")}:
+        op.create_index(INDEX, "notification", ["organization_id", "user_id", "dedupe_key"], unique=True)
+
+def _backfill():
+    """Key existing sync notifications so the next sync does not repeat them (newest wins)."""
+    bind = op.get_bind()
+    rows = bind.execute(sa.text(
+        "SELECT id, organization_id, user_id, kind, body FROM notification "
+        "WHERE kind IN ('overdue', 'due_soon') ORDER BY id DESC")).all()
+    seen = set()
+    for id_, org_id, user_id, kind, body in rows:
+        m = _BODY.match(body or "")
+        if not m:
+            continue
+        key = f"{kind}:{m.group(1)}:{m.group(2)}"
+        if (org_id, user_id, key) in seen:
+            continue
+        seen.add((org_id, user_id, key))
+        bind.execute(sa.text("UPDATE notification SET dedupe_key = :key WHERE id = :id"), {"key": key, "id": id_})
+
+def downgrade():
+    insp = sa.inspect(op.get_bind())
+    if not insp.has_table("notification"):
+        return
+    if INDEX in {ix["name"] for ix in insp.get_indexes("notification")}:
+        op.drop_index(INDEX, table_name="notification")
+    if "dedupe_key" in {c["name"] for c in insp.get_columns("notification")}:
+        with op.batch_alter_table("notification") as batch:
+            batch.drop_column("dedupe_key")
@@ -0,0 +1,28 @@
+"""scheduler leader leases
+
+Revision ID: 20261018_000010
+Revises: 20261018_000009
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261018_000010"
+down_revision = "20261018_000009"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table("schedulerlease"):
+        return
+    op.create_table(
+        "schedulerlease",
+        sa.Column("name", sa.String(), primary_key=True),
+        sa.Column("holder", sa.String(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.Column("last_run_at", sa.DateTime(), nullable=True),
+    )
+
+def downgrade():
+    if sa.inspect(op.get_bind()).has_table("schedulerlease"):
+        op.drop_table("schedulerlease")
@@ -0,0 +1,34 @@
+"""idempotent completion of resumable uploads
+
+Revision ID: 20261018_000011
+Revises: 20261018_000010
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261018_000011"
+down_revision = "20261018_000010"
+branch_labels = None
+depends_on = None
+
+COLUMNS = {"completed_at": sa.DateTime(), "proof_id": sa.Integer()}
+
+def upgrade():
+    insp = sa.inspect(op.get_bind())
+    if not insp.has_table("uploadsession"):
+        return
+    existing = {c["name"] for c in insp.get_columns("uploadsession")}
+    for name, type_ in COLUMNS.items():
+        if name not in existing:
+            op.add_column("uploadsession", sa.Column(name, type_, nullable=True))
+
+def downgrade():
+    insp = sa.inspect(op.get_bind())
+    if not insp.has_table("uploadsession"):
+        return
+    existing = {c["name"] for c in insp.get_columns("uploadsession")}
+    with op.batch_alter_table("uploadsession") as batch:
+        for name in COLUMNS:
+            if name in existing:
+                batch.drop_column(name)
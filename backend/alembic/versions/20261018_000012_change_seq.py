@@ -0,0 +1,47 @@
+"""commit-ordered change sequence for the deal portal delta feed
+
+Revision ID: 20261018_000012
+Revises: 20261018_000011
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261018_000012"
+down_revision = "20261018_000011"
+branch_labels = None
+depends_on = None
+
+TABLES = ["deal", "brandkit", "deliverable", "proof", "deliverablecomment", "ticket", "ticketmessage", "claim"]
+
+def upgrade():
+    bind = op.get_bind()
+    insp = sa.inspect(bind)
+    if not insp.has_table("changecounter"):
+        op.create_table(
+            "changecounter",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("value", sa.BigInteger(), nullable=False),
+        )
+    if bind.execute(sa.text("SELECT COUNT(*) FROM changecounter")).scalar() == 0:
+        bind.execute(sa.text("INSERT INTO changecounter (id, value) VALUES (1, 0)"))
+    for table in TABLES:
+        if not insp.has_table(table):
+            continue
+        if "change_seq" not in {c["name"] for c in insp.get_columns(table)}:
+            op.add_column(table, sa.Column("change_seq", sa.BigInteger(), nullable=False, server_default="0"))
+        if f"ix_{table}_change_seq" not in {i["name"] for i in insp.get_indexes(table)}:
+            op.create_index(f"ix_{table}_change_seq", table, ["change_seq"])
+
+def downgrade():
+    insp = sa.inspect(op.get_bind())
+    for table in TABLES:
+        if not insp.has_table(table):
+            continue
+        if f"ix_{table}_change_seq" in {i["name"] for i in insp.get_indexes(table)}:
+            op.drop_index(f"ix_{table}_change_seq", table_name=table)
+        if "change_seq" in {c["name"] for c in insp.get_columns(table)}:
+            with op.batch_alter_table(table) as batch:
+                batch.drop_column("change_seq")
+    if insp.has_table("changecounter"):
+        op.drop_table("changecounter")
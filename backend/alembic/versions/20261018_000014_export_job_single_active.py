@@ -0,0 +1,47 @@
+"""one active export job per org, retried attempts instead of artifact reuse
+
+Revision ID: 20261018_000014
+Revises: 20261018_000013
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261018_000014"
+down_revision = "20261018_000013"
+branch_labels = None
+depends_on = None
+
+INDEX = "ux_exportjob_org_active"
+ACTIVE = "status IN ('queued', 'running')"
+
+def upgrade():
+    insp = sa.inspect(op.get_bind())
+    if not insp.has_table("exportjob"):
+        return
+    columns = {c["name"] for c in insp.get_columns("exportjob")}
+    if "attempts" not in columns:
+        op.add_column("exportjob", sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"))
+    if "files_reused" in columns:
+        with op.batch_alter_table("exportjob") as batch:
+            batch.drop_column("files_reused")
+    if INDEX not in {ix["name"] for ix in insp.get_indexes("exportjob")}:
+        # duplicates created by racing requests: keep the newest active job per org
+        op.execute(f"UPDATE exportjob SET status = 'failed', error = 'duplicate', finished_at = CURRENT_TIMESTAMP "
+                   f"WHERE {ACTIVE} AND id NOT IN "
+                   f"(SELECT MAX(id) FROM exportjob WHERE {ACTIVE} GROUP BY organization_id)")
+        op.create_index(INDEX, "exportjob", ["organization_id"], unique=True,
+                        sqlite_where=sa.text(ACTIVE), postgresql_where=sa.text(ACTIVE))
+
+def downgrade():
+    insp = sa.inspect(op.get_bind())
+    if not insp.has_table("exportjob"):
+        return
+    if INDEX in {ix["name"] for ix in insp.get_indexes("exportjob")}:
+        op.drop_index(INDEX, table_name="exportjob")
+    columns = {c["name"] for c in insp.get_columns("exportjob")}
+    with op.batch_alter_table("exportjob") as batch:
+        if "attempts" in columns:
+            batch.drop_column("attempts")
+        if "files_reused" not in columns:
+            batch.add_column(sa.Column("files_reused", sa.Integer(), nullable=False, server_default="0"))
@@ -0,0 +1,122 @@
+"""
+Authorization context for the request dependencies in ``deps``.
+
+User and membership lookups are memoized at two levels:
+  - per request, on ``session.info`` (FastAPI hands every dependency of one request
+    the same session), so ``get_current_org_id`` and the handler's own
+    ``require_org_role`` call share a single membership lookup;
+  - per process, in a bounded TTL cache shared by all requests.
+
+Configure via:
+  - SPONSOR_OPS_AUTHZ_CACHE_TTL_SEC (default: "30"; "0" disables the process cache)
+  - SPONSOR_OPS_AUTHZ_CACHE_MAX_ENTRIES (default: "10000")
+
+The process cache is invalidated from the commit hook whenever a User or
+OrganizationMember row changes in this process. Other workers pick the change up
+once their entry expires, so cross-worker staleness is bounded by the TTL.
+"""
+from __future__ import annotations
+
+import os
+from typing import Any, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, select
+
+from .cache import TTLCache
+from .db import on_commit
+from .models import User, OrganizationMember
+
+CACHE_TTL_SEC = float(os.environ.get("SPONSOR_OPS_AUTHZ_CACHE_TTL_SEC", "30"))
+CACHE_MAX_ENTRIES = int(os.environ.get("SPONSOR_OPS_AUTHZ_CACHE_MAX_ENTRIES", "10000"))
+
+_users = TTLCache(CACHE_MAX_ENTRIES, CACHE_TTL_SEC)          # user_id -> row
+_memberships = TTLCache(CACHE_MAX_ENTRIES, CACHE_TTL_SEC)    # (org_id, user_id) -> row
+_default_orgs = TTLCache(CACHE_MAX_ENTRIES, CACHE_TTL_SEC)   # user_id -> org_id
+
+_REQUEST_KEY = "sponsor_ops_authz"
+_MISSING = object()
+
+def _request_memo(session: Session) -> dict:
+    return session.info.setdefault(_REQUEST_KEY, {})
+
+def _row(obj) -> dict[str, Any]:
+    return obj.model_dump()
+
+def load_user(session: Session, user_id: int) -> Optional[User]:
+    memo = _request_memo(session)
+    key = ("user", user_id)
+    hit = memo.get(key, _MISSING)
+    if hit is not _MISSING:
+        return hit
+    row = _users.get(user_id)
+    if row is None:
+        u = session.exec(select(User).where(User.id == user_id)).first()
+        row = _row(u) if u else None
+        if row is not None:
+            _users.set(user_id, row)
+    # Detached copy: callers only read attributes, and a commit in the handler
+    # must not expire it (which would cost another SELECT on next access).
+    user = User(**row) if row is not None else None
+    memo[key] = user
+    return user
+
+def load_membership(session: Session, org_id: int, user_id: int) -> Optional[OrganizationMember]:
+    memo = _request_memo(session)
+    key = ("member", org_id, user_id)
+    hit = memo.get(key, _MISSING)
+    if hit is not _MISSING:
+        return hit
+    row = _memberships.get((org_id, user_id))
+    if row is None:
+        m = session.exec(select(OrganizationMember).where(OrganizationMember.organization_id == org_id, OrganizationMember.user_id == user_id)).first()
+        row = _row(m) if m else None
+        if row is not None:
+            _memberships.set((org_id, user_id), row)
+    member = OrganizationMember(**row) if row is not None else None
+    memo[key] = member
+    return member
+
+def remember_membership(session: Session, member: OrganizationMember) -> None:
+    """Record a membership created during this request (e.g. superadmin auto-join)."""
+    row = _row(member)
+    _memberships.set((member.organization_id, member.user_id), row)
+    _request_memo(session)[("member", member.organization_id, member.user_id)] = OrganizationMember(**row)
+
+def load_default_org_id(session: Session, user_id: int) -> Optional[int]:
+    memo = _request_memo(session)
+    key = ("default_org", user_id)
+    hit = memo.get(key, _MISSING)
+    if hit is not _MISSING:
+        return hit
+    org_id = _default_orgs.get(user_id)
+    if org_id is None:
+        m = session.exec(select(OrganizationMember).where(OrganizationMember.user_id == user_id).order_by(OrganizationMember.organization_id.asc())).first()
+        org_id = m.organization_id if m else None
+        if org_id is not None:
+            _default_orgs.set(user_id, org_id)
+    memo[key] = org_id
+    return org_id
+
+def clear_cache() -> None:
+    _users.clear(); _memberships.clear(); _default_orgs.clear()
+
+@event.listens_for(OrmSession, "after_flush")
+def _forget_request_memo(session, flush_context) -> None:
+    memo = session.info.get(_REQUEST_KEY)
+    if not memo:
+        return
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (User, OrganizationMember)):
+            memo.clear()
+            return
+
+@on_commit
+def _invalidate(changes) -> None:
+    for cls, row in changes:
+        if cls is User:
+            _users.pop(row.get("id"))
+        elif cls is OrganizationMember:
+            _memberships.pop((row.get("organization_id"), row.get("user_id")))
+            _default_orgs.pop(row.get("user_id"))
@@ -0,0 +1,283 @@
+"""
+Content-addressed store for proof files.
+
+Files live at ``blobs/<h[0:2]>/<h[2:4]>/<sha256>`` in the configured storage
+backend (app.storage) and ``Proof.file_path`` is that key, so a creative uploaded to
+several deliverables is stored (and backed up) once; an upload whose hash is already
+stored just drops its temp file. ``ProofBlob`` rows count the proofs referencing each
+blob. Mapper events on ``Proof`` adjust the count inside the flushing transaction, so
+every write path stays consistent.
+
+Blob files are written before the referencing row commits, so a failed upload can
+leave a file without a row, or a row at refcount 0. ``collect_garbage`` removes both
+once the file has been untouched for the grace period; reusing a blob touches its
+file, which keeps the collector away from blobs that are about to be referenced.
+The collector claims a blob (refcount -1) before it re-checks the file's mtime and
+deletes it; a reuse touches the file first and then waits out any claim, storing
+its own copy if the collector won. Either the collector sees the touch or the reuse
+sees the claim, so a new Proof never points at a deleted file.
+
+Usage:
+  python -m app.blobstore backfill   # move legacy UPLOAD_ROOT/<deliverable_id>/ files in
+  python -m app.blobstore gc
+
+Configure via:
+  - SPONSOR_OPS_UPLOAD_ROOT (default: "uploads"; legacy files and upload scratch)
+  - SPONSOR_OPS_BLOB_GC_GRACE_SEC (default: "3600")
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Callable, Optional
+
+from sqlalchemy import event, inspect as sa_inspect, text
+from sqlmodel import Session, select
+
+from .db import engine
+from .models import Proof, ProofBlob
+from .storage import UPLOAD_ROOT, LocalStorage, get_storage
+
+BLOB_DIR = UPLOAD_ROOT / "blobs"
+GC_GRACE_SEC = float(os.environ.get("SPONSOR_OPS_BLOB_GC_GRACE_SEC", "3600"))
+
+_TMP_DIR = BLOB_DIR / ".tmp"
+_PREFIX = "blobs/"
+_CLAIM_WAIT_SEC = 5.0  # a collector holds a claim for one stat and one delete
+
+def rel_path(sha256: str) -> str:
+    return f"{_PREFIX}{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+def sha_of(file_path: Optional[str]) -> Optional[str]:
+    if file_path and file_path.startswith(_PREFIX):
+        return file_path.rsplit("/", 1)[-1]
+    return None
+
+def resolve(file_path: str) -> Optional[Path]:
+    """Absolute path of a legacy (pre-blob-store) proof file under UPLOAD_ROOT, or None."""
+    return LocalStorage(UPLOAD_ROOT).local_path(file_path)
+
+# --- writing -----------------------------------------------------------------
+
+def open_temp() -> tuple[BinaryIO, Path]:
+    _TMP_DIR.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=_TMP_DIR, prefix="upload-", suffix=".part")
+    return os.fdopen(fd, "wb"), Path(tmp)
+
+def discard(f: BinaryIO, tmp: Path) -> None:
+    f.close()
+    tmp.unlink(missing_ok=True)
+
+def place(f: BinaryIO, tmp: Path, sha256: str) -> tuple[str, bool]:
+    """Move a fully written temp file into the store. Returns (file_path, deduplicated)."""
+    f.flush()
+    if not get_storage().exists(rel_path(sha256)):
+        os.fsync(f.fileno())  # duplicates are dropped, only new blobs need the sync
+    f.close()
+    return place_file(tmp, sha256)
+
+def place_file(src: Path, sha256: str) -> tuple[str, bool]:
+    """Move a complete, synced scratch file into the store."""
+    rel = rel_path(sha256)
+    storage = get_storage()
+    if storage.exists(rel):
+        storage.touch(rel)
+        if _survives_collector(sha256):
+            src.unlink(missing_ok=True)
+            return rel, True
+    storage.put_file(rel, src)
+    return rel, False
+
+def _survives_collector(sha256: str) -> bool:
+    """Wait out a ``collect_garbage`` claim on a blob just touched; True if it is still stored."""
+    deadline = time.monotonic() + _CLAIM_WAIT_SEC
+    with engine.connect() as conn:
+        while (conn.execute(select(ProofBlob.refcount).where(ProofBlob.sha256 == sha256)).scalar() or 0) < 0:
+            if time.monotonic() > deadline:
+                return False  # a collector that died holding the claim: store our own copy
+            conn.rollback()  # end the read so the next poll sees the collector's commit
+            time.sleep(0.02)
+    return get_storage().exists(rel_path(sha256))
+
+def hash_file(path: Path, chunk_size: int = 1024 * 1024) -> tuple[int, str]:
+    """Returns (size, sha256) of a file, read in chunks."""
+    digest = hashlib.sha256()
+    size = 0
+    with path.open("rb") as fh:
+        while chunk := fh.read(chunk_size):
+            digest.update(chunk)
+            size += len(chunk)
+    return size, digest.hexdigest()
+
+def ingest_file(src: Path, chunk_size: int = 1024 * 1024) -> tuple[str, int, str]:
+    """Copy an existing file into the store. Returns (file_path, size, sha256)."""
+    digest = hashlib.sha256()
+    size = 0
+    f, tmp = open_temp()
+    try:
+        with src.open("rb") as fh:
+            while chunk := fh.read(chunk_size):
+                digest.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+        rel, _ = place(f, tmp, digest.hexdigest())
+    except BaseException:
+        discard(f, tmp)
+        raise
+    return rel, size, digest.hexdigest()
+
+# --- reference counting --------------------------------------------------------
+
+_ACQUIRE = text(
+    "INSERT INTO proofblob (sha256, size_bytes, refcount, created_at) VALUES (:sha, :size, 1, :now) "
+    "ON CONFLICT (sha256) DO UPDATE SET refcount = "
+    "CASE WHEN proofblob.refcount < 0 THEN 1 ELSE proofblob.refcount + 1 END"
+)
+_RELEASE = text("UPDATE proofblob SET refcount = refcount - 1 WHERE sha256 = :sha AND refcount > 0")
+
+def _acquire(connection, sha: str, size: Optional[int]) -> None:
+    connection.execute(_ACQUIRE, {"sha": sha, "size": size or 0, "now": datetime.utcnow()})
+
+def _release(connection, sha: str) -> None:
+    connection.execute(_RELEASE, {"sha": sha})
+
+@event.listens_for(Proof, "after_insert")
+def _proof_inserted(mapper, connection, target) -> None:
+    sha = sha_of(target.file_path)
+    if sha:
+        _acquire(connection, sha, target.size_bytes)
+
+@event.listens_for(Proof, "after_update")
+def _proof_updated(mapper, connection, target) -> None:
+    history = sa_inspect(target).attrs.file_path.history
+    if not history.has_changes():
+        return
+    for old in history.deleted:
+        if sha := sha_of(old):
+            _release(connection, sha)
+    if sha := sha_of(target.file_path):
+        _acquire(connection, sha, target.size_bytes)
+
+@event.listens_for(Proof, "after_delete")
+def _proof_deleted(mapper, connection, target) -> None:
+    sha = sha_of(target.file_path)
+    if sha:
+        _release(connection, sha)
+
+# --- maintenance ---------------------------------------------------------------
+
+_collect_hooks: list[Callable[[str], None]] = []
+
+def on_collect(fn: Callable[[str], None]) -> Callable[[str], None]:
+    """Register ``fn(sha256)`` to run for every blob removed by ``collect_garbage``
+    (to drop files derived from it). Usable as a decorator."""
+    _collect_hooks.append(fn)
+    return fn
+
+# a claim is refcount -1; an unreferenced row, or a new row for a file without one
+_CLAIM_ROW = text("UPDATE proofblob SET refcount = -1 WHERE sha256 = :sha AND refcount <= 0")
+_CLAIM_FILE = text("INSERT INTO proofblob (sha256, size_bytes, refcount, created_at) VALUES (:sha, 0, -1, :now) "
+                   "ON CONFLICT (sha256) DO NOTHING")
+_UNCLAIM = text("UPDATE proofblob SET refcount = 0 WHERE sha256 = :sha AND refcount < 0")
+_DROP = text("DELETE FROM proofblob WHERE sha256 = :sha AND refcount < 0")
+
+def _collect(session: Session, sha: str, cutoff: float, has_row: bool) -> bool:
+    """Delete one blob under a claim. Returns True if its file was removed."""
+    storage = get_storage()
+    if not session.execute(_CLAIM_ROW if has_row else _CLAIM_FILE, {"sha": sha, "now": datetime.utcnow()}).rowcount:
+        session.rollback()  # referenced again, or another collector has it
+        return False
+    session.commit()
+    info = storage.stat(rel_path(sha))  # only now: a reuse touching it from here on waits for us
+    if info is not None and info.mtime > cutoff:
+        session.execute(_UNCLAIM, {"sha": sha}); session.commit()
+        return False
+    if info is not None:
+        storage.delete(rel_path(sha))
+    session.execute(_DROP, {"sha": sha}); session.commit()
+    if info is None:
+        return False
+    for fn in _collect_hooks:
+        fn(sha)
+    return True
+
+def collect_garbage(session: Session, grace_sec: float = GC_GRACE_SEC) -> int:
+    """Delete unreferenced blobs untouched for ``grace_sec``. Returns files removed."""
+    cutoff = time.time() - grace_sec
+    storage = get_storage()
+
+    removed = 0
+    for sha in session.exec(select(ProofBlob.sha256).where(ProofBlob.refcount <= 0)).all():
+        info = storage.stat(rel_path(sha))
+        if info is None or info.mtime <= cutoff:
+            removed += _collect(session, sha, cutoff, has_row=True)
+    known = set(session.exec(select(ProofBlob.sha256)).all())
+    for key, info in storage.list(_PREFIX):
+        sha = key.rsplit("/", 1)[-1]
+        if sha not in known and info.mtime <= cutoff:
+            removed += _collect(session, sha, cutoff, has_row=False)
+
+    scratch = 0
+    for path in _TMP_DIR.glob("*.part"):
+        try:
+            if path.stat().st_mtime <= cutoff:
+                path.unlink()
+                scratch += 1
+        except FileNotFoundError:
+            pass
+    return removed + scratch
+
+def backfill(session: Session, batch_size: int = 200) -> tuple[int, int]:
+    """Move legacy per-deliverable proof files into the store. Returns (moved, missing)."""
+    moved = missing = 0
+    last_id = 0
+    while True:
+        proofs = session.exec(
+            select(Proof)
+            .where(Proof.kind == "file", Proof.file_path.is_not(None),
+                   Proof.file_path.not_like(f"{_PREFIX}%"), Proof.id > last_id)
+            .order_by(Proof.id).limit(batch_size)
+        ).all()
+        if not proofs:
+            return moved, missing
+        sources = []
+        for p in proofs:
+            last_id = p.id
+            src = resolve(p.file_path)
+            if src is None:
+                missing += 1
+                continue
+            p.file_path, p.size_bytes, p.sha256 = ingest_file(src)
+            session.add(p)
+            sources.append(src)
+        session.commit()
+        # only drop the originals once the rows pointing at the blobs are durable
+        for src in sources:
+            src.unlink(missing_ok=True)
+            try:
+                src.parent.rmdir()
+            except OSError:
+                pass
+        moved += len(sources)
+
+def main() -> None:
+    from .db import init_db, engine
+
+    parser = argparse.ArgumentParser(prog="python -m app.blobstore")
+    parser.add_argument("command", choices=["backfill", "gc"])
+    args = parser.parse_args()
+    init_db()
+    with Session(engine) as session:
+        if args.command == "backfill":
+            moved, missing = backfill(session)
+            print(f"Moved {moved} proof files into the blob store ({missing} missing on disk)")
+        else:
+            print(f"Removed {collect_garbage(session)} unreferenced blob files")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Bulk import of sponsors, deals and deliverables, for onboarding a customer.
+
+Input is CSV (with a header row) or NDJSON, one record per row, read incrementally.
+Records are validated with the schemas of the single-create endpoints and name their
+parent by id or by name within the org:
+
+  sponsors:      name, contact_email
+  deals:         sponsor_id | sponsor, name, start_date, end_date, total_value,
+                 guarantee_cap_pct, cure_days
+  deliverables:  deal_id | deal (plus sponsor when deal names repeat), title, type,
+                 due_date, owner, assignee_user_id, sponsor_approval_required,
+                 guaranteed, value, brief
+
+Valid rows are written with one multi-row INSERT per SPONSOR_OPS_IMPORT_BATCH rows and
+committed per batch, so memory stays flat and a failure loses at most one batch (whose
+rows are then retried one by one to pin down the culprit). Rows that already exist
+(sponsor name; sponsor + deal name; deal + title + due date) are skipped, so an
+interrupted import can simply be re-run. A single Activity row records the import.
+The report counts every row and lists rejected ones with their line and reason.
+
+Usage:
+  python -m app.bulk_import <org_id> sponsors|deals|deliverables <file.csv|file.ndjson>
+
+Configure via:
+  - SPONSOR_OPS_IMPORT_BATCH (default: "1000")
+  - SPONSOR_OPS_IMPORT_MAX_ERRORS (default: "1000"; rejected rows listed in the report)
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Iterable, Iterator, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import Session, select
+
+from .db import record_changes, stamp_at_commit
+from .models import Deal, Deliverable, Organization, Sponsor
+from .schemas import DealCreate, DeliverableCreate, SponsorCreate
+from .services import log_activity
+
+BATCH = int(os.environ.get("SPONSOR_OPS_IMPORT_BATCH", "1000"))
+MAX_ERRORS = int(os.environ.get("SPONSOR_OPS_IMPORT_MAX_ERRORS", "1000"))
+
+KINDS = {"sponsors": Sponsor, "deals": Deal, "deliverables": Deliverable}
+FORMATS = ("csv", "ndjson")
+
+class RowError(ValueError):
+    pass
+
+def read_records(lines: Iterable[str], fmt: str) -> Iterator[tuple[int, Any]]:
+    """(line number, record) pairs; a record that cannot be parsed is a RowError."""
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            # empty cells mean "not given" so schema defaults apply
+            yield reader.line_num, {k.strip(): v.strip() for k, v in row.items()
+                                    if k and isinstance(v, str) and v.strip()}
+        return
+    for n, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield n, RowError(f"invalid JSON: {e}")
+            continue
+        yield n, record if isinstance(record, dict) else RowError("expected a JSON object")
+
+def _error_text(e: Exception) -> str:
+    if isinstance(e, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+    return str(e)
+
+class Importer:
+    def __init__(self, session: Session, organization_id: int, kind: str, batch_size: Optional[int] = None):
+        if kind not in KINDS:
+            raise ValueError(f"unknown import kind: {kind!r}")
+        self.session = session
+        self.org_id = organization_id
+        self.kind = kind
+        self.model = KINDS[kind]
+        self.batch_size = batch_size or BATCH
+        self.report = {"kind": kind, "rows": 0, "created": 0, "skipped": 0, "failed": 0, "errors": []}
+        self._batch: list[tuple[int, dict]] = []
+        self._load_keys()
+
+    # -- lookups of what the org already has (plus rows accepted in this import) --
+
+    def _load_keys(self) -> None:
+        s = self.session
+        sponsors = s.exec(select(Sponsor.id, Sponsor.name).where(Sponsor.organization_id == self.org_id)).all()
+        self.sponsor_by_name = {name: sid for sid, name in sponsors}
+        self.sponsor_ids = {sid for sid, _ in sponsors}
+        if self.kind == "sponsors":
+            return
+        deals = s.exec(select(Deal.id, Deal.sponsor_id, Deal.name).where(Deal.organization_id == self.org_id)).all()
+        self.deal_keys = {(sponsor_id, name) for _, sponsor_id, name in deals}
+        self.deal_ids = {deal_id for deal_id, _, _ in deals}
+        sponsor_names = {sid: name for name, sid in self.sponsor_by_name.items()}
+        self.deal_by_pair = {(sponsor_names.get(sponsor_id), name): deal_id for deal_id, sponsor_id, name in deals}
+        self.deals_by_name: dict[str, list[int]] = defaultdict(list)
+        for deal_id, _, name in deals:
+            self.deals_by_name[name].append(deal_id)
+        if self.kind == "deliverables":
+            self.deliverable_keys = set(s.exec(
+                select(Deliverable.deal_id, Deliverable.title, Deliverable.due_date)
+                .join(Deal, Deal.id == Deliverable.deal_id).where(Deal.organization_id == self.org_id)
+            ).all())
+
+    def _sponsor_id(self, record: dict) -> int:
+        if "sponsor_id" in record:
+            sid = int(record.pop("sponsor_id"))
+            if sid not in self.sponsor_ids:
+                raise RowError(f"sponsor_id {sid} not found")
+            return sid
+        name = record.pop("sponsor", None)
+        if name not in self.sponsor_by_name:
+            raise RowError(f"sponsor {name!r} not found" if name else "sponsor or sponsor_id is required")
+        return self.sponsor_by_name[name]
+
+    def _deal_id(self, record: dict) -> int:
+        if "deal_id" in record:
+            deal_id = int(record.pop("deal_id"))
+            if deal_id not in self.deal_ids:
+                raise RowError(f"deal_id {deal_id} not found")
+            return deal_id
+        name, sponsor = record.pop("deal", None), record.pop("sponsor", None)
+        if not name:
+            raise RowError("deal or deal_id is required")
+        if sponsor is not None:
+            if (sponsor, name) not in self.deal_by_pair:
+                raise RowError(f"deal {name!r} of sponsor {sponsor!r} not found")
+            return self.deal_by_pair[(sponsor, name)]
+        matches = self.deals_by_name.get(name, [])
+        if len(matches) != 1:
+            raise RowError(f"deal {name!r} not found" if not matches else f"deal {name!r} is ambiguous; add sponsor")
+        return matches[0]
+
+    # -- rows -----------------------------------------------------------------
+
+    def _prepare(self, record: dict) -> Optional[dict]:
+        """Insert values for a record, or None if it already exists."""
+        record = dict(record)
+        if self.kind == "sponsors":
+            p = SponsorCreate.model_validate({**record, "organization_id": self.org_id})
+            if p.name in self.sponsor_by_name:
+                return None
+            self.sponsor_by_name[p.name] = None
+            row = Sponsor(organization_id=self.org_id, name=p.name, contact_email=p.contact_email,
+                          portal_token_expires_at=datetime.utcnow() + timedelta(days=180))
+        elif self.kind == "deals":
+            p = DealCreate.model_validate({**record, "sponsor_id": self._sponsor_id(record)})
+            if (p.sponsor_id, p.name) in self.deal_keys:
+                return None
+            self.deal_keys.add((p.sponsor_id, p.name))
+            row = Deal(organization_id=self.org_id, sponsor_id=p.sponsor_id, name=p.name,
+                       start_date=p.start_date, end_date=p.end_date, total_value=p.total_value,
+                       guarantee_cap_pct=p.guarantee_cap_pct, cure_days=p.cure_days,
+                       portal_token_expires_at=datetime.combine(p.end_date, datetime.min.time()) + timedelta(days=30))
+        else:
+            p = DeliverableCreate.model_validate({**record, "deal_id": self._deal_id(record)})
+            key = (p.deal_id, p.title, p.due_date)
+            if key in self.deliverable_keys:
+                return None
+            self.deliverable_keys.add(key)
+            row = Deliverable(**p.model_dump())
+        # model defaults (tokens, timestamps, status) are Python-side: take them from an instance
+        return row.model_dump(exclude={"id"})
+
+    def _forget(self, values: dict) -> None:
+        """Drop the key of a row the database rejected, so a later copy of it is tried."""
+        if self.kind == "sponsors":
+            self.sponsor_by_name.pop(values["name"], None)
+        elif self.kind == "deals":
+            self.deal_keys.discard((values["sponsor_id"], values["name"]))
+        else:
+            self.deliverable_keys.discard((values["deal_id"], values["title"], values["due_date"]))
+
+    def _reject(self, line: int, error: Exception) -> None:
+        self.report["failed"] += 1
+        if len(self.report["errors"]) < MAX_ERRORS:
+            self.report["errors"].append({"line": line, "error": _error_text(error)})
+
+    def add(self, line: int, record: Any) -> None:
+        self.report["rows"] += 1
+        if isinstance(record, Exception):
+            return self._reject(line, record)
+        try:
+            values = self._prepare(record)
+        except (ValidationError, ValueError, TypeError) as e:
+            return self._reject(line, e)
+        if values is None:
+            self.report["skipped"] += 1
+            return
+        self._batch.append((line, values))
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def _insert(self, rows: list[dict]) -> None:
+        ids = self.session.execute(insert(self.model).returning(self.model.id), rows).scalars().all()
+        stamp_at_commit(self.session, self.model, ids)  # Core inserts bypass the flush
+        record_changes(self.session, [(self.model, row) for row in rows])
+        self.session.commit()
+
+    def flush(self) -> None:
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+        try:
+            self._insert([values for _, values in batch])
+            self.report["created"] += len(batch)
+            return
+        except SQLAlchemyError:
+            self.session.rollback()
+        for line, values in batch:
+            try:
+                self._insert([values])
+                self.report["created"] += 1
+            except SQLAlchemyError as e:
+                self.session.rollback()
+                self._forget(values)
+                self._reject(line, RowError(f"database rejected the row: {e.__class__.__name__}"))
+
+    def finish(self, actor: Optional[str] = None) -> dict:
+        self.flush()
+        if self.report["created"]:
+            log_activity(self.session, self.org_id, self.kind.rstrip("s"), "imported",
+                         f"Imported {self.report['created']} {self.kind}", actor=actor)
+        return self.report
+
+def run(session: Session, organization_id: int, kind: str, lines: Iterable[str], fmt: str,
+        actor: Optional[str] = None, batch_size: Optional[int] = None) -> dict:
+    """Import ``lines`` of CSV/NDJSON ``kind`` records into the org. Returns the report."""
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown import format: {fmt!r} (expected csv|ndjson)")
+    importer = Importer(session, organization_id, kind, batch_size)
+    for line, record in read_records(lines, fmt):
+        importer.add(line, record)
+    return importer.finish(actor)
+
+def main() -> None:
+    from .db import init_db, engine
+
+    parser = argparse.ArgumentParser(prog="python -m app.bulk_import")
+    parser.add_argument("organization_id", type=int)
+    parser.add_argument("kind", choices=list(KINDS))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the file extension")
+    args = parser.parse_args()
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    init_db()
+    with Session(engine) as session, open(args.path, newline="", encoding="utf-8-sig") as f:
+        if session.get(Organization, args.organization_id) is None:
+            raise SystemExit(f"Organization {args.organization_id} not found")
+        report = run(session, args.organization_id, args.kind, f, fmt, actor="bulk_import")
+    print(json.dumps(report, indent=2))
+    if report["failed"]:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
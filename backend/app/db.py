@@ -1,15 +1,71 @@
 from sqlmodel import SQLModel, create_engine, Session
+import logging
 import os
 from pathlib import Path
+from typing import Any, Callable
+
+from sqlalchemy import event, inspect as sa_inspect, text, update
+from sqlalchemy.orm import Session as OrmSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+logger = logging.getLogger(__name__)
 
 DB_PATH = os.environ.get("SPONSOR_OPS_DB", "sponsor_ops.db")
 DATABASE_URL = os.environ.get("SPONSOR_OPS_DATABASE_URL", f"sqlite:///{DB_PATH}")
 
-connect_args = {}
-if DATABASE_URL.startswith("sqlite:"):
-    connect_args = {"check_same_thread": False}
+# Engine profile (SPONSOR_OPS_DB_PROFILE):
+#   - "dev": plain engine, SQLite stays in rollback-journal mode
+#   - "production" (default outside SPONSOR_OPS_ENV=dev):
+#       SQLite: WAL + pragmas below, applied on every new connection
+#       Postgres: explicit QueuePool sizing below
+# Individual settings can be overridden:
+#   SPONSOR_OPS_SQLITE_JOURNAL_MODE (WAL), SPONSOR_OPS_SQLITE_BUSY_TIMEOUT_MS (5000),
+#   SPONSOR_OPS_SQLITE_SYNCHRONOUS (NORMAL), SPONSOR_OPS_SQLITE_MMAP_SIZE (268435456),
+#   SPONSOR_OPS_SQLITE_CACHE_SIZE (-65536, i.e. 64 MiB per connection)
+#   SPONSOR_OPS_DB_POOL_SIZE (10), SPONSOR_OPS_DB_MAX_OVERFLOW (20),
+#   SPONSOR_OPS_DB_POOL_TIMEOUT (30), SPONSOR_OPS_DB_POOL_RECYCLE (1800)
+_default_profile = "dev" if os.environ.get("SPONSOR_OPS_ENV", "dev").strip().lower() == "dev" else "production"
+DB_PROFILE = os.environ.get("SPONSOR_OPS_DB_PROFILE", _default_profile).strip().lower()
+
+def _sqlite_pragmas() -> dict[str, str]:
+    env = os.environ.get
+    return {
+        "journal_mode": env("SPONSOR_OPS_SQLITE_JOURNAL_MODE", "WAL"),
+        "busy_timeout": env("SPONSOR_OPS_SQLITE_BUSY_TIMEOUT_MS", "5000"),
+        "synchronous": env("SPONSOR_OPS_SQLITE_SYNCHRONOUS", "NORMAL"),
+        "mmap_size": env("SPONSOR_OPS_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)),
+        "cache_size": env("SPONSOR_OPS_SQLITE_CACHE_SIZE", "-65536"),
+    }
+
+def make_engine(url: str = DATABASE_URL, profile: str = DB_PROFILE):
+    if profile not in ("dev", "production"):
+        raise RuntimeError(f"Unknown SPONSOR_OPS_DB_PROFILE: {profile!r} (expected dev|production)")
+    if url.startswith("sqlite:"):
+        eng = create_engine(url, echo=False, connect_args={"check_same_thread": False}, pool_pre_ping=True)
+        if profile == "production":
+            pragmas = _sqlite_pragmas()
 
-engine = create_engine(DATABASE_URL, echo=False, connect_args=connect_args, pool_pre_ping=True)
+            @event.listens_for(eng, "connect")
+            def _set_sqlite_pragmas(dbapi_conn, conn_record):
+                cur = dbapi_conn.cursor()
+                try:
+                    for name, value in pragmas.items():
+                        cur.execute(f"PRAGMA {name}={value}")
+                finally:
+                    cur.close()
+        return eng
+    if profile == "production":
+        env = os.environ.get
+        return create_engine(
+            url, echo=False, pool_pre_ping=True,
+            pool_size=int(env("SPONSOR_OPS_DB_POOL_SIZE", "10")),
+            max_overflow=int(env("SPONSOR_OPS_DB_MAX_OVERFLOW", "20")),
+            pool_timeout=int(env("SPONSOR_OPS_DB_POOL_TIMEOUT", "30")),
+            pool_recycle=int(env("SPONSOR_OPS_DB_POOL_RECYCLE", "1800")),
+        )
+    return create_engine(url, echo=False, pool_pre_ping=True)
+
+engine = make_engine()
 
 def init_db():
     """
@@ -32,4 +88,115 @@ def init_db():
 
 def get_session():
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
+
+# ---------------------------------------------------------------------------
+# Commit hooks
+#
+# Caches and fan-outs need to know which rows changed once a transaction is
+# durable. Instances touched by each flush are captured as plain column dicts
+# (the ORM objects are expired after commit and must not emit SQL there) and
+# handed to every registered hook after a successful commit.
+# ---------------------------------------------------------------------------
+
+Change = tuple[type, dict[str, Any]]
+_commit_hooks: list[Callable[[list[Change]], None]] = []
+_PENDING_KEY = "sponsor_ops_pending_changes"
+
+def on_commit(fn: Callable[[list[Change]], None]) -> Callable[[list[Change]], None]:
+    """Register ``fn(changes)`` to run after every successful commit.
+
+    ``changes`` is a list of ``(model_class, row)`` tuples for each instance inserted,
+    updated or deleted in the committed transaction. Usable as a decorator.
+    """
+    _commit_hooks.append(fn)
+    return fn
+
+def _snapshot(obj) -> dict[str, Any]:
+    state = sa_inspect(obj)
+    row: dict[str, Any] = {}
+    for attr in state.mapper.column_attrs:
+        try:
+            row[attr.key] = getattr(obj, attr.key)
+        except Exception:
+            row[attr.key] = state.dict.get(attr.key)
+    return row
+
+def record_changes(session, changes: list[Change]) -> None:
+    """Report rows written with Core statements (which bypass the flush) to the hooks."""
+    if _commit_hooks:
+        session.info.setdefault(_PENDING_KEY, []).extend(changes)
+
+@event.listens_for(OrmSession, "after_flush")
+def _collect_changes(session, flush_context):
+    if not _commit_hooks:
+        return
+    pending = session.info.setdefault(_PENDING_KEY, [])
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        pending.append((type(obj), _snapshot(obj)))
+
+@event.listens_for(OrmSession, "after_commit")
+def _run_commit_hooks(session):
+    changes = session.info.pop(_PENDING_KEY, None)
+    if not changes:
+        return
+    for fn in _commit_hooks:
+        try:
+            fn(changes)
+        except Exception:
+            logger.exception("commit hook %s failed", getattr(fn, "__name__", fn))
+
+@event.listens_for(OrmSession, "after_rollback")
+def _drop_changes(session):
+    session.info.pop(_PENDING_KEY, None)
+
+# ---------------------------------------------------------------------------
+# Change sequence
+#
+# Rows of models with a ``change_seq`` column are stamped with a number from the
+# single-row ``changecounter`` table whenever the ORM inserts or updates them, so
+# feeds can ask for "rows changed after N" (see app.changes). Flushes only note
+# which rows they wrote; just before the commit, the transaction increments the
+# counter and stamps all of them with one UPDATE per table. The counter row then
+# stays locked until the commit completes: numbers become visible strictly in
+# order, so once a reader has seen N committed, no row with change_seq <= N can
+# appear later, while concurrent transactions only queue for the commit itself
+# rather than for their whole run. Rows written with Core statements are
+# registered with ``stamp_at_commit``.
+# ---------------------------------------------------------------------------
+
+_STAMP_KEY = "sponsor_ops_change_seq_rows"
+
+def stamp_at_commit(session, model: type, ids) -> None:
+    """Stamp rows of ``model`` (by id) with the transaction's change sequence number at commit."""
+    session.info.setdefault(_STAMP_KEY, {}).setdefault(model, set()).update(ids)
+
+def committed_change_seq(session) -> int:
+    """The newest change sequence number committed so far."""
+    return session.connection().execute(text("SELECT value FROM changecounter WHERE id = 1")).scalar_one()
+
+@event.listens_for(OrmSession, "after_flush")
+def _note_stamped_rows(session, flush_context):
+    # pre-flush state is still visible here, and new rows have their ids
+    for obj in list(session.new) + list(session.dirty):
+        if hasattr(type(obj), "change_seq") and (obj in session.new or session.is_modified(obj)):
+            stamp_at_commit(session, type(obj), [obj.id])
+
+@event.listens_for(OrmSession, "before_commit")
+def _stamp_change_seq(session):
+    session.flush()  # before_commit runs ahead of the final flush; its rows need the stamp too
+    rows = session.info.pop(_STAMP_KEY, None)
+    if not rows:
+        return
+    conn = session.connection()
+    conn.execute(text("UPDATE changecounter SET value = value + 1 WHERE id = 1"))
+    seq = conn.execute(text("SELECT value FROM changecounter WHERE id = 1")).scalar_one()
+    for model, ids in rows.items():
+        conn.execute(update(model.__table__).where(model.__table__.c.id.in_(ids)).values(change_seq=seq))
+    for (cls, pk, _), obj in session.identity_map.items():  # keys, so expired objects are not loaded
+        if pk[0] in rows.get(cls, ()):
+            set_committed_value(obj, "change_seq", seq)
+
+@event.listens_for(OrmSession, "after_rollback")
+def _drop_stamped_rows(session):
+    session.info.pop(_STAMP_KEY, None)
@@ -0,0 +1,307 @@
+"""
+Background org exports including proof files.
+
+``create`` records an ``ExportJob`` and hands it to a worker thread. The worker writes
+``export.json``, the NDJSON table members of ``app.org_export`` and every proof file the
+org references (as ``files/<storage key>``, stored uncompressed: proofs are already
+compressed media) into a zip64 archive on local scratch space, then puts it into
+storage at ``exports/<org>/<job>-<attempt>.zip``. Progress (one step per table and per file) is
+written back at most every SPONSOR_OPS_EXPORT_PROGRESS_SEC from a separate session.
+Downloads go through ``file_response``: ranges, validators, presigned redirects.
+Only the newest SPONSOR_OPS_EXPORT_KEEP artifacts per org are kept; older jobs become
+``expired``.
+
+An org has at most one queued or running job (a partial unique index, so concurrent
+requests get the same job). Jobs are claimed with a conditional UPDATE, so each run
+happens once even if several nodes pick it up. Every later write of a run is
+conditional on the job still being ``running`` in the attempt it claimed; a worker
+whose job was re-queued under it (a DB stall kept it from heartbeating) finds that
+out at its next write, stops and leaves the job to the new run. While a job runs, its worker bumps
+``updated_at`` at least every third of SPONSOR_OPS_EXPORT_STALE_SEC; a running job
+whose heartbeat is older than that lost its worker (restart, crash) and is re-queued
+by ``create``, at startup and by a sweep every SPONSOR_OPS_EXPORT_STALE_SEC, or failed
+as interrupted after SPONSOR_OPS_EXPORT_MAX_ATTEMPTS runs.
+
+Configure via:
+  - SPONSOR_OPS_EXPORT_WORKERS (default: "1"; "0" runs jobs in the calling thread)
+  - SPONSOR_OPS_EXPORT_KEEP (default: "3")
+  - SPONSOR_OPS_EXPORT_PROGRESS_SEC (default: "2")
+  - SPONSOR_OPS_EXPORT_STALE_SEC (default: "60")
+  - SPONSOR_OPS_EXPORT_MAX_ATTEMPTS (default: "3")
+"""
+from __future__ import annotations
+
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import Executor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select, update
+
+from . import org_export
+from .db import engine
+from .models import ExportJob, Proof
+from .storage import UPLOAD_ROOT, get_storage
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.environ.get("SPONSOR_OPS_EXPORT_WORKERS", "1"))
+KEEP = int(os.environ.get("SPONSOR_OPS_EXPORT_KEEP", "3"))
+PROGRESS_SEC = float(os.environ.get("SPONSOR_OPS_EXPORT_PROGRESS_SEC", "2"))
+STALE_SEC = float(os.environ.get("SPONSOR_OPS_EXPORT_STALE_SEC", "60"))
+MAX_ATTEMPTS = int(os.environ.get("SPONSOR_OPS_EXPORT_MAX_ATTEMPTS", "3"))
+
+ACTIVE = ("queued", "running")
+_SCRATCH = UPLOAD_ROOT / "exports" / ".tmp"
+
+def state(job: ExportJob) -> dict:
+    return job.model_dump(exclude={"artifact_key"}) | {"ready": job.status == "done"}
+
+def artifact_key(job: ExportJob, attempt: int) -> str:
+    return f"exports/{job.organization_id}/{job.id}-{attempt}.zip"
+
+# --- scheduling ----------------------------------------------------------------
+
+_pool: Optional[Executor] = None
+_lock = threading.Lock()
+
+def _executor() -> Optional[Executor]:
+    global _pool
+    if WORKERS <= 0:
+        return None
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="export")
+        return _pool
+
+def enqueue(job_id: int) -> None:
+    pool = _executor()
+    if pool is None:
+        run(job_id)
+    else:
+        pool.submit(run, job_id)
+
+def _active(session: Session, organization_id: int) -> Optional[ExportJob]:
+    return session.exec(select(ExportJob).where(ExportJob.organization_id == organization_id,
+                                                ExportJob.status.in_(ACTIVE))).first()
+
+def create(session: Session, organization_id: int, user_id: Optional[int]) -> ExportJob:
+    """Queue an export of the org, or return the one already queued or running."""
+    job = _active(session, organization_id)
+    if job is None:
+        job = ExportJob(organization_id=organization_id, requested_by=user_id)
+        session.add(job)
+        try:
+            session.commit()
+        except IntegrityError:  # another request queued one first
+            session.rollback()
+            return create(session, organization_id, user_id)
+        session.refresh(job)
+        enqueue(job.id)
+    elif job.status == "running":
+        for job_id in requeue_stale(session, ExportJob.id == job.id):  # its worker is gone
+            enqueue(job_id)
+    session.refresh(job)
+    return job
+
+def requeue_stale(session: Session, *where) -> list[int]:
+    """Re-queue running jobs whose worker stopped heartbeating (fail them after
+    MAX_ATTEMPTS runs). Returns the ids re-queued; the caller enqueues them."""
+    now = datetime.utcnow()
+    stale = (ExportJob.status == "running", ExportJob.updated_at < now - timedelta(seconds=STALE_SEC), *where)
+    session.exec(update(ExportJob).where(*stale, ExportJob.attempts >= MAX_ATTEMPTS)
+                 .values(status="failed", error="interrupted", finished_at=now))
+    ids = list(session.exec(select(ExportJob.id).where(*stale)).all())
+    if ids:
+        session.exec(update(ExportJob).where(ExportJob.id.in_(ids), *stale)
+                     .values(status="queued", progress_done=0, updated_at=now))
+    session.commit()
+    return ids
+
+def sweep(startup: bool = False) -> int:
+    """Re-queue jobs of dead workers and enqueue them with the ones left waiting (at
+    startup all queued jobs, later those queued for over STALE_SEC). Returns jobs queued."""
+    with Session(engine) as session:
+        queued = requeue_stale(session)
+        stmt = select(ExportJob.id).where(ExportJob.status == "queued")
+        if not startup:  # a job still waiting in a live worker's pool is claimed only once anyway
+            stmt = stmt.where(ExportJob.updated_at < datetime.utcnow() - timedelta(seconds=STALE_SEC))
+        queued += [job_id for job_id in session.exec(stmt).all() if job_id not in queued]
+    for job_id in queued:
+        enqueue(job_id)
+    return len(queued)
+
+_stop = threading.Event()
+_sweeper: Optional[threading.Thread] = None
+
+def _sweep_forever() -> None:
+    while not _stop.wait(STALE_SEC):
+        try:
+            sweep()
+        except Exception:
+            logger.exception("export sweep failed")
+
+def resume_pending() -> int:
+    """Sweep once at startup, then every STALE_SEC in a daemon thread. Returns jobs queued."""
+    global _sweeper
+    queued = sweep(startup=True)
+    if WORKERS > 0 and (_sweeper is None or not _sweeper.is_alive()):
+        _stop.clear()
+        _sweeper = threading.Thread(target=_sweep_forever, name="export-sweep", daemon=True)
+        _sweeper.start()
+    return queued
+
+def stop(timeout: float = 5) -> None:
+    _stop.set()
+    if _sweeper is not None:
+        _sweeper.join(timeout)
+
+# --- building ------------------------------------------------------------------
+
+class JobLost(Exception):
+    """The run's job was re-queued (or finished) by someone else; stop building."""
+
+def _heartbeat(job_id: int, attempt: int, **values) -> None:
+    """Update the job if it is still running in ``attempt``; raises JobLost otherwise."""
+    with Session(engine) as session:
+        updated = session.exec(update(ExportJob)
+                               .where(ExportJob.id == job_id, ExportJob.status == "running",
+                                      ExportJob.attempts == attempt)
+                               .values(updated_at=datetime.utcnow(), **values)).rowcount
+        session.commit()
+    if not updated:
+        raise JobLost(job_id)
+
+def _claim(job_id: int) -> Optional[int]:
+    """Start a run of a queued job; returns its attempt number, None if not claimed."""
+    with Session(engine) as session:
+        attempts = session.exec(select(ExportJob.attempts).where(ExportJob.id == job_id)).first()
+        if attempts is None:
+            return None
+        now = datetime.utcnow()
+        claimed = session.exec(update(ExportJob)
+                               .where(ExportJob.id == job_id, ExportJob.status == "queued",
+                                      ExportJob.attempts == attempts)
+                               .values(status="running", started_at=now, updated_at=now,
+                                       attempts=attempts + 1)).rowcount
+        session.commit()
+    return attempts + 1 if claimed else None
+
+def _keepalive(job_id: int, attempt: int, done: threading.Event) -> None:
+    """Heartbeat while a single step (a large proof file, a big table) takes long."""
+    while not done.wait(STALE_SEC / 3):
+        try:
+            _heartbeat(job_id, attempt)
+        except JobLost:
+            return
+        except Exception:
+            logger.exception("export heartbeat failed", extra={"export_job": job_id})
+
+def run(job_id: int) -> None:
+    attempt = _claim(job_id)
+    if attempt is None:
+        return
+    done = threading.Event()
+    threading.Thread(target=_keepalive, args=(job_id, attempt, done), name=f"export-{job_id}-beat",
+                     daemon=True).start()
+    try:
+        with Session(engine) as session:
+            _build(session, session.get(ExportJob, job_id), attempt)
+    except JobLost:
+        logger.warning("export run superseded", extra={"export_job": job_id, "attempt": attempt})
+        return
+    except Exception as e:
+        logger.exception("export failed", extra={"export_job": job_id})
+        with contextlib.suppress(JobLost):
+            _heartbeat(job_id, attempt, status="failed", error=repr(e)[:500], finished_at=datetime.utcnow())
+        return
+    finally:
+        done.set()
+    with Session(engine) as session:
+        prune(session, session.get(ExportJob, job_id).organization_id)
+
+def _file_paths(session: Session, org_id: int) -> list[str]:
+    stmt = (org_export.TABLES["proofs"][1](org_id).with_only_columns(Proof.file_path).distinct()
+            .where(Proof.kind == "file", Proof.file_path.is_not(None)).order_by(Proof.file_path))
+    return list(session.execute(stmt).scalars())
+
+def _build(session: Session, job: ExportJob, attempt: int) -> None:
+    storage = get_storage()
+    org_id = job.organization_id
+    paths = _file_paths(session, org_id)
+    total = len(org_export.TABLES) + len(paths)
+    _heartbeat(job.id, attempt, progress_total=total)
+    done = 0
+    missing = []
+    last_beat = time.monotonic()
+
+    def step() -> None:
+        nonlocal done, last_beat
+        done += 1
+        if time.monotonic() - last_beat >= PROGRESS_SEC:
+            _heartbeat(job.id, attempt, progress_done=done)
+            last_beat = time.monotonic()
+
+    _SCRATCH.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=_SCRATCH, prefix=f"export-{job.id}-", suffix=".zip")
+    os.close(fd)
+    tmp_path = Path(tmp)
+    try:
+        with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED, allowZip64=True) as z:
+            meta = org_export.metadata(session, org_id) | {"export_job": job.id, "files": len(paths)}
+            z.writestr("export.json", json.dumps(meta, indent=2))
+            for name in org_export.TABLES:
+                with z.open(f"{name}.ndjson", "w", force_zip64=True) as member:
+                    for row in org_export.iter_rows(session, org_export.statement(name, org_id)):
+                        member.write(org_export.ndjson_line(row))
+                step()
+
+            for path in paths:
+                info = zipfile.ZipInfo(f"files/{path}", datetime.utcnow().timetuple()[:6])
+                info.compress_type = zipfile.ZIP_STORED
+                if storage.exists(path):
+                    with z.open(info, "w", force_zip64=True) as out:
+                        for chunk in storage.get_stream(path):
+                            out.write(chunk)
+                else:
+                    missing.append(path)
+                step()
+            if missing:
+                z.writestr("missing_files.txt", "\n".join(missing) + "\n")
+
+        size = tmp_path.stat().st_size
+        key = artifact_key(job, attempt)
+        _heartbeat(job.id, attempt)  # still ours: worth uploading
+        storage.put_file(key, tmp_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    try:
+        _heartbeat(job.id, attempt, status="done", progress_done=total, artifact_key=key, size_bytes=size,
+                   finished_at=datetime.utcnow())
+    except JobLost:
+        storage.delete(key)  # another run owns the job now; its artifact has its own key
+        raise
+
+def prune(session: Session, organization_id: int, keep: Optional[int] = None) -> int:
+    """Delete all but the newest ``keep`` artifacts of an org. Returns jobs expired."""
+    keep = KEEP if keep is None else keep
+    old = session.exec(select(ExportJob)
+                       .where(ExportJob.organization_id == organization_id, ExportJob.status == "done")
+                       .order_by(ExportJob.id.desc()).offset(keep)).all()
+    storage = get_storage()
+    for job in old:
+        if job.artifact_key:
+            storage.delete(job.artifact_key)
+        job.status, job.artifact_key = "expired", None
+        session.add(job)
+    session.commit()
+    return len(old)
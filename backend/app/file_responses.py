@@ -0,0 +1,132 @@
+"""
+Responses for stored proof files: validators, byte ranges, presigned redirects and
+proxy offload.
+
+``file_response`` answers conditional requests (If-None-Match, then If-Modified-Since)
+with 304, serves a single ``Range: bytes=`` request as 206 (honouring If-Range) and
+everything else as a full 200. Content-addressed files use their SHA-256 as a strong
+ETag and are cacheable as immutable; other files fall back to an mtime/size ETag.
+
+When the storage backend can presign URLs (S3) the body is not sent by the API at all:
+the response is a 307 to a URL valid for SPONSOR_OPS_STORAGE_PRESIGN_TTL_SEC, and the
+object store answers ranges and validators itself. Otherwise the bytes are streamed
+from the backend.
+
+With local storage and offload enabled Python does not send the body either: the
+response carries the headers plus ``X-Accel-Redirect`` (Caddy/nginx; path below
+SPONSOR_OPS_FILE_OFFLOAD_PREFIX, relative to UPLOAD_ROOT) or ``X-Sendfile`` (absolute
+path) and the proxy serves the bytes, ranges included, with sendfile. See deploy/Caddyfile.
+
+Configure via:
+  - SPONSOR_OPS_FILE_OFFLOAD (default: ""; "x-accel" or "x-sendfile")
+  - SPONSOR_OPS_FILE_OFFLOAD_PREFIX (default: "/_proof_files/")
+  - SPONSOR_OPS_PROOF_CACHE_MAX_AGE_SEC (default: "86400"; for files that may change)
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+from urllib.parse import quote
+
+from starlette.requests import Request
+from starlette.responses import FileResponse, RedirectResponse, Response, StreamingResponse
+
+from .http_cache import if_none_match
+from .storage import PRESIGN_TTL_SEC, UPLOAD_ROOT, ObjectInfo, content_disposition, get_storage
+
+OFFLOAD = os.environ.get("SPONSOR_OPS_FILE_OFFLOAD", "").strip().lower()
+OFFLOAD_PREFIX = os.environ.get("SPONSOR_OPS_FILE_OFFLOAD_PREFIX", "/_proof_files/")
+MAX_AGE_SEC = int(os.environ.get("SPONSOR_OPS_PROOF_CACHE_MAX_AGE_SEC", "86400"))
+
+if OFFLOAD not in ("", "x-accel", "x-sendfile"):
+    raise RuntimeError(f"Unknown SPONSOR_OPS_FILE_OFFLOAD: {OFFLOAD!r} (expected x-accel|x-sendfile)")
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if request.headers.get("if-none-match") is not None:
+        return if_none_match(request, etag)
+    since = request.headers.get("if-modified-since")
+    if not since:
+        return False
+    try:
+        return int(mtime) <= parsedate_to_datetime(since).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+def _parse_range(header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """(start, end inclusive) for a single satisfiable range; (-1, -1) if unsatisfiable;
+    None to ignore the header and send the whole file (absent, malformed or multi-range)."""
+    if not header:
+        return None
+    m = _RANGE.match(header.strip())
+    if not m or (not m.group(1) and not m.group(2)):
+        return None
+    if not m.group(1):  # suffix range: last N bytes
+        n = int(m.group(2))
+        return (max(0, size - n), size - 1) if n and size else (-1, -1)
+    start = int(m.group(1))
+    end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+    if start >= size or start > end:
+        return (-1, -1)
+    return start, end
+
+def file_response(request: Request, key: str, info: ObjectInfo, *, media_type: str, filename: str,
+                  content_hash: Optional[str] = None, disposition: str = "attachment") -> Response:
+    """Serve storage object ``key`` (``info`` from ``get_storage().stat(key)``) for a GET request.
+
+    ``content_hash`` identifies immutable content (e.g. a blob's SHA-256): it becomes the
+    strong ETag and the response is cacheable forever.
+    """
+    if content_hash:
+        etag = f'"{content_hash}"'
+        cache_control = "private, max-age=31536000, immutable"
+    else:
+        etag = '"' + hashlib.md5(f"{info.mtime}-{info.size}".encode(), usedforsecurity=False).hexdigest() + '"'
+        cache_control = f"private, max-age={MAX_AGE_SEC}"
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(info.mtime, usegmt=True),
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+    }
+    if _not_modified(request, etag, info.mtime):
+        return Response(status_code=304, headers=headers)
+
+    storage = get_storage()
+    if PRESIGN_TTL_SEC > 0:
+        url = storage.presigned_url(key, expires_sec=PRESIGN_TTL_SEC, media_type=media_type,
+                                    filename=filename, disposition=disposition)
+        if url:
+            # the URL expires: let the browser reuse the redirect for a while, not forever
+            return RedirectResponse(url, status_code=307,
+                                    headers={"Cache-Control": f"private, max-age={PRESIGN_TTL_SEC // 2}"})
+    headers["Content-Disposition"] = content_disposition(disposition, filename)
+
+    path = storage.local_path(key)
+    if path is not None and OFFLOAD == "x-accel":
+        rel = path.relative_to(UPLOAD_ROOT.resolve()).as_posix()
+        headers["X-Accel-Redirect"] = OFFLOAD_PREFIX.rstrip("/") + "/" + quote(rel)
+        return Response(status_code=200, headers=headers, media_type=media_type)
+    if path is not None and OFFLOAD == "x-sendfile":
+        headers["X-Sendfile"] = str(path)
+        return Response(status_code=200, headers=headers, media_type=media_type)
+
+    if_range = request.headers.get("if-range")
+    ranged = if_range is None or if_range.strip() in (etag, headers["Last-Modified"])
+    byte_range = _parse_range(request.headers.get("range"), info.size) if ranged else None
+    if byte_range == (-1, -1):
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{info.size}"})
+    if byte_range is not None:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{info.size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(storage.get_stream(key, start, end), status_code=206,
+                                 headers=headers, media_type=media_type)
+    if path is not None:
+        return FileResponse(path, headers=headers, media_type=media_type)
+    headers["Content-Length"] = str(info.size)
+    return StreamingResponse(storage.get_stream(key), headers=headers, media_type=media_type)
@@ -4,9 +4,11 @@ from .logging_config import configure_logging
 import os
 from fastapi.middleware.cors import CORSMiddleware
 from .ratelimit import SimpleRateLimitMiddleware
+from .querystats import QueryStatsMiddleware
 from sqlmodel import Session
 from .db import init_db, engine
-from .routers import auth, orgs, sponsors, deals, deliverables, portal, tickets, claims, reports, activity, notifications, export, uploads
+from . import export_jobs, scheduler
+from .routers import auth, orgs, sponsors, deals, deliverables, portal, tickets, claims, reports, activity, notifications, export, imports, uploads
 
 configure_logging()
 if os.environ.get("SENTRY_DSN"):
@@ -33,9 +35,20 @@ app.add_middleware(
 # Basic in-memory rate limiting (good enough for pilot; configure via env)
 app.add_middleware(SimpleRateLimitMiddleware)
 
+# Outermost: per-request query count/DB time (Server-Timing header + JSON log line)
+app.add_middleware(QueryStatsMiddleware)
+
 @app.on_event("startup")
 def _startup():
     init_db()
+    export_jobs.resume_pending()
+    scheduler.start()
+
+@app.on_event("shutdown")
+def _shutdown():
+    scheduler.stop()
+    export_jobs.stop()
+
 app.include_router(auth.router)
 app.include_router(orgs.router)
 app.include_router(sponsors.router)
@@ -48,6 +61,7 @@ app.include_router(reports.router)
 app.include_router(activity.router)
 app.include_router(notifications.router)
 app.include_router(export.router)
+app.include_router(imports.router)
 app.include_router(uploads.router)
 
 @app.get("/healthz")
@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import DDL, BigInteger, Index, event, text
 from typing import Optional, List
 from datetime import datetime, date
 import secrets
@@ -8,11 +9,15 @@ class User(SQLModel, table=True):
     email: str = Field(index=True, unique=True)
     hashed_password: str
     role: str = Field(default="admin")  # admin|superadmin
+    updated_at: datetime = Field(default_factory=datetime.utcnow, index=True, sa_column_kwargs={"onupdate": datetime.utcnow})
+    change_seq: int = Field(default=0, sa_type=BigInteger, index=True)
 
 class Organization(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow, index=True, sa_column_kwargs={"onupdate": datetime.utcnow})
+    change_seq: int = Field(default=0, sa_type=BigInteger, index=True)
     sponsors: List["Sponsor"] = Relationship(back_populates="organization")
     members: List["OrganizationMember"] = Relationship(back_populates="organization")
 
@@ -22,6 +27,8 @@ class OrganizationMember(SQLModel, table=True):
     user_id: int = Field(foreign_key="user.id", index=True)
     role: str = Field(default="manager")  # viewer|editor|manager|org_admin
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow, index=True, sa_column_kwargs={"onupdate": datetime.utcnow})
+    change_seq: int = Field(default=0, sa_type=BigInteger, index=True)
     organization: Optional[Organization] = Relationship(back_populates="members")
 
 class Sponsor(SQLModel, table=True):
@@ -33,6 +40,8 @@ class Sponsor(SQLModel, table=True):
     portal_token: str = Field(default_factory=lambda: secrets.token_urlsafe(16), index=True, unique=True)
     portal_token_revoked: bool = Field(default=False)
     portal_token_expires_at: Optional[datetime] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow, index=True, sa_column_kwargs={"onupdate": datetime.utcnow})
+    change_seq: int = Field(default=0, sa_type=BigInteger, index=True)
     organization: Optional[Organization] = Relationship(back_populates="sponsors")
     deals: List["Deal"] = Relationship(back_populates="sponsor")
     tickets: List["Ticket"] = Relationship(back_populates="sponsor")
@@ -53,6 +62,8 @@ class Deal(SQLModel, table=True):
     portal_token: str = Field(default_factory=lambda: secrets.token_urlsafe(16), index=True, unique=True)
     portal_token_revoked: bool = Field(default=False)
     portal_token_expires_at: Optional[datetime] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow, index=True, sa_column_kwargs={"onupdate": datetime.utcnow})
+    change_seq: int = Field(default=0, sa_type=BigInteger, index=True)
     sponsor: Optional[Sponsor] = Relationship(back_populates="deals")
     deliverables: List["Deliverable"] = Relationship(back_populates="deal")
     claims: List["Claim"] = Relationship(back_populates="deal")
@@ -69,9 +80,11 @@ class BrandKit(SQLModel, table=True):
     dont_json: str = Field(default="[]")
     assets_json: str = Field(default="[]")
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+    change_seq: int = Field(default=0, sa_type=BigInteger, index=True)
     deal: Optional[Deal] = Relationship(back_populates="brandkit")
 
 class Deliverable(SQLModel, table=True):
+    __table_args__ = (Index("ix_deliverable_deal_due", "deal_id", "due_date"),)
     id: Optional[int] = Field(default=None, primary_key=True)
     deal_id: int = Field(foreign_key="deal.id", index=True)
     title: str
@@ -92,6 +105,8 @@ class Deliverable(SQLModel, table=True):
     guaranteed: bool = Field(default=False)
     value: Optional[float] = None
     brief: Optional[str] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow, index=True, sa_column_kwargs={"onupdate": datetime.utcnow})
+    change_seq: int = Field(default=0, sa_type=BigInteger, index=True)
     deal: Optional[Deal] = Relationship(back_populates="deliverables")
     proofs: List["Proof"] = Relationship(back_populates="deliverable")
     comments: List["DeliverableComment"] = Relationship(back_populates="deliverable")
@@ -105,18 +120,88 @@ class Proof(SQLModel, table=True):
     file_path: Optional[str] = None
     file_name: Optional[str] = None
     mime_type: Optional[str] = None
+    size_bytes: Optional[int] = None
+    sha256: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow, index=True, sa_column_kwargs={"onupdate": datetime.utcnow})
+    change_seq: int = Field(default=0, sa_type=BigInteger, index=True)
     deliverable: Optional[Deliverable] = Relationship(back_populates="proofs")
 
+class ProofBlob(SQLModel, table=True):
+    """A proof file in the content-addressed store (see ``app.blobstore``)."""
+    sha256: str = Field(primary_key=True)
+    size_bytes: int = 0
+    refcount: int = Field(default=0)  # Proof rows whose file_path points at this blob; -1: being collected
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class UploadSession(SQLModel, table=True):
+    """A resumable proof upload in progress (see ``app.upload_sessions``)."""
+    id: str = Field(primary_key=True)  # random token; also authorizes chunk PUTs
+    deliverable_id: int = Field(foreign_key="deliverable.id", index=True)
+    source: str = Field(default="internal")  # internal|portal
+    user_id: Optional[int] = Field(default=None, foreign_key="user.id")
+    file_name: str
+    mime_type: str
+    note: Optional[str] = None
+    size_bytes: int
+    received_bytes: int = Field(default=0)  # contiguous from the start of the file
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime = Field(index=True)
+    completed_at: Optional[datetime] = None  # set by the one request that completes it
+    proof_id: Optional[int] = None  # the resulting proof, returned again if completion is retried
+
+class ExportJob(SQLModel, table=True):
+    """A background org export with proof files (see ``app.export_jobs``)."""
+    # at most one queued or running export per org, however many requests race to create it
+    __table_args__ = (
+        Index("ux_exportjob_org_active", "organization_id", unique=True,
+              sqlite_where=text("status IN ('queued', 'running')"),
+              postgresql_where=text("status IN ('queued', 'running')")),
+    )
+    id: Optional[int] = Field(default=None, primary_key=True)
+    organization_id: int = Field(index=True)
+    requested_by: Optional[int] = Field(default=None, foreign_key="user.id")
+    status: str = Field(default="queued")  # queued|running|done|failed|expired
+    progress_done: int = Field(default=0)
+    progress_total: int = Field(default=0)
+    artifact_key: Optional[str] = None  # storage key of the finished zip
+    size_bytes: Optional[int] = Field(default=None, sa_type=BigInteger)
+    attempts: int = Field(default=0)  # runs started; a job interrupted too often is failed
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow)  # progress heartbeat
+    finished_at: Optional[datetime] = None
+
+class ChangeCounter(SQLModel, table=True):
+    """The last change sequence number handed out; a single row (see "Change sequence" in ``app.db``)."""
+    id: int = Field(default=1, primary_key=True)
+    value: int = Field(default=0, sa_type=BigInteger)
+
+event.listen(ChangeCounter.__table__, "after_create", DDL("INSERT INTO changecounter (id, value) VALUES (1, 0)"))
+
+class SchedulerLease(SQLModel, table=True):
+    """Leadership of a periodic job: only the holder runs it until the lease expires (see ``app.scheduler``)."""
+    name: str = Field(primary_key=True)
+    holder: str
+    expires_at: datetime
+    last_run_at: Optional[datetime] = None
+
 class DeliverableComment(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     deliverable_id: int = Field(foreign_key="deliverable.id", index=True)
     author: str
     body: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow, index=True, sa_column_kwargs={"onupdate": datetime.utcnow})
+    change_seq: int = Field(default=0, sa_type=BigInteger, index=True)
     deliverable: Optional[Deliverable] = Relationship(back_populates="comments")
 
 class Ticket(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_ticket_org_active_created", "organization_id", "created_at",
+              sqlite_where=text("archived_at IS NULL"), postgresql_where=text("archived_at IS NULL")),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     organization_id: int = Field(index=True)
     sponsor_id: int = Field(foreign_key="sponsor.id", index=True)
@@ -129,6 +214,8 @@ class Ticket(SQLModel, table=True):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     archived_at: Optional[datetime] = None
     last_reply_at: Optional[datetime] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow, index=True, sa_column_kwargs={"onupdate": datetime.utcnow})
+    change_seq: int = Field(default=0, sa_type=BigInteger, index=True)
     sponsor: Optional[Sponsor] = Relationship(back_populates="tickets")
     deal: Optional[Deal] = Relationship(back_populates="tickets")
     messages: List["TicketMessage"] = Relationship(back_populates="ticket")
@@ -139,9 +226,15 @@ class TicketMessage(SQLModel, table=True):
     sender: str
     message: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow, index=True, sa_column_kwargs={"onupdate": datetime.utcnow})
+    change_seq: int = Field(default=0, sa_type=BigInteger, index=True)
     ticket: Optional[Ticket] = Relationship(back_populates="messages")
 
 class Claim(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_claim_org_active_created", "organization_id", "created_at",
+              sqlite_where=text("archived_at IS NULL"), postgresql_where=text("archived_at IS NULL")),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     organization_id: int = Field(index=True)
     deal_id: int = Field(foreign_key="deal.id", index=True)
@@ -154,9 +247,12 @@ class Claim(SQLModel, table=True):
     notes: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     archived_at: Optional[datetime] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow, index=True, sa_column_kwargs={"onupdate": datetime.utcnow})
+    change_seq: int = Field(default=0, sa_type=BigInteger, index=True)
     deal: Optional[Deal] = Relationship(back_populates="claims")
 
 class Activity(SQLModel, table=True):
+    __table_args__ = (Index("ix_activity_org_deal_created", "organization_id", "deal_id", "created_at"),)
     id: Optional[int] = Field(default=None, primary_key=True)
     organization_id: int = Field(index=True)
     deal_id: Optional[int] = Field(default=None, index=True)
@@ -168,10 +264,14 @@ class Activity(SQLModel, table=True):
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class Notification(SQLModel, table=True):
+    __table_args__ = (Index("ix_notification_org_user_read_created", "organization_id", "user_id", "is_read", "created_at"),
+                      Index("ix_notification_org_user_dedupe", "organization_id", "user_id", "dedupe_key", unique=True))
     id: Optional[int] = Field(default=None, primary_key=True)
     organization_id: int = Field(index=True)
     user_id: int = Field(index=True)
     kind: str
+    # what the notification is about, e.g. "overdue:<deliverable id>:<due date>"; unique per user
+    dedupe_key: Optional[str] = None
     title: str
     body: str
     link: Optional[str] = None
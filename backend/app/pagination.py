@@ -0,0 +1,83 @@
+"""
+Keyset pagination for the list endpoints.
+
+A page is ordered by (sort key, id) and the next one starts strictly after the last
+row returned, so every page is one index range scan however deep the client pages
+(no OFFSET), and rows inserted meanwhile neither shift nor repeat pages. Paging is
+opt-in with a ``cursor`` parameter (empty for the first page); the response is then
+``{"items": [...], "next_cursor": ...}``, with ``next_cursor`` null on the last page.
+Without ``cursor`` an endpoint returns its plain JSON list as before, but never more
+than ``limit`` rows: at most SPONSOR_OPS_PAGE_MAX_LIMIT by default (activity and
+notifications keep their smaller caps), so clients that want every row follow
+``next_cursor`` (the frontend's ``requestAll``).
+
+  GET /api/tickets?cursor=&limit=100        -> {"items": [...], "next_cursor": "eyJ..."}
+  GET /api/tickets?cursor=eyJ...&limit=100
+
+Configure via:
+  - SPONSOR_OPS_PAGE_DEFAULT_LIMIT (default: "200"; page size when only ``cursor`` is given)
+  - SPONSOR_OPS_PAGE_MAX_LIMIT (default: "500"; also the plain-list cap)
+"""
+from __future__ import annotations
+
+import base64
+import json
+import os
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import Select, tuple_
+from sqlmodel import Session
+
+DEFAULT_LIMIT = int(os.environ.get("SPONSOR_OPS_PAGE_DEFAULT_LIMIT", "200"))
+MAX_LIMIT = int(os.environ.get("SPONSOR_OPS_PAGE_MAX_LIMIT", "500"))
+
+@dataclass
+class Page:
+    limit: int
+    cursor: Optional[str]  # None: a plain list; "": the first page
+
+def page_params(default_limit: Optional[int] = None):
+    """Dependency reading ``limit`` and ``cursor``; ``default_limit`` caps the plain list
+    (MAX_LIMIT if not given)."""
+    def params(limit: Optional[int] = None, cursor: Optional[str] = None) -> Page:
+        limit = limit or ((default_limit or MAX_LIMIT) if cursor is None else DEFAULT_LIMIT)
+        return Page(max(1, min(limit, MAX_LIMIT)), cursor)
+    return params
+
+def encode_cursor(value: Any, row_id: int) -> str:
+    raw = json.dumps([value.isoformat() if isinstance(value, date) else value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, key) -> tuple[Any, int]:
+    try:
+        value, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        python_type = getattr(key.type, "impl", key.type).python_type  # TypeDecorators (AutoString) wrap theirs
+        if python_type is datetime:
+            value = datetime.fromisoformat(value)
+        elif python_type is date:
+            value = date.fromisoformat(value)
+        elif not isinstance(value, python_type):
+            raise TypeError(value)
+        return value, int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def paginate(session: Session, stmt: Select, page: Page, key, *, desc: bool = False) -> list | dict:
+    """``stmt`` ordered by ``key`` (a model column), then id: the plain list, or one page
+    and the next cursor when ``page.cursor`` is set."""
+    id_col = key.class_.id
+    stmt = stmt.order_by(*((key.desc(), id_col.desc()) if desc else (key.asc(), id_col.asc())))
+    if page.cursor is None:
+        return list(session.exec(stmt.limit(page.limit)).all())
+    if page.cursor:
+        after = tuple_(*decode_cursor(page.cursor, key))
+        stmt = stmt.where(tuple_(key, id_col) < after if desc else tuple_(key, id_col) > after)
+    rows = list(session.exec(stmt.limit(page.limit + 1)).all())
+    next_cursor = None
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        next_cursor = encode_cursor(getattr(rows[-1], key.key), rows[-1].id)
+    return {"items": rows, "next_cursor": next_cursor}
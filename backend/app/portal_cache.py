@@ -0,0 +1,112 @@
+"""
+Cached, versioned snapshots of the deal portal payload (``GET /api/portal/deal/{token}``).
+
+A snapshot is the rendered JSON body plus a strong ETag, keyed by portal token. It is
+dropped from the commit hook as soon as a row belonging to the deal changes (deal,
+deliverables, proofs, comments, claims, tickets, ticket messages, brandkit), so a poll
+that hits the cache costs only the token lookup, and an unchanged client gets a 304.
+The cache never decides whether a token is valid: revocation is checked against the
+database on every request.
+
+Configure via:
+  - SPONSOR_OPS_PORTAL_CACHE_TTL_SEC (default: "30"; "0" disables)
+  - SPONSOR_OPS_PORTAL_CACHE_MAX_ENTRIES (default: "1000")
+
+Invalidation only sees commits made in this process; the TTL bounds how long another
+worker may serve a snapshot that predates a write made elsewhere.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from fastapi.encoders import jsonable_encoder
+from starlette.requests import Request
+from starlette.responses import Response
+
+from .cache import TTLCache
+from .db import on_commit
+from .http_cache import strong_etag, if_none_match
+from .models import Deal, Deliverable, Proof, DeliverableComment, Claim, Ticket, TicketMessage, BrandKit
+
+CACHE_TTL_SEC = float(os.environ.get("SPONSOR_OPS_PORTAL_CACHE_TTL_SEC", "30"))
+CACHE_MAX_ENTRIES = int(os.environ.get("SPONSOR_OPS_PORTAL_CACHE_MAX_ENTRIES", "1000"))
+
+@dataclass(frozen=True)
+class Snapshot:
+    deal_id: int
+    token_expires_at: Optional[datetime]
+    deliverable_ids: frozenset
+    ticket_ids: frozenset
+    body: bytes
+    etag: str
+
+_snapshots = TTLCache(CACHE_MAX_ENTRIES, CACHE_TTL_SEC)  # portal token -> Snapshot
+_generation = 0  # bumped on every invalidation; snapshots built across a bump are not stored
+_gen_lock = threading.Lock()
+
+def generation() -> int:
+    return _generation
+
+def get(token: str) -> Optional[Snapshot]:
+    snap = _snapshots.get(token)
+    if snap is None:
+        return None
+    if snap.token_expires_at and snap.token_expires_at < datetime.utcnow():
+        _snapshots.pop(token)
+        return None
+    return snap
+
+def build(deal: Deal, payload: dict) -> Snapshot:
+    body = json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode("utf-8")
+    return Snapshot(
+        deal_id=deal.id,
+        token_expires_at=deal.portal_token_expires_at,
+        deliverable_ids=frozenset(d.id for d in payload["deliverables"]),
+        ticket_ids=frozenset(t.id for t in payload["tickets"]),
+        body=body,
+        etag=strong_etag(body),
+    )
+
+def store(token: str, snap: Snapshot, built_at_generation: int) -> None:
+    with _gen_lock:
+        if built_at_generation == _generation:
+            _snapshots.set(token, snap)
+
+def respond(request: Request, snap: Snapshot) -> Response:
+    headers = {"ETag": snap.etag, "Cache-Control": "private, no-cache"}
+    if if_none_match(request, snap.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snap.body, media_type="application/json", headers=headers)
+
+def clear() -> None:
+    _snapshots.clear()
+
+@on_commit
+def _invalidate(changes) -> None:
+    global _generation
+    deal_ids, deliverable_ids, ticket_ids = set(), set(), set()
+    for cls, row in changes:
+        if cls is Deal:
+            deal_ids.add(row.get("id"))
+        elif cls in (Deliverable, Claim, Ticket, BrandKit):
+            deal_ids.add(row.get("deal_id"))
+            if cls is Deliverable:
+                deliverable_ids.add(row.get("id"))
+            elif cls is Ticket:
+                ticket_ids.add(row.get("id"))
+        elif cls in (Proof, DeliverableComment):
+            deliverable_ids.add(row.get("deliverable_id"))
+        elif cls is TicketMessage:
+            ticket_ids.add(row.get("ticket_id"))
+    if not (deal_ids or deliverable_ids or ticket_ids):
+        return
+    with _gen_lock:
+        _generation += 1
+    _snapshots.pop_where(lambda s: s.deal_id in deal_ids
+                         or not s.deliverable_ids.isdisjoint(deliverable_ids)
+                         or not s.ticket_ids.isdisjoint(ticket_ids))
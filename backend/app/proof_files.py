@@ -0,0 +1,206 @@
+"""
+Proof file uploads shared by the internal and portal upload endpoints.
+
+``receive_upload`` parses the multipart request body itself as it arrives from the
+socket (python-multipart's streaming parser; the endpoints declare no ``File``/``Form``
+parameters, so Starlette does not spool the body first). The file part goes straight
+into a temp file inside the blob store, hashed (SHA-256) on the way; parsing, hashing
+and disk writes run in the threadpool, ``CHUNK_SIZE`` bytes at a time, so the event
+loop never blocks on I/O and peak memory per upload is about one chunk. The size cap
+is enforced on the bytes received so far, with or without a Content-Length: an
+oversized body is cut off at the cap, never written out in full.
+
+The other form fields are available before the file is stored, so the endpoint can
+check them (e.g. the portal's ``deal_token``) and leaving the ``async with`` block
+without calling ``store`` drops the temp file. ``store`` renames the complete file
+into place (``os.replace`` is atomic on the same filesystem), so readers never see
+partial uploads. Storage layout and deduplication: ``app.blobstore``.
+
+Configure via:
+  - SPONSOR_OPS_MAX_UPLOAD_MB (default: "50")
+  - SPONSOR_OPS_UPLOAD_CHUNK_KB (default: "1024")
+"""
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import os
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Optional
+
+from fastapi import HTTPException, Request
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+from . import blobstore
+MAX_UPLOAD_MB = int(os.environ.get("SPONSOR_OPS_MAX_UPLOAD_MB", "50"))
+MAX_UPLOAD_BYTES = MAX_UPLOAD_MB * 1024 * 1024
+CHUNK_SIZE = int(os.environ.get("SPONSOR_OPS_UPLOAD_CHUNK_KB", "1024")) * 1024
+
+ALLOWED_MIME = {"image/png", "image/jpeg", "application/pdf", "video/mp4"}
+ALLOWED_EXT = {".png", ".jpg", ".jpeg", ".pdf", ".mp4"}
+_EXT_FOR_MIME = {"image/png": ".png", "image/jpeg": ".jpg", "application/pdf": ".pdf", "video/mp4": ".mp4"}
+_filename_strip = re.compile(r"[^a-zA-Z0-9._-]+")
+_FORM_OVERHEAD = 1024 * 1024  # multipart framing and the small form fields
+_FIELD_MAX = 64 * 1024
+
+@dataclass
+class StoredFile:
+    rel_path: str      # storage key of the blob (app.storage)
+    file_name: str     # sanitized original name
+    mime_type: str
+    size_bytes: int
+    sha256: str
+
+def safe_original_name(name: str) -> str:
+    name = (name or "proof").strip().replace("\\", "/").split("/")[-1]
+    name = _filename_strip.sub("_", name)
+    return name[:180] or "proof"
+
+def too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"File too large. Max {MAX_UPLOAD_MB}MB")
+
+def reject_oversized_request(request: Request) -> None:
+    """Cheap early 413 from Content-Length (multipart overhead allowed for)."""
+    cl = request.headers.get("content-length")
+    if cl and cl.isdigit() and int(cl) > MAX_UPLOAD_BYTES + _FORM_OVERHEAD:
+        raise too_large()
+
+def validate_type(filename: str | None, content_type: str | None) -> tuple[str, str]:
+    """Returns (sanitized original name, content type) or raises 400."""
+    orig = safe_original_name(filename or "proof")
+    ct = (content_type or "").lower().strip()
+    if ct not in ALLOWED_MIME:
+        raise HTTPException(status_code=400, detail=f"Unsupported file type: {content_type}")
+    ext = Path(orig).suffix.lower() or _EXT_FOR_MIME[ct]
+    if ext not in ALLOWED_EXT:
+        raise HTTPException(status_code=400, detail=f"Unsupported file extension: {ext}")
+    return orig, ct
+
+@dataclass
+class Upload:
+    """A multipart upload being received: form fields plus the file in a temp file."""
+    fields: dict[str, str] = field(default_factory=dict)
+    file_name: str = ""
+    mime_type: str = ""
+    size_bytes: int = 0
+    _f: Optional[BinaryIO] = None
+    _tmp: Optional[Path] = None
+    _digest: "hashlib._Hash" = field(default_factory=hashlib.sha256)
+
+    async def store(self) -> StoredFile:
+        """Move the received file into the blob store."""
+        if self._f is None:
+            raise HTTPException(status_code=422, detail="file is required")
+        f, self._f = self._f, None
+        rel, _ = await run_in_threadpool(blobstore.place, f, self._tmp, self._digest.hexdigest())
+        return StoredFile(rel_path=rel, file_name=self.file_name, mime_type=self.mime_type,
+                          size_bytes=self.size_bytes, sha256=self._digest.hexdigest())
+
+    def discard(self) -> None:
+        if self._f is not None:
+            blobstore.discard(self._f, self._tmp)
+            self._f = None
+
+class _FormParser:
+    """python-multipart callbacks writing the ``file`` part into ``upload``; sync, run in the threadpool."""
+    def __init__(self, boundary: bytes, upload: Upload):
+        self.upload = upload
+        self.parser = MultipartParser(boundary, {
+            "on_part_begin": self._part_begin, "on_header_field": self._header_field,
+            "on_header_value": self._header_value, "on_header_end": self._header_end,
+            "on_headers_finished": self._headers_finished, "on_part_data": self._part_data,
+            "on_part_end": self._part_end})
+        self._headers: dict[bytes, bytes] = {}
+        self._field = self._value = b""
+        self._name: Optional[str] = None
+        self._is_file = False
+        self._data = bytearray()
+
+    def _part_begin(self) -> None:
+        self._headers, self._field, self._value, self._data = {}, b"", b"", bytearray()
+
+    def _header_field(self, data: bytes, start: int, end: int) -> None:
+        self._field += data[start:end]
+
+    def _header_value(self, data: bytes, start: int, end: int) -> None:
+        self._value += data[start:end]
+
+    def _header_end(self) -> None:
+        self._headers[self._field.lower()] = self._value
+        self._field = self._value = b""
+
+    def _headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._name = options.get(b"name", b"").decode("latin-1")
+        self._is_file = self._name == "file"
+        if self._is_file:
+            u = self.upload
+            if u._f is not None:
+                raise HTTPException(status_code=400, detail="Only one file per upload")
+            u.file_name, u.mime_type = validate_type(options.get(b"filename", b"").decode("utf-8", "replace"),
+                                                     self._headers.get(b"content-type", b"").decode("latin-1"))
+            u._f, u._tmp = blobstore.open_temp()
+
+    def _part_data(self, data: bytes, start: int, end: int) -> None:
+        if not self._is_file:
+            if len(self._data) + end - start > _FIELD_MAX:
+                raise HTTPException(status_code=413, detail="Form field too large")
+            self._data += data[start:end]
+            return
+        u = self.upload
+        u.size_bytes += end - start
+        if u.size_bytes > MAX_UPLOAD_BYTES:
+            raise too_large()
+        chunk = data[start:end]
+        u._digest.update(chunk)  # hashlib releases the GIL on large buffers
+        u._f.write(chunk)
+
+    def _part_end(self) -> None:
+        if not self._is_file and self._name:
+            self.upload.fields[self._name] = self._data.decode("utf-8", "replace")
+
+    def feed(self, data: bytes) -> None:
+        try:
+            self.parser.write(data)
+        except MultipartParseError:
+            raise HTTPException(status_code=400, detail="Malformed multipart body")
+
+    def finish(self) -> None:
+        try:
+            self.parser.finalize()
+        except MultipartParseError:
+            raise HTTPException(status_code=400, detail="Malformed multipart body")
+        if self.upload._f is not None:
+            self.upload._f.flush()
+
+@contextlib.asynccontextmanager
+async def receive_upload(request: Request) -> AsyncIterator[Upload]:
+    """Parse a multipart upload (a ``file`` part plus small fields) from the request body.
+
+    The file is dropped unless ``store`` is called inside the block.
+    """
+    reject_oversized_request(request)
+    ctype, options = parse_options_header(request.headers.get("content-type", ""))
+    if ctype != b"multipart/form-data" or not options.get(b"boundary"):
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+    upload = Upload()
+    form = _FormParser(options[b"boundary"], upload)
+    try:
+        received, pending = 0, bytearray()
+        async for data in request.stream():
+            received += len(data)
+            if received > MAX_UPLOAD_BYTES + _FORM_OVERHEAD:  # e.g. chunked, no Content-Length
+                raise too_large()
+            pending += data
+            if len(pending) >= CHUNK_SIZE:
+                await run_in_threadpool(form.feed, bytes(pending))
+                pending.clear()
+        await run_in_threadpool(form.feed, bytes(pending))
+        await run_in_threadpool(form.finish)
+        yield upload
+    finally:
+        upload.discard()  # sync: must also run when the request is cancelled
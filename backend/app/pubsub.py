@@ -0,0 +1,158 @@
+"""
+In-process pub/sub fan-out and Server-Sent Events streaming.
+
+The commit hook publishes every committed ``TicketMessage`` on ``ticket:<id>`` and every
+``DeliverableComment`` on ``deliverable:<id>``, so all write paths (portal replies and
+comments, ``tickets.reply``, ``deals.add_comment``) feed subscribers without extra code.
+
+Each subscriber owns a bounded queue; a subscriber that falls behind gets a ``reset``
+event and is disconnected (clients refetch and reconnect). Between messages the stream
+sends a heartbeat and runs a catch-up query, which revalidates the caller's token and
+picks up rows committed by other workers, whose commits this process never sees.
+
+Configure via:
+  - SPONSOR_OPS_SSE_HEARTBEAT_SEC (default: "15")
+  - SPONSOR_OPS_SSE_QUEUE_SIZE (default: "100")
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from typing import Any, AsyncIterator, Callable, Optional
+
+from fastapi.encoders import jsonable_encoder
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import StreamingResponse
+
+from .db import on_commit
+from .models import TicketMessage, DeliverableComment
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_SEC = float(os.environ.get("SPONSOR_OPS_SSE_HEARTBEAT_SEC", "15"))
+QUEUE_SIZE = int(os.environ.get("SPONSOR_OPS_SSE_QUEUE_SIZE", "100"))
+
+_OVERFLOW = object()
+
+class Subscription:
+    def __init__(self, topic: str, loop: asyncio.AbstractEventLoop, maxsize: int):
+        self.topic = topic
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    def _offer(self, message: Any) -> None:
+        # runs on the subscriber's event loop
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_OVERFLOW)
+
+class Broker:
+    def __init__(self, queue_size: int = QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subs: dict[str, set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic: str) -> Subscription:
+        sub = Subscription(topic, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subs.setdefault(topic, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            subs = self._subs.get(sub.topic)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subs[sub.topic]
+
+    def publish(self, topic: str, message: Any) -> None:
+        """Thread-safe; may be called from any thread."""
+        with self._lock:
+            subs = list(self._subs.get(topic, ()))
+        for sub in subs:
+            try:
+                sub.loop.call_soon_threadsafe(sub._offer, message)
+            except RuntimeError:  # subscriber's loop already closed
+                self.unsubscribe(sub)
+
+    def subscriber_count(self, topic: Optional[str] = None) -> int:
+        with self._lock:
+            if topic is not None:
+                return len(self._subs.get(topic, ()))
+            return sum(len(s) for s in self._subs.values())
+
+broker = Broker()
+
+@on_commit
+def _publish_committed(changes) -> None:
+    for cls, row in changes:
+        if cls is TicketMessage:
+            broker.publish(f"ticket:{row.get('ticket_id')}", row)
+        elif cls is DeliverableComment:
+            broker.publish(f"deliverable:{row.get('deliverable_id')}", row)
+
+def _event(name: str, row: dict) -> str:
+    return f"id: {row['id']}\nevent: {name}\ndata: {json.dumps(jsonable_encoder(row), separators=(',', ':'))}\n\n"
+
+async def _stream(request: Request, topic: str, event_name: str,
+                  catch_up: Callable[[int], list[dict]], last_id: int) -> AsyncIterator[str]:
+    sub = broker.subscribe(topic)
+    try:
+        yield f"retry: {int(HEARTBEAT_SEC * 1000)}\n\n"
+        while True:
+            # catch-up also revalidates access; it raises once the token is no longer valid
+            try:
+                rows = await run_in_threadpool(catch_up, last_id)
+            except Exception:
+                yield "event: end\ndata: {}\n\n"
+                return
+            for row in rows:
+                if row["id"] > last_id:
+                    last_id = row["id"]
+                    yield _event(event_name, row)
+            if not rows:
+                yield ": keepalive\n\n"
+
+            deadline = asyncio.get_running_loop().time() + HEARTBEAT_SEC
+            while True:
+                if await request.is_disconnected():
+                    return
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    message = await asyncio.wait_for(sub.queue.get(), timeout=min(timeout, 1.0))
+                except asyncio.TimeoutError:
+                    continue
+                if message is _OVERFLOW:
+                    yield "event: reset\ndata: {}\n\n"
+                    return
+                if message.get("id") and message["id"] > last_id:
+                    last_id = message["id"]
+                    yield _event(event_name, message)
+    finally:
+        broker.unsubscribe(sub)
+
+def sse_response(request: Request, topic: str, event_name: str,
+                 catch_up: Callable[[int], list[dict]], last_id: int = 0) -> StreamingResponse:
+    """Stream ``event_name`` events for rows published on ``topic``.
+
+    ``catch_up(last_id)`` returns rows (dicts with an ``id``) newer than ``last_id`` and
+    raises if the caller lost access. Resumes from the ``Last-Event-ID`` header if sent.
+    """
+    header = request.headers.get("last-event-id")
+    if header and header.isdigit():
+        last_id = max(last_id, int(header))
+    return StreamingResponse(
+        _stream(request, topic, event_name, catch_up, last_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,138 @@
+"""
+Per-request SQL accounting.
+
+Engine hooks count statements and DB time into a ``QueryStats`` object bound to the
+current request through a context variable (sync endpoints run in a threadpool with a
+copy of the request context, so they update the same object). ``QueryStatsMiddleware``
+reports the totals in a ``Server-Timing`` header and in one JSON log line per request,
+and warns when the same statement runs many times in one request (likely N+1).
+
+Configure via:
+  - SPONSOR_OPS_REQUEST_LOG (default: "1")
+  - SPONSOR_OPS_NPLUSONE_THRESHOLD (default: "10"; identical statements per request
+    before a warning is logged, "0" disables)
+
+Tests use ``query_budget(n)`` to fail when a block issues more than ``n`` queries.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .db import engine
+
+logger = logging.getLogger("app.requests")
+
+REQUEST_LOG = os.environ.get("SPONSOR_OPS_REQUEST_LOG", "1").strip() == "1"
+NPLUSONE_THRESHOLD = int(os.environ.get("SPONSOR_OPS_NPLUSONE_THRESHOLD", "10"))
+
+class QueryStats:
+    __slots__ = ("count", "db_time", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.db_time = 0.0
+        self.statements: Counter[str] = Counter()
+
+    @property
+    def db_ms(self) -> float:
+        return self.db_time * 1000
+
+    def most_repeated(self) -> tuple[Optional[str], int]:
+        if not self.statements:
+            return None, 0
+        return self.statements.most_common(1)[0]
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("sponsor_ops_query_stats", default=None)
+_budgets: list[QueryStats] = []  # active query_budget() blocks, process-wide
+
+def current_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+@event.listens_for(engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    stats = _current.get()
+    for s in ([stats] if stats is not None else []) + _budgets:
+        s.count += 1
+        s.db_time += elapsed
+        s.statements[statement] += 1
+
+@event.listens_for(engine, "handle_error")
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+
+class QueryStatsMiddleware:
+    """Pure ASGI middleware adding ``Server-Timing`` and a per-request log line."""
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                total_ms = (time.perf_counter() - started) * 1000
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing",
+                               f'db;dur={stats.db_ms:.1f};desc="{stats.count} queries", app;dur={total_ms:.1f}')
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            self._report(scope, stats, status_code, (time.perf_counter() - started) * 1000)
+
+    def _report(self, scope: Scope, stats: QueryStats, status_code: int, duration_ms: float) -> None:
+        statement, repeats = stats.most_repeated()
+        if NPLUSONE_THRESHOLD and repeats >= NPLUSONE_THRESHOLD:
+            logger.warning("possible N+1 query", extra={
+                "path": scope.get("path"), "repeats": repeats, "statement": statement})
+        if REQUEST_LOG:
+            logger.info("request", extra={
+                "method": scope.get("method"), "path": scope.get("path"), "status": status_code,
+                "duration_ms": round(duration_ms, 1), "db_queries": stats.count,
+                "db_ms": round(stats.db_ms, 1), "db_max_repeats": repeats,
+            })
+
+@contextmanager
+def query_budget(max_queries: int) -> Iterator[QueryStats]:
+    """Fail with AssertionError if the block issues more than ``max_queries`` statements.
+
+    Counts every statement on the app engine while the block runs, from any thread, so
+    requests made through ``TestClient`` are covered. Meant for tests only.
+    """
+    stats = QueryStats()
+    _budgets.append(stats)
+    try:
+        yield stats
+    finally:
+        _budgets.remove(stats)
+    if stats.count > max_queries:
+        listing = "\n".join(f"  {n}x {sql}" for sql, n in stats.statements.most_common())
+        raise AssertionError(f"query budget exceeded: {stats.count} > {max_queries}\n{listing}")
@@ -1,36 +1,193 @@
 from __future__ import annotations
 
+import logging
+import math
 import os
+import sqlite3
+import threading
 import time
-from collections import defaultdict, deque
-from typing import Deque, Dict, Tuple
+from collections import OrderedDict
+from pathlib import Path
+from typing import Tuple
 
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response, JSONResponse
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
 
-class SimpleRateLimitMiddleware(BaseHTTPMiddleware):
+logger = logging.getLogger(__name__)
+
+Key = Tuple[str, str]
+
+# Bucket stores implement ``take(key, rate, capacity, now) -> wait_seconds`` and
+# ``clock() -> now``; ``take`` runs inline on the event loop, so it must stay in the
+# tens of microseconds. Select one with SPONSOR_OPS_RATE_LIMIT_BACKEND.
+
+class MemoryTokenBuckets:
     """
-    Very small, in-memory fixed-window rate limiter.
+    In-process token buckets keyed by (ip, group).
+
+    Each bucket is ``[tokens, last_seen]`` and refills continuously, so a request
+    costs O(1). Buckets are kept in least-recently-used order: a bucket idle for
+    longer than ``idle_sec`` has refilled completely and is indistinguishable from
+    a missing one, so sweeping them from the front of the dict is free. The dict
+    never grows beyond ``max_keys`` (oldest buckets are dropped first).
+    """
+    def __init__(self, max_keys: int = 100_000, idle_sec: float = 60.0, sweep_interval_sec: float = 30.0):
+        self.max_keys = max(1, max_keys)
+        self.idle_sec = idle_sec
+        self.sweep_interval_sec = sweep_interval_sec
+        self.buckets: "OrderedDict[Key, list[float]]" = OrderedDict()
+        self._next_sweep = 0.0
+
+    clock = staticmethod(time.monotonic)
+
+    def take(self, key: Key, rate: float, capacity: float, now: float) -> float:
+        """Consume one token. Returns 0 if allowed, else seconds until a token is available."""
+        b = self.buckets.get(key)
+        if b is None:
+            b = [capacity, now]
+            self.buckets[key] = b
+        else:
+            b[0] = min(capacity, b[0] + (now - b[1]) * rate)
+            b[1] = now
+            self.buckets.move_to_end(key)
+        if b[0] >= 1.0:
+            b[0] -= 1.0
+            wait = 0.0
+        else:
+            wait = (1.0 - b[0]) / rate
+        self._evict(now)
+        return wait
+
+    def _evict(self, now: float) -> None:
+        while len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.sweep_interval_sec
+        cutoff = now - self.idle_sec
+        while self.buckets:
+            oldest = next(iter(self.buckets.values()))
+            if oldest[1] > cutoff:
+                break
+            self.buckets.popitem(last=False)
+
+class SQLiteTokenBuckets:
+    """
+    Token buckets in a local SQLite file (WAL mode) shared by every worker on the host.
+
+    One UPSERT per request refills and consumes atomically under SQLite's write lock,
+    so N uvicorn workers enforce a single budget per key, and state survives restarts.
+    Durability is irrelevant for limiter state, hence ``synchronous=OFF``: a commit is a
+    WAL append without fsync. Timestamps are wall-clock so all processes agree.
 
-    Intended for pilot environments only (single instance). Configure via:
+    If the database is unavailable the limiter fails open (request allowed, error logged).
+    ``take`` runs inline on the event loop (an UPSERT is ~20 µs, far less than a hop to
+    a worker thread), so ``busy_timeout_ms`` is kept short (20 ms by default): a worker
+    that cannot get SQLite's lock by then lets the request through rather than stall
+    its loop. Each thread keeps its own connection.
+    """
+    _UPSERT = (
+        "INSERT INTO rate_buckets (k, tokens, ts, allowed) VALUES (:k, :cap - 1, :now, :cap >= 1) "
+        "ON CONFLICT(k) DO UPDATE SET "
+        "tokens = MIN(:cap, tokens + MAX(0, :now - ts) * :rate) - (MIN(:cap, tokens + MAX(0, :now - ts) * :rate) >= 1), "
+        "allowed = MIN(:cap, tokens + MAX(0, :now - ts) * :rate) >= 1, "
+        "ts = :now "
+        "RETURNING tokens, allowed"
+    )
+
+    def __init__(self, path: str, max_keys: int = 100_000, idle_sec: float = 60.0,
+                 sweep_interval_sec: float = 30.0, busy_timeout_ms: int = 20):
+        self.path = str(path)
+        self.max_keys = max(1, max_keys)
+        self.idle_sec = idle_sec
+        self.sweep_interval_sec = sweep_interval_sec
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._next_sweep = 0.0
+
+    clock = staticmethod(time.time)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            # setup happens once per thread and may race other workers doing theirs: wait longer
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=1.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("CREATE TABLE IF NOT EXISTS rate_buckets (k TEXT PRIMARY KEY, tokens REAL NOT NULL, "
+                         "ts REAL NOT NULL, allowed INTEGER NOT NULL) WITHOUT ROWID")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: Key, rate: float, capacity: float, now: float) -> float:
+        try:
+            conn = self._conn()
+            tokens, allowed = conn.execute(self._UPSERT, {"k": f"{key[0]}|{key[1]}", "cap": capacity,
+                                                          "rate": rate, "now": now}).fetchone()
+            self._evict(conn, now)
+        except sqlite3.Error:
+            logger.exception("rate limit store unavailable; allowing request")
+            return 0.0
+        return 0.0 if allowed else (1.0 - tokens) / rate
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.sweep_interval_sec
+        conn.execute("DELETE FROM rate_buckets WHERE ts < ?", (now - self.idle_sec,))
+        (count,) = conn.execute("SELECT COUNT(*) FROM rate_buckets").fetchone()
+        if count > self.max_keys:
+            conn.execute("DELETE FROM rate_buckets WHERE k IN (SELECT k FROM rate_buckets ORDER BY ts LIMIT ?)",
+                         (count - self.max_keys,))
+
+def build_bucket_store(max_keys: int, idle_sec: float):
+    backend = os.environ.get("SPONSOR_OPS_RATE_LIMIT_BACKEND", "memory").strip().lower()
+    if backend == "memory":
+        return MemoryTokenBuckets(max_keys=max_keys, idle_sec=idle_sec)
+    if backend == "sqlite":
+        default_path = Path(os.environ.get("SPONSOR_OPS_DB", "sponsor_ops.db")).with_name("ratelimit.db")
+        path = os.environ.get("SPONSOR_OPS_RATE_LIMIT_DB", str(default_path))
+        busy_ms = int(os.environ.get("SPONSOR_OPS_RATE_LIMIT_BUSY_MS", "20"))
+        return SQLiteTokenBuckets(path, max_keys=max_keys, idle_sec=idle_sec, busy_timeout_ms=busy_ms)
+    raise RuntimeError(f"Unknown SPONSOR_OPS_RATE_LIMIT_BACKEND: {backend!r} (expected memory|sqlite)")
+
+class SimpleRateLimitMiddleware:
+    """
+    Small token-bucket rate limiter (pure ASGI middleware). Configure via:
       - SPONSOR_OPS_RATE_LIMIT_ENABLED (default: "1")
       - SPONSOR_OPS_RATE_LIMIT_REQUESTS_PER_MIN (default: "240")
       - SPONSOR_OPS_RATE_LIMIT_BURST (default: same as per-min)
+      - SPONSOR_OPS_RATE_LIMIT_MAX_KEYS (default: "100000")
+      - SPONSOR_OPS_RATE_LIMIT_BACKEND (default: "memory"; "sqlite" shares one budget
+        across all workers on the host)
+      - SPONSOR_OPS_RATE_LIMIT_DB (sqlite backend file; default: ratelimit.db next to
+        SPONSOR_OPS_DB)
+      - SPONSOR_OPS_RATE_LIMIT_BUSY_MS (sqlite backend lock wait; default: "20")
 
-    Keying: client IP + path prefix (portal/uploads/login)
+    Keying: client IP + path prefix (portal/uploads/auth). Buckets refill at
+    per-min/60 tokens per second; portal/uploads/auth hold up to BURST tokens,
+    everything else up to per-min.
     """
-    def __init__(self, app):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp, buckets=None):
+        self.app = app
         self.enabled = os.environ.get("SPONSOR_OPS_RATE_LIMIT_ENABLED", "1").strip() == "1"
         self.per_min = int(os.environ.get("SPONSOR_OPS_RATE_LIMIT_REQUESTS_PER_MIN", "240"))
         self.window_sec = 60
         self.burst = int(os.environ.get("SPONSOR_OPS_RATE_LIMIT_BURST", str(self.per_min)))
-        self.buckets: Dict[Tuple[str, str], Deque[float]] = defaultdict(deque)
+        self.rate = max(self.per_min, 1) / self.window_sec
+        max_keys = int(os.environ.get("SPONSOR_OPS_RATE_LIMIT_MAX_KEYS", "100000"))
+        # a bucket idle this long is full again and can be forgotten
+        idle_sec = max(self.burst, self.per_min, 1) / self.rate
+        self.buckets = buckets if buckets is not None else build_bucket_store(max_keys, idle_sec)
 
-    def _bucket_key(self, request: Request) -> Tuple[str, str]:
-        ip = request.client.host if request.client else "unknown"
-        path = request.url.path
+    def _bucket_key(self, scope: Scope) -> Key:
+        client = scope.get("client")
+        ip = client[0] if client else "unknown"
+        path = scope.get("path", "")
+        if path.startswith("/api/"):
+            path = path[4:]
         if path.startswith("/portal"):
             group = "portal"
         elif path.startswith("/uploads"):
@@ -41,24 +198,18 @@ class SimpleRateLimitMiddleware(BaseHTTPMiddleware):
             group = "other"
         return (ip, group)
 
-    async def dispatch(self, request: Request, call_next):
-        if not self.enabled:
-            return await call_next(request)
-
-        key = self._bucket_key(request)
-        now = time.time()
-        q = self.buckets[key]
-
-        # drop old entries
-        cutoff = now - self.window_sec
-        while q and q[0] < cutoff:
-            q.popleft()
-
-        limit = self.burst if key[1] in ("auth","portal","uploads") else self.per_min
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
 
-        if len(q) >= limit:
-            return JSONResponse({"detail": "Rate limit exceeded"}, status_code=429)
+        key = self._bucket_key(scope)
+        capacity = self.burst if key[1] in ("auth", "portal", "uploads") else self.per_min
+        wait = self.buckets.take(key, self.rate, capacity, self.buckets.clock())
+        if wait > 0:
+            resp = JSONResponse({"detail": "Rate limit exceeded"}, status_code=429,
+                                headers={"Retry-After": str(max(1, math.ceil(wait)))})
+            await resp(scope, receive, send)
+            return
 
-        q.append(now)
-        resp: Response = await call_next(request)
-        return resp
\ No newline at end of file
+        await self.app(scope, receive, send)
@@ -0,0 +1,128 @@
+"""
+Deal PDF reports for many deals at once, as a streamed zip.
+
+Reports whose current content version is cached (see ``app.reporting``) are added
+straight from the cache. The rest are rendered by ``reporting.render_pdf`` on a process
+pool sized to the machine, since reportlab rendering is CPU-bound and would otherwise
+serialize on the GIL. The request thread only loads each deal's report data, keeping
+at most two renders per worker in flight, and writes every PDF into the zip (and the
+cache) as soon as it is done, so the download starts with the first finished report.
+A deal whose render fails gets a ``deal_<id>.error.txt`` member instead.
+
+Usage:
+  python -m app.report_batch <org_id> [--status active] [--out reports.zip]
+
+Configure via:
+  - SPONSOR_OPS_REPORT_WORKERS (default: CPU count; "0" renders in the calling thread)
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, wait
+from typing import Iterable, Iterator, Optional
+
+from sqlmodel import Session, select
+
+from . import reporting
+from .models import Deal
+from .zipstream import ZipSink
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.environ.get("SPONSOR_OPS_REPORT_WORKERS", str(os.cpu_count() or 1)))
+
+_pool: Optional[Executor] = None
+_lock = threading.Lock()
+
+def _executor() -> Optional[Executor]:
+    global _pool
+    if WORKERS <= 0:
+        return None
+    with _lock:
+        if _pool is None:
+            # spawn: forking a process that runs threads (uvicorn, the DB pool) is unsafe
+            _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def _submit(pool: Optional[Executor], data: dict) -> Future:
+    if pool is not None:
+        return pool.submit(reporting.render_pdf, data)
+    future = Future()
+    try:
+        future.set_result(reporting.render_pdf(data))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+def select_deals(session: Session, organization_id: int, status: Optional[str] = None,
+                 deal_ids: Optional[Iterable[int]] = None) -> list[int]:
+    q = select(Deal.id).where(Deal.organization_id == organization_id, Deal.archived_at.is_(None))
+    if status:
+        q = q.where(Deal.status == status)
+    if deal_ids:
+        q = q.where(Deal.id.in_(list(deal_ids)))
+    return list(session.exec(q.order_by(Deal.id)).all())
+
+def stream_reports(session: Session, deal_ids: Iterable[int]) -> Iterator[bytes]:
+    """Yield a zip with ``deal_<id>.pdf`` for every deal, chunk by chunk."""
+    pool = _executor()
+    max_inflight = 2 * max(WORKERS, 1)
+    inflight: dict[Future, tuple[int, str]] = {}
+    sink = ZipSink()
+
+    def collect(z: zipfile.ZipFile, done: Iterable[Future]) -> None:
+        for future in done:
+            deal_id, version = inflight.pop(future)
+            try:
+                pdf = future.result()
+            except Exception as e:
+                logger.warning("report render failed", extra={"deal_id": deal_id, "error": repr(e)})
+                z.writestr(f"deal_{deal_id}.error.txt", f"Rendering the report failed: {e!r}\n")
+                continue
+            reporting.store_cached(deal_id, version, pdf)
+            z.writestr(f"deal_{deal_id}.pdf", pdf)
+
+    try:
+        with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as z:
+            for deal_id in deal_ids:
+                version = reporting.content_version(session, deal_id)
+                if version is None:
+                    continue
+                path = reporting.cache_path(deal_id, version)
+                if path is not None and path.is_file():
+                    z.write(path, f"deal_{deal_id}.pdf")
+                else:
+                    inflight[_submit(pool, reporting.report_data(session, deal_id))] = (deal_id, version)
+                    if len(inflight) >= max_inflight:
+                        collect(z, wait(inflight, return_when=FIRST_COMPLETED).done)
+                yield from sink.drain()
+            while inflight:
+                collect(z, wait(inflight, return_when=FIRST_COMPLETED).done)
+                yield from sink.drain()
+        yield from sink.drain()
+    finally:
+        for future in inflight:  # client went away: drop queued renders
+            future.cancel()
+
+def main() -> None:
+    from .db import init_db, engine
+
+    parser = argparse.ArgumentParser(prog="python -m app.report_batch")
+    parser.add_argument("organization_id", type=int)
+    parser.add_argument("--status", help="only deals with this status (e.g. active)")
+    parser.add_argument("--out", default="reports.zip")
+    args = parser.parse_args()
+    init_db()
+    with Session(engine) as session, open(args.out, "wb") as f:
+        deal_ids = select_deals(session, args.organization_id, args.status)
+        for chunk in stream_reports(session, deal_ids):
+            f.write(chunk)
+    print(f"Wrote {len(deal_ids)} deal reports to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,90 @@
+"""
+Deal PDF reports.
+
+``report_data`` loads everything a report shows in four queries (proof counts grouped
+per deliverable) into plain values; ``render_pdf`` turns that into PDF bytes without
+touching the database, so it can run in another process.
+
+Rendered PDFs are cached on disk as ``<deal_id>-<version>.pdf``, where the version
+hashes the deal's ``updated_at`` and the row counts and newest ``updated_at`` of its
+deliverables, proofs and claims. Any write to the deal therefore yields a new version,
+on every node, without explicit invalidation; the previous file of the deal is removed
+when the new one is written.
+
+Configure via:
+  - SPONSOR_OPS_REPORT_CACHE_DIR (default: "<SPONSOR_OPS_UPLOAD_ROOT>/report_cache"; "" disables)
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+from io import BytesIO
+from pathlib import Path
+from typing import Optional
+
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
-from io import BytesIO
+from sqlalchemy import func
 from sqlmodel import Session, select
 from .models import Deal, Deliverable, Proof, Claim
+from .storage import UPLOAD_ROOT
 
-def generate_deal_report(session: Session, deal_id: int) -> bytes:
+_cache_dir = os.environ.get("SPONSOR_OPS_REPORT_CACHE_DIR", str(UPLOAD_ROOT / "report_cache"))
+CACHE_DIR = Path(_cache_dir) if _cache_dir else None
+
+_LAYOUT = "1"  # bump when render_pdf changes so cached reports are re-rendered
+
+def content_version(session: Session, deal_id: int) -> Optional[str]:
+    """Hash of everything that changes when the deal's report content can change; None if no deal."""
+    def stats(model, *where, join=None):
+        q = select(func.count(), func.max(model.updated_at)).select_from(model)
+        if join is not None:
+            q = q.join(*join)
+        return q.where(*where)
+
+    deal = session.exec(select(Deal.updated_at).where(Deal.id == deal_id)).first()
+    if deal is None:
+        return None
+    parts = [_LAYOUT, deal]
+    parts += session.exec(stats(Deliverable, Deliverable.deal_id == deal_id)).one()
+    parts += session.exec(stats(Proof, Deliverable.deal_id == deal_id,
+                                join=(Deliverable, Deliverable.id == Proof.deliverable_id))).one()
+    parts += session.exec(stats(Claim, Claim.deal_id == deal_id)).one()
+    return hashlib.sha256("|".join(map(str, parts)).encode()).hexdigest()[:32]
+
+def report_data(session: Session, deal_id: int) -> dict:
     deal = session.get(Deal, deal_id)
     if not deal: raise ValueError("Deal not found")
     deliverables = session.exec(select(Deliverable).where(Deliverable.deal_id==deal_id)).all()
+    proof_counts = dict(session.exec(
+        select(Proof.deliverable_id, func.count())
+        .join(Deliverable, Deliverable.id == Proof.deliverable_id)
+        .where(Deliverable.deal_id == deal_id).group_by(Proof.deliverable_id)
+    ).all())
     claims = session.exec(select(Claim).where(Claim.deal_id==deal_id)).all()
+    return {
+        "deal": deal.model_dump(include={"id", "name", "start_date", "end_date", "guarantee_cap_pct", "cure_days"}),
+        "deliverables": [d.model_dump(include={"id", "status", "title", "type", "due_date"})
+                         | {"proofs": proof_counts.get(d.id, 0)} for d in deliverables],
+        "claims": [cl.model_dump(include={"status", "deliverable_id", "reason", "payout_type", "payout_amount"})
+                   for cl in claims],
+    }
 
+def render_pdf(data: dict) -> bytes:
+    deal, deliverables, claims = data["deal"], data["deliverables"], data["claims"]
     buf = BytesIO()
     c = canvas.Canvas(buf, pagesize=letter)
     width, height = letter
     y = height - 1*inch
     c.setFont("Helvetica-Bold", 16)
-    c.drawString(1*inch, y, f"Sponsor Ops Report: {deal.name}")
+    c.drawString(1*inch, y, f"Sponsor Ops Report: {deal['name']}")
     y -= 0.4*inch
     c.setFont("Helvetica", 10)
-    c.drawString(1*inch, y, f"Dates: {deal.start_date} - {deal.end_date}")
+    c.drawString(1*inch, y, f"Dates: {deal['start_date']} - {deal['end_date']}")
     y -= 0.25*inch
-    c.drawString(1*inch, y, f"Guarantee cap: {deal.guarantee_cap_pct*100:.0f}% | cure {deal.cure_days} days")
+    c.drawString(1*inch, y, f"Guarantee cap: {deal['guarantee_cap_pct']*100:.0f}% | cure {deal['cure_days']} days")
     y -= 0.4*inch
     c.setFont("Helvetica-Bold", 12)
     c.drawString(1*inch, y, "Deliverables")
@@ -30,8 +93,7 @@ def generate_deal_report(session: Session, deal_id: int) -> bytes:
     for d in deliverables:
         if y < 1*inch:
             c.showPage(); y = height - 1*inch; c.setFont("Helvetica", 9)
-        proofs = session.exec(select(Proof).where(Proof.deliverable_id==d.id)).all()
-        c.drawString(1*inch, y, f"- [{d.status}] {d.title} ({d.type}) due {d.due_date} | proofs: {len(proofs)}")
+        c.drawString(1*inch, y, f"- [{d['status']}] {d['title']} ({d['type']}) due {d['due_date']} | proofs: {d['proofs']}")
         y -= 0.16*inch
     y -= 0.25*inch
     c.setFont("Helvetica-Bold", 12)
@@ -44,7 +106,39 @@ def generate_deal_report(session: Session, deal_id: int) -> bytes:
         for cl in claims:
             if y < 1*inch:
                 c.showPage(); y = height - 1*inch; c.setFont("Helvetica", 9)
-            c.drawString(1*inch, y, f"- [{cl.status}] deliverable_id={cl.deliverable_id} reason={cl.reason} payout={cl.payout_type}:{cl.payout_amount}")
+            c.drawString(1*inch, y, f"- [{cl['status']}] deliverable_id={cl['deliverable_id']} reason={cl['reason']} payout={cl['payout_type']}:{cl['payout_amount']}")
             y -= 0.16*inch
     c.showPage(); c.save()
-    return buf.getvalue()
\ No newline at end of file
+    return buf.getvalue()
+
+def generate_deal_report(session: Session, deal_id: int) -> bytes:
+    return render_pdf(report_data(session, deal_id))
+
+def cache_path(deal_id: int, version: str) -> Optional[Path]:
+    return CACHE_DIR / f"{deal_id}-{version}.pdf" if CACHE_DIR else None
+
+def store_cached(deal_id: int, version: str, pdf: bytes) -> None:
+    """Write a rendered report to the cache and drop older versions of the deal."""
+    path = cache_path(deal_id, version)
+    if path is None:
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".report-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(pdf)
+    os.replace(tmp, path)
+    for old in path.parent.glob(f"{deal_id}-*.pdf"):
+        if old != path:
+            old.unlink(missing_ok=True)
+
+def cached_deal_report(session: Session, deal_id: int, version: Optional[str] = None) -> tuple[bytes, str]:
+    """(pdf, version) for the deal, rendered only if the current version is not cached."""
+    version = version or content_version(session, deal_id)
+    if version is None:
+        raise ValueError("Deal not found")
+    path = cache_path(deal_id, version)
+    if path is not None and path.is_file():
+        return path.read_bytes(), version
+    pdf = generate_deal_report(session, deal_id)
+    store_cached(deal_id, version, pdf)
+    return pdf, version
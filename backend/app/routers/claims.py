@@ -5,6 +5,7 @@ from sqlmodel import Session, select
 from ..db import get_session
 from ..deps import get_current_user, get_current_org_id, require_org_role
 from ..models import Claim
+from ..pagination import Page, page_params, paginate
 from ..schemas import ClaimDecision, ClaimUpdate
 
 router = APIRouter(prefix="/api/claims", tags=["claims"])
@@ -14,6 +15,7 @@ _ALLOWED_STATUS = {"submitted", "approved", "denied", "paid"}
 @router.get("/")
 def list_claims(
     include_archived: bool = Query(False),
+    page: Page = Depends(page_params()),
     session: Session = Depends(get_session),
     user=Depends(get_current_user),
     org_id: int = Depends(get_current_org_id),
@@ -22,7 +24,7 @@ def list_claims(
     q = select(Claim).where(Claim.organization_id == org_id)
     if not include_archived:
         q = q.where(Claim.archived_at.is_(None))
-    return session.exec(q.order_by(Claim.created_at.desc())).all()
+    return paginate(session, q, page, Claim.created_at, desc=True)
 
 @router.patch("/{claim_id}")
 def update_claim(claim_id: int, payload: ClaimUpdate, session: Session = Depends(get_session), user=Depends(get_current_user)):
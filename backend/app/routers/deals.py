@@ -1,13 +1,13 @@
-import json, os, re, secrets
+import json, secrets
 from datetime import datetime, timedelta
-from pathlib import Path
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlmodel import Session, select
 
 from ..db import get_session
 from ..deps import get_current_user, require_org_role, org_id_for_deal
 from ..models import Deal, Sponsor, Deliverable, Proof, Claim, BrandKit, DeliverableComment, User
+from ..pagination import Page, page_params, paginate
 from ..schemas import (
     DealCreate,
     DealUpdate,
@@ -20,23 +20,11 @@ from ..schemas import (
     CommentCreate,
     ApplyTemplate,
 )
+from ..proof_files import receive_upload
 from ..services import log_activity
 
 router = APIRouter(prefix="/api/deals", tags=["deals"])
 
-UPLOAD_ROOT = Path(os.environ.get("SPONSOR_OPS_UPLOAD_ROOT","uploads"))
-MAX_UPLOAD_MB = int(os.environ.get("SPONSOR_OPS_MAX_UPLOAD_MB","50"))
-MAX_UPLOAD_BYTES = MAX_UPLOAD_MB * 1024 * 1024
-
-ALLOWED_MIME = {"image/png","image/jpeg","application/pdf","video/mp4"}
-ALLOWED_EXT = {".png",".jpg",".jpeg",".pdf",".mp4"}
-_filename_strip = re.compile(r"[^a-zA-Z0-9._-]+")
-
-def _safe_original_name(name: str) -> str:
-    name = (name or "proof").strip().replace("\\","_").replace("/","_")
-    name = _filename_strip.sub("_", name)
-    return (name[:180] or "proof")
-
 def _ensure_deal_access(session: Session, user, deal_id: int, min_role: str="viewer") -> int:
     org_id = org_id_for_deal(session, deal_id)
     require_org_role(session, user, org_id, min_role=min_role)
@@ -143,6 +131,7 @@ def unarchive_deal(deal_id: int, session: Session = Depends(get_session), user=D
 def list_deliverables(
     deal_id: int,
     include_archived: bool = False,
+    page: Page = Depends(page_params()),
     session: Session = Depends(get_session),
     user=Depends(get_current_user),
 ):
@@ -150,7 +139,7 @@ def list_deliverables(
     q = select(Deliverable).where(Deliverable.deal_id == deal_id)
     if not include_archived:
         q = q.where(Deliverable.archived_at.is_(None))
-    return session.exec(q.order_by(Deliverable.due_date.asc())).all()
+    return paginate(session, q, page, Deliverable.due_date)
 
 @router.post("/{deal_id}/deliverables")
 def create_deliverable(deal_id: int, payload: DeliverableCreate, session: Session = Depends(get_session), user=Depends(get_current_user)):
@@ -241,49 +230,33 @@ def add_proof_link(deliverable_id: int, payload: ProofCreate, session: Session =
     return p
 
 @router.get("/deliverables/{deliverable_id}/proofs")
-def list_proofs(deliverable_id: int, session: Session = Depends(get_session), user=Depends(get_current_user)):
+def list_proofs(deliverable_id: int, page: Page = Depends(page_params()), session: Session = Depends(get_session), user=Depends(get_current_user)):
     d = session.get(Deliverable, deliverable_id)
     if not d: raise HTTPException(status_code=404, detail="Deliverable not found")
     _ensure_deal_access(session, user, d.deal_id, "viewer")
-    return session.exec(select(Proof).where(Proof.deliverable_id==deliverable_id).order_by(Proof.created_at.desc())).all()
+    return paginate(session, select(Proof).where(Proof.deliverable_id==deliverable_id), page, Proof.created_at, desc=True)
 
 @router.post("/deliverables/{deliverable_id}/proofs/upload")
 async def upload_proof_file(
     deliverable_id: int,
     request: Request,
-    file: UploadFile = File(...),
-    note: str = Form(""),
     session: Session = Depends(get_session),
     user=Depends(get_current_user),
 ):
+    """multipart/form-data: ``file`` plus an optional ``note``."""
     d = session.get(Deliverable, deliverable_id)
     if not d: raise HTTPException(status_code=404, detail="Deliverable not found")
     org_id = _ensure_deal_access(session, user, d.deal_id, "editor")
 
-    UPLOAD_ROOT.mkdir(parents=True, exist_ok=True)
-    subdir = UPLOAD_ROOT / str(deliverable_id)
-    subdir.mkdir(parents=True, exist_ok=True)
-
-    orig = _safe_original_name(file.filename or "proof")
-    ext = Path(orig).suffix.lower()
-    ct = (file.content_type or "").lower().strip()
-    if ct not in ALLOWED_MIME: raise HTTPException(status_code=400, detail=f"Unsupported file type: {file.content_type}")
-    if ext not in ALLOWED_EXT: raise HTTPException(status_code=400, detail=f"Unsupported file extension: {ext}")
-
-    content = await file.read()
-    if len(content) > MAX_UPLOAD_BYTES:
-        raise HTTPException(status_code=413, detail=f"File too large. Max {MAX_UPLOAD_MB}MB")
-
-    ts = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-    rnd = secrets.token_urlsafe(16).replace("-","").replace("_","")
-    dest = subdir / f"{ts}_{rnd}{ext}"
-    dest.write_bytes(content)
-    rel = str(dest.relative_to(UPLOAD_ROOT).as_posix())
+    async with receive_upload(request) as upload:
+        stored = await upload.store()
 
-    p = Proof(deliverable_id=deliverable_id, kind="file", note=note or None, file_path=rel, file_name=orig, mime_type=file.content_type)
+    p = Proof(deliverable_id=deliverable_id, kind="file", note=upload.fields.get("note") or None, file_path=stored.rel_path, file_name=stored.file_name,
+              mime_type=stored.mime_type, size_bytes=stored.size_bytes, sha256=stored.sha256)
     session.add(p); session.commit(); session.refresh(p)
 
     log_activity(session, org_id, "proof", "uploaded", f"Proof file uploaded for deliverable: {d.title}", actor=user.email, deal_id=d.deal_id, entity_id=p.id)
+    session.refresh(p)  # log_activity's commit expired it
     return p
 
 @router.get("/deliverables/{deliverable_id}/comments")
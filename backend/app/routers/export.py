@@ -1,54 +1,69 @@
-import io, json, zipfile
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select
-from ..db import get_session
+from .. import export_jobs, org_export
+from ..changes import decode_cursor
+from ..db import get_session, engine
 from ..deps import get_current_user, get_current_org_id, require_org_role
-from ..models import Organization, OrganizationMember, User, Sponsor, Deal, Deliverable, Proof, Ticket, TicketMessage, Claim
+from ..file_responses import file_response
+from ..models import ExportJob, Organization
+from ..storage import get_storage
 
 router = APIRouter(prefix="/api/export", tags=["export"])
 
-def _json(obj):
-    if hasattr(obj, "model_dump"): return obj.model_dump()
-    if hasattr(obj, "dict"): return obj.dict()
-    return obj
+def _stream_org_zip(org_id: int, since=None):
+    # the request session is gone once streaming starts; the archive reads with its own
+    with Session(engine) as session:
+        yield from org_export.stream_org_zip(session, org_id, since)
 
 @router.get("/org.zip")
 def export_org_zip(session: Session = Depends(get_session), user=Depends(get_current_user), org_id: int = Depends(get_current_org_id)):
     require_org_role(session, user, org_id, "manager")
     org = session.get(Organization, org_id)
     if not org: raise HTTPException(status_code=404, detail="Organization not found")
+    return StreamingResponse(_stream_org_zip(org_id), media_type="application/zip",
+                             headers={"Content-Disposition": f"attachment; filename=org_{org_id}_export.zip"})
 
-    members = session.exec(select(OrganizationMember).where(OrganizationMember.organization_id==org_id)).all()
-    users = session.exec(select(User).where(User.id.in_([m.user_id for m in members]))).all() if members else []
-    sponsors = session.exec(select(Sponsor).where(Sponsor.organization_id==org_id)).all()
-    sponsor_ids = [s.id for s in sponsors]
-    deals = session.exec(select(Deal).where(Deal.sponsor_id.in_(sponsor_ids))).all() if sponsor_ids else []
-    deal_ids = [d.id for d in deals]
-    deliverables = session.exec(select(Deliverable).where(Deliverable.deal_id.in_(deal_ids))).all() if deal_ids else []
-    deliverable_ids = [d.id for d in deliverables]
-    proofs = session.exec(select(Proof).where(Proof.deliverable_id.in_(deliverable_ids))).all() if deliverable_ids else []
-    tickets = session.exec(select(Ticket).where(Ticket.organization_id==org_id)).all()
-    messages = session.exec(select(TicketMessage).where(TicketMessage.ticket_id.in_([t.id for t in tickets]))).all() if tickets else []
-    claims = session.exec(select(Claim).where(Claim.organization_id==org_id)).all()
-
-    payload = {
-        "exported_at": datetime.utcnow().isoformat()+"Z",
-        "org": _json(org),
-        "memberships": [_json(m) for m in members],
-        "users": [_json(u) for u in users],
-        "sponsors": [_json(s) for s in sponsors],
-        "deals": [_json(d) for d in deals],
-        "deliverables": [_json(d) for d in deliverables],
-        "proofs": [_json(p) for p in proofs],
-        "tickets": [_json(t) for t in tickets],
-        "ticket_messages": [_json(m) for m in messages],
-        "claims": [_json(c) for c in claims],
-    }
-
-    mem = io.BytesIO()
-    with zipfile.ZipFile(mem, "w", zipfile.ZIP_DEFLATED) as z:
-        z.writestr("org_export.json", json.dumps(payload, indent=2, default=str))
-    mem.seek(0)
-    return Response(content=mem.getvalue(), media_type="application/zip",
-                    headers={"Content-Disposition": f"attachment; filename=org_{org_id}_export.zip"})
\ No newline at end of file
+@router.get("/delta.zip")
+def export_delta_zip(since: str, session: Session = Depends(get_session), user=Depends(get_current_user), org_id: int = Depends(get_current_org_id)):
+    """Rows changed after ``since`` (the ``cursor`` of a previous export's export.json)."""
+    require_org_role(session, user, org_id, "manager")
+    changed_after = decode_cursor(since)
+    return StreamingResponse(_stream_org_zip(org_id, changed_after), media_type="application/zip",
+                             headers={"Content-Disposition": f"attachment; filename=org_{org_id}_delta.zip"})
+
+# --- full exports with proof files (app.export_jobs) ------------------------------
+
+def _job(session: Session, org_id: int, job_id: int) -> ExportJob:
+    job = session.get(ExportJob, job_id)
+    if not job or job.organization_id != org_id:
+        raise HTTPException(status_code=404, detail="Export not found")
+    return job
+
+@router.post("/jobs", status_code=202)
+def create_export_job(session: Session = Depends(get_session), user=Depends(get_current_user), org_id: int = Depends(get_current_org_id)):
+    require_org_role(session, user, org_id, "manager")
+    return export_jobs.state(export_jobs.create(session, org_id, user.id))
+
+@router.get("/jobs")
+def list_export_jobs(session: Session = Depends(get_session), user=Depends(get_current_user), org_id: int = Depends(get_current_org_id)):
+    require_org_role(session, user, org_id, "manager")
+    jobs = session.exec(select(ExportJob).where(ExportJob.organization_id == org_id)
+                        .order_by(ExportJob.id.desc()).limit(20)).all()
+    return [export_jobs.state(j) for j in jobs]
+
+@router.get("/jobs/{job_id}")
+def get_export_job(job_id: int, session: Session = Depends(get_session), user=Depends(get_current_user), org_id: int = Depends(get_current_org_id)):
+    require_org_role(session, user, org_id, "manager")
+    return export_jobs.state(_job(session, org_id, job_id))
+
+@router.get("/jobs/{job_id}/download")
+def download_export_job(job_id: int, request: Request, session: Session = Depends(get_session), user=Depends(get_current_user), org_id: int = Depends(get_current_org_id)):
+    require_org_role(session, user, org_id, "manager")
+    job = _job(session, org_id, job_id)
+    info = get_storage().stat(job.artifact_key) if job.status == "done" and job.artifact_key else None
+    if info is None:
+        raise HTTPException(status_code=409 if job.status in export_jobs.ACTIVE else 404,
+                            detail=f"Export is {job.status}")
+    return file_response(request, job.artifact_key, info, media_type="application/zip",
+                         filename=f"org_{org_id}_export_{job.id}.zip")
@@ -0,0 +1,53 @@
+import codecs
+
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
+
+from .. import bulk_import
+from ..db import get_session
+from ..deps import get_current_user, get_current_org_id, require_org_role
+
+router = APIRouter(prefix="/api/import", tags=["import"])
+
+_NDJSON_TYPES = ("application/x-ndjson", "application/jsonl", "application/json")
+
+def _body_lines(request: Request):
+    """Lines of the request body, pulled from the event loop as the importer consumes them.
+    Runs in a worker thread (the importer's), so memory holds one chunk, not the upload."""
+    chunks = request.stream()
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    while True:
+        try:
+            chunk = anyio.from_thread.run(chunks.__anext__)
+        except StopAsyncIteration:
+            break
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+@router.post("/{kind}")
+async def bulk_import_rows(
+    kind: str,
+    request: Request,
+    format: str | None = None,
+    session: Session = Depends(get_session),
+    user=Depends(get_current_user),
+    org_id: int = Depends(get_current_org_id),
+):
+    """Import sponsors, deals or deliverables from a CSV or NDJSON body (see app.bulk_import)."""
+    require_org_role(session, user, org_id, "editor")
+    if kind not in bulk_import.KINDS:
+        raise HTTPException(status_code=404, detail="Unknown import kind")
+    if format is None:
+        content_type = (request.headers.get("content-type") or "").split(";")[0].strip().lower()
+        format = "ndjson" if content_type in _NDJSON_TYPES else "csv"
+    if format not in bulk_import.FORMATS:
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    return await run_in_threadpool(bulk_import.run, session, org_id, kind, _body_lines(request), format, user.email)
@@ -1,21 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session, select
-from ..db import get_session
+from sqlalchemy import update
+from .. import scheduler, unread_counts
+from ..db import get_session, record_changes
 from ..deps import get_current_user, get_current_org_id, require_org_role
 from ..models import Notification
+from ..pagination import Page, page_params, paginate
 from ..schemas import MarkRead
 from ..services import sync_notifications_for_org
 
 router = APIRouter(prefix="/api/notifications", tags=["notifications"])
 
 @router.get("/")
-def list_notifications(org_id: int | None=None, limit: int=200, session: Session = Depends(get_session),
+def list_notifications(org_id: int | None=None, page: Page = Depends(page_params(200)), session: Session = Depends(get_session),
                        user=Depends(get_current_user), org_ctx: int = Depends(get_current_org_id)):
     if org_id is not None and org_id != org_ctx: raise HTTPException(status_code=404, detail="Not found")
     org_id = org_ctx
     require_org_role(session, user, org_id, "viewer")
-    stmt = select(Notification).where(Notification.organization_id==org_id, Notification.user_id==user.id).order_by(Notification.created_at.desc()).limit(max(1, min(limit, 500)))
-    return session.exec(stmt).all()
+    stmt = select(Notification).where(Notification.organization_id==org_id, Notification.user_id==user.id)
+    return paginate(session, stmt, page, Notification.created_at, desc=True)
 
 @router.post("/sync")
 def sync_notifications(org_id: int | None=None, session: Session = Depends(get_session),
@@ -23,7 +26,24 @@ def sync_notifications(org_id: int | None=None, session: Session = Depends(get_s
     if org_id is not None and org_id != org_ctx: raise HTTPException(status_code=404, detail="Not found")
     org_id = org_ctx
     require_org_role(session, user, org_id, "viewer")
-    return sync_notifications_for_org(session, org_id, user.id)
+    if scheduler.MODE != "off":  # the scheduler keeps every member's notifications current
+        return {"created": 0}
+    return sync_notifications_for_org(session, org_id, user.id, scheduler.DUE_SOON_DAYS)
+
+@router.get("/unread-count")
+def unread_count(session: Session = Depends(get_session), user=Depends(get_current_user),
+                 org_id: int = Depends(get_current_org_id)):
+    require_org_role(session, user, org_id, "viewer")
+    return {"unread": unread_counts.unread_count(session, org_id, user.id)}
+
+def _mark_read(session: Session, org_id: int, user_id: int, ids: list[int] | None=None) -> dict:
+    stmt = update(Notification).where(Notification.organization_id==org_id, Notification.user_id==user_id, Notification.is_read==False)
+    if ids is not None:
+        stmt = stmt.where(Notification.id.in_(ids))
+    rows = session.exec(stmt.values(is_read=True).returning(*Notification.__table__.c)).mappings().all()
+    record_changes(session, [(Notification, dict(r)) for r in rows])
+    session.commit()
+    return {"ok": True, "updated": len(rows)}
 
 @router.post("/mark-read")
 def mark_read(payload: MarkRead, org_id: int | None=None, session: Session = Depends(get_session),
@@ -33,9 +53,10 @@ def mark_read(payload: MarkRead, org_id: int | None=None, session: Session = Dep
     require_org_role(session, user, org_id, "viewer")
     ids = list({int(i) for i in payload.ids})
     if not ids: return {"ok": True, "updated": 0}
-    notes = session.exec(select(Notification).where(Notification.organization_id==org_id, Notification.user_id==user.id, Notification.id.in_(ids))).all()
-    for n in notes:
-        n.is_read = True
-        session.add(n)
-    session.commit()
-    return {"ok": True, "updated": len(notes)}
\ No newline at end of file
+    return _mark_read(session, org_id, user.id, ids)
+
+@router.post("/mark-all-read")
+def mark_all_read(session: Session = Depends(get_session), user=Depends(get_current_user),
+                  org_id: int = Depends(get_current_org_id)):
+    require_org_role(session, user, org_id, "viewer")
+    return _mark_read(session, org_id, user.id)
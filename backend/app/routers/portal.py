@@ -1,13 +1,15 @@
 from __future__ import annotations
 
 from datetime import datetime
-from pathlib import Path
-import os
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlmodel import Session, select
 
-from ..db import get_session
+from .. import portal_cache
+from ..changes import decode_cursor, next_cursor
+from ..db import get_session, engine
+from ..proof_files import receive_upload
+from ..pubsub import sse_response
 from ..models import (
     Sponsor, Deal, Deliverable, Proof, Ticket, TicketMessage, Claim, DeliverableComment, BrandKit
 )
@@ -18,20 +20,6 @@ from ..schemas import (
 
 router = APIRouter(prefix="/api/portal", tags=["portal"])
 
-UPLOAD_ROOT = Path(os.environ.get("SPONSOR_OPS_UPLOAD_ROOT", "uploads"))
-MAX_UPLOAD_MB = int(os.environ.get("SPONSOR_OPS_MAX_UPLOAD_MB", "50"))
-MAX_UPLOAD_BYTES = MAX_UPLOAD_MB * 1024 * 1024
-ALLOWED_MIME = {"image/png", "image/jpeg", "application/pdf", "video/mp4"}
-
-
-def _safe_original_name(name: str) -> str:
-    # drop any path components and normalize weird chars
-    name = (name or "proof").replace("\\", "/").split("/")[-1]
-    name = "".join(ch for ch in name if ch.isalnum() or ch in ("-", "_", ".", " ", "(", ")", "[", "]"))
-    name = name.strip().replace(" ", "_")
-    return name[:140] or "proof"
-
-
 def _get_sponsor_by_token(session: Session, sponsor_token: str) -> Sponsor:
     sponsor = session.exec(select(Sponsor).where(Sponsor.portal_token == sponsor_token)).first()
     if not sponsor:
@@ -73,10 +61,79 @@ def sponsor_portal(token: str, session: Session = Depends(get_session)):
 
 
 @router.get("/deal/{token}")
-def deal_portal(token: str, session: Session = Depends(get_session)):
-    """Deal portal view (no login). Returns all deal-relevant objects including messages and comments."""
+def deal_portal(token: str, request: Request, since: str | None = None, session: Session = Depends(get_session)):
+    """Deal portal view (no login). Returns all deal-relevant objects including messages and comments.
+
+    The full view is served from a cached snapshot with a strong ETag; If-None-Match gets
+    a 304. The token itself is checked against the database on every request, so a
+    revoked or rotated token stops working at once on every worker.
+
+    Both modes return a ``cursor``; passing it back as ``since`` returns only rows
+    created or modified in transactions committed after it (merge by id, rows may repeat
+    across calls).
+    """
+    if since is not None:
+        changed_after = decode_cursor(since)
+        cursor = next_cursor(session)
+        deal = _get_deal_by_token(session, token)
+        return {**_deal_portal_changes(session, deal, changed_after), "cursor": cursor, "full": False}
+
     deal = _get_deal_by_token(session, token)
+    snap = portal_cache.get(token)
+    if snap is None or snap.deal_id != deal.id:
+        gen = portal_cache.generation()
+        cursor = next_cursor(session)
+        snap = portal_cache.build(deal, {**_deal_portal_payload(session, deal), "cursor": cursor, "full": True})
+        portal_cache.store(token, snap, gen)
+    return portal_cache.respond(request, snap)
+
+
+def _deal_portal_changes(session: Session, deal: Deal, since: int) -> dict:
+    deliverables = session.exec(
+        select(Deliverable).where(Deliverable.deal_id == deal.id, Deliverable.change_seq > since)
+    ).all()
 
+    proofs = session.exec(
+        select(Proof)
+        .join(Deliverable, Proof.deliverable_id == Deliverable.id)
+        .where(Deliverable.deal_id == deal.id, Proof.change_seq > since)
+    ).all()
+
+    comments = session.exec(
+        select(DeliverableComment)
+        .join(Deliverable, DeliverableComment.deliverable_id == Deliverable.id)
+        .where(Deliverable.deal_id == deal.id, DeliverableComment.change_seq > since)
+        .order_by(DeliverableComment.created_at.asc())
+    ).all()
+
+    claims = session.exec(select(Claim).where(Claim.deal_id == deal.id, Claim.change_seq > since)).all()
+
+    tickets = session.exec(
+        select(Ticket).where(Ticket.deal_id == deal.id, Ticket.change_seq > since).order_by(Ticket.created_at.desc())
+    ).all()
+
+    ticket_messages = session.exec(
+        select(TicketMessage)
+        .join(Ticket, TicketMessage.ticket_id == Ticket.id)
+        .where(Ticket.deal_id == deal.id, TicketMessage.change_seq > since)
+        .order_by(TicketMessage.created_at.asc())
+    ).all()
+
+    bk = session.exec(select(BrandKit).where(BrandKit.deal_id == deal.id, BrandKit.change_seq > since)).first()
+
+    return {
+        "deal": deal if deal.change_seq > since else None,
+        "deliverables": deliverables,
+        "proofs": proofs,
+        "comments": comments,
+        "brandkit": bk,
+        "claims": claims,
+        "tickets": tickets,
+        "ticket_messages": ticket_messages,
+    }
+
+
+def _deal_portal_payload(session: Session, deal: Deal) -> dict:
     deliverables = session.exec(select(Deliverable).where(Deliverable.deal_id == deal.id)).all()
 
     proofs = session.exec(
@@ -159,6 +216,30 @@ def get_ticket(ticket_id: int, sponsor_token: str, deal_token: str | None = None
     return {"ticket": t, "messages": msgs}
 
 
+@router.get("/ticket/{ticket_id}/events")
+def ticket_events(ticket_id: int, request: Request, sponsor_token: str, deal_token: str | None = None,
+                  last_id: int = 0, session: Session = Depends(get_session)):
+    """Server-Sent Events: pushes new ticket messages (event ``message``) as they are committed."""
+    sponsor = _get_sponsor_by_token(session, sponsor_token)
+    t = session.get(Ticket, ticket_id)
+    if not t:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    _ensure_ticket_access_by_sponsor_token(session, sponsor, t, deal_token=deal_token)
+
+    def catch_up(after_id: int) -> list[dict]:
+        with Session(engine) as s:
+            sp = _get_sponsor_by_token(s, sponsor_token)
+            tk = s.get(Ticket, ticket_id)
+            if not tk:
+                raise HTTPException(status_code=404, detail="Ticket not found")
+            _ensure_ticket_access_by_sponsor_token(s, sp, tk, deal_token=deal_token)
+            msgs = s.exec(select(TicketMessage).where(TicketMessage.ticket_id == ticket_id, TicketMessage.id > after_id)
+                          .order_by(TicketMessage.id.asc())).all()
+            return [m.model_dump() for m in msgs]
+
+    return sse_response(request, f"ticket:{ticket_id}", "message", catch_up, last_id)
+
+
 @router.post("/ticket/{ticket_id}/reply")
 def reply_ticket(ticket_id: int, payload: PortalTicketReply, session: Session = Depends(get_session)):
     sponsor = _get_sponsor_by_token(session, payload.sponsor_token)
@@ -236,6 +317,31 @@ def list_deliverable_comments(deliverable_id: int, deal_token: str, session: Ses
     ).all()
 
 
+@router.get("/deliverables/{deliverable_id}/comments/events")
+def deliverable_comment_events(deliverable_id: int, request: Request, deal_token: str, last_id: int = 0,
+                               session: Session = Depends(get_session)):
+    """Server-Sent Events: pushes new deliverable comments (event ``comment``) as they are committed."""
+    deal = _get_deal_by_token(session, deal_token)
+    d = session.get(Deliverable, deliverable_id)
+    if not d or d.deal_id != deal.id:
+        raise HTTPException(status_code=404, detail="Deliverable not found")
+    deal_id = deal.id
+
+    def catch_up(after_id: int) -> list[dict]:
+        with Session(engine) as s:
+            dl = _get_deal_by_token(s, deal_token)
+            if dl.id != deal_id:
+                raise HTTPException(status_code=404, detail="Deliverable not found")
+            comments = s.exec(
+                select(DeliverableComment)
+                .where(DeliverableComment.deliverable_id == deliverable_id, DeliverableComment.id > after_id)
+                .order_by(DeliverableComment.id.asc())
+            ).all()
+            return [c.model_dump() for c in comments]
+
+    return sse_response(request, f"deliverable:{deliverable_id}", "comment", catch_up, last_id)
+
+
 @router.post("/deliverables/{deliverable_id}/comments")
 def add_deliverable_comment(deliverable_id: int, payload: PortalDeliverableComment, session: Session = Depends(get_session)):
     deal = _get_deal_by_token(session, payload.deal_token)
@@ -275,66 +381,28 @@ def add_proof_link_portal(deliverable_id: int, payload: PortalProofLink, session
 async def upload_proof_file_portal(
     deliverable_id: int,
     request: Request,
-    file: UploadFile = File(...),
-    note: str = Form(""),
-    deal_token: str = Form(...),
     session: Session = Depends(get_session),
 ):
-    deal = _get_deal_by_token(session, deal_token)
-    d = session.get(Deliverable, deliverable_id)
-    if not d or d.deal_id != deal.id:
-        raise HTTPException(status_code=404, detail="Deliverable not found")
+    """multipart/form-data: ``file``, ``deal_token`` and an optional ``note``."""
+    async with receive_upload(request) as upload:
+        deal_token = upload.fields.get("deal_token")
+        if not deal_token:
+            raise HTTPException(status_code=422, detail="deal_token is required")
+        deal = _get_deal_by_token(session, deal_token)
+        d = session.get(Deliverable, deliverable_id)
+        if not d or d.deal_id != deal.id:
+            raise HTTPException(status_code=404, detail="Deliverable not found")
+        stored = await upload.store()
 
-    # size guard (best-effort; depends on server/proxy)
-    cl = request.headers.get("content-length")
-    if cl:
-        try:
-            if int(cl) > MAX_UPLOAD_BYTES + 1024 * 1024:
-                raise HTTPException(status_code=413, detail=f"Upload too large (max {MAX_UPLOAD_MB}MB)")
-        except ValueError:
-            pass
-
-    UPLOAD_ROOT.mkdir(parents=True, exist_ok=True)
-    subdir = UPLOAD_ROOT / str(deliverable_id)
-    subdir.mkdir(parents=True, exist_ok=True)
-
-    orig = _safe_original_name(file.filename or "proof")
-    ext = Path(orig).suffix.lower()
-    ct = (file.content_type or "").lower().strip()
-    if ct not in ALLOWED_MIME:
-        raise HTTPException(status_code=400, detail=f"Unsupported file type. Allowed: {', '.join(sorted(ALLOWED_MIME))}")
-    if ext in ("", ".", ".."):
-        ext = ""
-    if ext and ext not in (".png", ".jpg", ".jpeg", ".pdf", ".mp4"):
-        raise HTTPException(status_code=400, detail="Unsupported file extension")
-
-    ts = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-    dest = subdir / f"{ts}_{orig}"
-
-    # stream read with hard cap
-    total = 0
-    with dest.open("wb") as f:
-        while True:
-            chunk = await file.read(1024 * 1024)
-            if not chunk:
-                break
-            total += len(chunk)
-            if total > MAX_UPLOAD_BYTES:
-                try:
-                    dest.unlink(missing_ok=True)
-                except Exception:
-                    pass
-                raise HTTPException(status_code=413, detail=f"Upload too large (max {MAX_UPLOAD_MB}MB)")
-            f.write(chunk)
-
-    rel = str(dest.as_posix())
     p = Proof(
         deliverable_id=deliverable_id,
         kind="file",
-        note=note or None,
-        file_path=rel,
-        file_name=orig,
-        mime_type=ct,
+        note=upload.fields.get("note") or None,
+        file_path=stored.rel_path,
+        file_name=stored.file_name,
+        mime_type=stored.mime_type,
+        size_bytes=stored.size_bytes,
+        sha256=stored.sha256,
     )
     session.add(p)
     session.commit()
@@ -344,5 +412,6 @@ async def upload_proof_file_portal(
         d.status = "proofed"
         session.add(d)
         session.commit()
+        session.refresh(p)
 
     return p
\ No newline at end of file
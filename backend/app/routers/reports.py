@@ -1,17 +1,46 @@
-from fastapi import APIRouter, Depends, Response, HTTPException
+from fastapi import APIRouter, Depends, Query, Request, Response, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session
-from ..db import get_session
-from ..deps import get_current_user, require_org_role, org_id_for_deal
-from ..reporting import generate_deal_report
+from .. import report_batch
+from ..db import get_session, engine
+from ..deps import get_current_user, get_current_org_id, require_org_role, org_id_for_deal
+from ..http_cache import if_none_match
+from ..reporting import cached_deal_report, content_version
 
 router = APIRouter(prefix="/api/reports", tags=["reports"])
 
 @router.get("/deal/{deal_id}.pdf")
-def deal_pdf(deal_id: int, session: Session = Depends(get_session), user=Depends(get_current_user)):
+def deal_pdf(deal_id: int, request: Request, session: Session = Depends(get_session), user=Depends(get_current_user)):
     try:
         org_id = org_id_for_deal(session, deal_id)
         require_org_role(session, user, org_id, "viewer")
     except HTTPException:
         raise HTTPException(status_code=404, detail="Deal not found")
-    pdf = generate_deal_report(session, deal_id)
-    return Response(content=pdf, media_type="application/pdf", headers={"Content-Disposition": f"inline; filename=deal_{deal_id}.pdf"})
\ No newline at end of file
+    version = content_version(session, deal_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Deal not found")
+    headers = {"ETag": f'"{version}"', "Cache-Control": "private, no-cache"}
+    if if_none_match(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    pdf, _ = cached_deal_report(session, deal_id, version)
+    return Response(content=pdf, media_type="application/pdf",
+                    headers={**headers, "Content-Disposition": f"inline; filename=deal_{deal_id}.pdf"})
+
+def _stream_reports(deal_ids: list[int]):
+    # the request session is gone once streaming starts
+    with Session(engine) as session:
+        yield from report_batch.stream_reports(session, deal_ids)
+
+@router.get("/deals.zip")
+def deal_pdfs_zip(
+    status: str | None = None,
+    deal_id: list[int] = Query(default=[]),
+    session: Session = Depends(get_session),
+    user=Depends(get_current_user),
+    org_id: int = Depends(get_current_org_id),
+):
+    """PDF reports of the org's deals (optionally by status or id), rendered in parallel."""
+    require_org_role(session, user, org_id, "viewer")
+    deal_ids = report_batch.select_deals(session, org_id, status, deal_id)
+    return StreamingResponse(_stream_reports(deal_ids), media_type="application/zip",
+                             headers={"Content-Disposition": f"attachment; filename=org_{org_id}_reports.zip"})
@@ -5,6 +5,7 @@ from sqlmodel import Session, select
 from ..db import get_session
 from ..deps import get_current_user, get_current_org_id, require_org_role
 from ..models import Sponsor, Organization, Deal
+from ..pagination import Page, page_params, paginate
 from ..schemas import SponsorCreate, SponsorUpdate
 
 router = APIRouter(prefix="/api/sponsors", tags=["sponsors"])
@@ -12,6 +13,7 @@ router = APIRouter(prefix="/api/sponsors", tags=["sponsors"])
 @router.get("/")
 def list_sponsors(
     include_archived: bool = Query(False),
+    page: Page = Depends(page_params()),
     session: Session = Depends(get_session),
     user=Depends(get_current_user),
     org_id: int = Depends(get_current_org_id),
@@ -20,7 +22,7 @@ def list_sponsors(
     q = select(Sponsor).where(Sponsor.organization_id == org_id)
     if not include_archived:
         q = q.where(Sponsor.archived_at.is_(None))
-    return session.exec(q.order_by(Sponsor.name.asc())).all()
+    return paginate(session, q, page, Sponsor.name)
 
 @router.post("/")
 def create_sponsor(payload: SponsorCreate, session: Session = Depends(get_session), user=Depends(get_current_user)):
@@ -79,6 +81,7 @@ def restore_sponsor(sponsor_id: int, session: Session = Depends(get_session), us
 def list_deals(
     sponsor_id: int,
     include_archived: bool = Query(False),
+    page: Page = Depends(page_params()),
     session: Session = Depends(get_session),
     user=Depends(get_current_user),
 ):
@@ -89,4 +92,4 @@ def list_deals(
     q = select(Deal).where(Deal.sponsor_id == sponsor_id)
     if not include_archived:
         q = q.where(Deal.archived_at.is_(None))
-    return session.exec(q.order_by(Deal.start_date.desc())).all()
\ No newline at end of file
+    return paginate(session, q, page, Deal.start_date, desc=True)
\ No newline at end of file
@@ -5,6 +5,7 @@ from sqlmodel import Session, select
 from ..db import get_session
 from ..deps import get_current_user, get_current_org_id, require_org_role
 from ..models import Ticket, TicketMessage, Sponsor
+from ..pagination import Page, page_params, paginate
 from ..schemas import TicketReply, TicketUpdate
 
 router = APIRouter(prefix="/api/tickets", tags=["tickets"])
@@ -16,6 +17,7 @@ _ALLOWED_PRIORITY = {"low", "normal", "high", "urgent"}
 def list_tickets(
     org_id: int | None = None,
     include_archived: bool = Query(False),
+    page: Page = Depends(page_params()),
     session: Session = Depends(get_session),
     user=Depends(get_current_user),
     org_ctx: int = Depends(get_current_org_id),
@@ -28,7 +30,7 @@ def list_tickets(
     q = select(Ticket).where(Ticket.organization_id == org_id)
     if not include_archived:
         q = q.where(Ticket.archived_at.is_(None))
-    return session.exec(q.order_by(Ticket.created_at.desc())).all()
+    return paginate(session, q, page, Ticket.created_at, desc=True)
 
 @router.get("/{ticket_id}")
 def get_ticket(ticket_id: int, session: Session = Depends(get_session), user=Depends(get_current_user)):
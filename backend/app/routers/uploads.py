@@ -1,60 +1,165 @@
-import os
-from pathlib import Path
 from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException, Request
-from fastapi.responses import FileResponse
 from sqlmodel import Session, select
+from starlette.concurrency import run_in_threadpool
 
+from .. import blobstore, thumbnails, upload_sessions
 from ..db import get_session
-from ..models import Proof, Deliverable, Deal
+from ..models import Proof, Deliverable, Deal, User
 from ..deps import org_id_for_deal, require_org_role, get_current_user
+from ..file_responses import file_response
+from ..schemas import UploadSessionCreate
+from ..services import log_activity
+from ..storage import get_storage
 
 router = APIRouter(prefix="/api/uploads", tags=["uploads"])
 
-UPLOAD_ROOT = Path(os.environ.get("SPONSOR_OPS_UPLOAD_ROOT","uploads")).resolve()
+def _deal_token_valid(d: Deal) -> bool:
+    if d.portal_token_revoked:
+        return False
+    return not (d.portal_token_expires_at and d.portal_token_expires_at < datetime.utcnow())
 
 def _validate_deal_token(session: Session, deal_token: str) -> Deal:
     d = session.exec(select(Deal).where(Deal.portal_token==deal_token)).first()
-    if not d or d.portal_token_revoked:
-        raise HTTPException(status_code=404, detail="Deal not found")
-    if d.portal_token_expires_at and d.portal_token_expires_at < datetime.utcnow():
+    if not d or not _deal_token_valid(d):
         raise HTTPException(status_code=404, detail="Deal not found")
     return d
 
-@router.get("/proof/{proof_id}")
-def download_proof_file(
-    proof_id: int,
-    request: Request,
-    deal_token: str | None = None,
-    session: Session = Depends(get_session),
-):
-    p = session.get(Proof, proof_id)
-    if not p or p.kind != "file" or not p.file_path:
+def _authorized_file_proof(session: Session, request: Request, proof_id: int, deal_token: str | None) -> Proof:
+    """Load a file proof the caller may read (Bearer viewer or the deal's portal token)."""
+    # proof -> deliverable -> deal in one query; role checks hit the authz cache
+    row = session.exec(
+        select(Proof, Deal)
+        .join(Deliverable, Deliverable.id == Proof.deliverable_id)
+        .join(Deal, Deal.id == Deliverable.deal_id)
+        .where(Proof.id == proof_id)
+    ).first()
+    if not row or row[0].kind != "file" or not row[0].file_path:
         raise HTTPException(status_code=404, detail="Proof not found")
-
-    d = session.get(Deliverable, p.deliverable_id)
-    if not d: raise HTTPException(status_code=404, detail="Proof not found")
-    deal = session.get(Deal, d.deal_id)
-    if not deal: raise HTTPException(status_code=404, detail="Proof not found")
+    p, deal = row
 
     auth = (request.headers.get("authorization") or "").strip()
     if auth.startswith("Bearer "):
         user = get_current_user(authorization=auth, session=session)
-        org_id = org_id_for_deal(session, deal.id)
         try:
-            require_org_role(session, user, org_id, "viewer")
+            require_org_role(session, user, deal.organization_id, "viewer")
         except HTTPException:
             raise HTTPException(status_code=404, detail="Proof not found")
     else:
         if not deal_token:
             raise HTTPException(status_code=401, detail="Missing deal_token")
-        dt = _validate_deal_token(session, deal_token)
-        if dt.id != deal.id:
+        if deal.portal_token != deal_token or not _deal_token_valid(deal):
             raise HTTPException(status_code=404, detail="Proof not found")
+    return p
 
-    abs_path = (UPLOAD_ROOT / Path(p.file_path)).resolve()
-    if not str(abs_path).startswith(str(UPLOAD_ROOT)) or not abs_path.exists() or not abs_path.is_file():
+@router.get("/proof/{proof_id}")
+def download_proof_file(
+    proof_id: int,
+    request: Request,
+    deal_token: str | None = None,
+    session: Session = Depends(get_session),
+):
+    p = _authorized_file_proof(session, request, proof_id, deal_token)
+    info = get_storage().stat(p.file_path)
+    if info is None:
         raise HTTPException(status_code=404, detail="Proof not found")
 
-    return FileResponse(path=str(abs_path), media_type=p.mime_type or "application/octet-stream", filename=p.file_name or "proof")
\ No newline at end of file
+    return file_response(request, p.file_path, info,
+                         media_type=p.mime_type or "application/octet-stream", filename=p.file_name or "proof",
+                         content_hash=blobstore.sha_of(p.file_path))
+
+@router.get("/proof/{proof_id}/thumbnail")
+def proof_thumbnail(
+    proof_id: int,
+    request: Request,
+    deal_token: str | None = None,
+    session: Session = Depends(get_session),
+):
+    p = _authorized_file_proof(session, request, proof_id, deal_token)
+    sha = blobstore.sha_of(p.file_path)
+    thumb = thumbnails.ensure(sha, p.mime_type or "") if sha else None
+    info = get_storage().stat(thumb) if thumb else None
+    if info is None:
+        raise HTTPException(status_code=404, detail="No thumbnail for this proof")
+    name = thumb.rsplit("/", 1)[-1]
+    return file_response(request, thumb, info, media_type="image/jpeg", filename=name,
+                         content_hash=name.removesuffix(".jpg"), disposition="inline")
+
+# --- resumable uploads (protocol: app.upload_sessions) ---------------------------
+
+def _bearer_user(session: Session, request: Request):
+    auth = (request.headers.get("authorization") or "").strip()
+    return get_current_user(authorization=auth, session=session) if auth.startswith("Bearer ") else None
+
+def _authorize_upload(session: Session, request: Request, deliverable: Deliverable, source: str,
+                      deal_token: str | None) -> int | None:
+    """Internal uploads need an editor, portal uploads the deal's token. Returns the user id."""
+    if source == "internal":
+        user = _bearer_user(session, request)
+        if user is None:
+            raise HTTPException(status_code=401, detail="Missing bearer token")
+        require_org_role(session, user, org_id_for_deal(session, deliverable.deal_id), "editor")
+        return user.id
+    if not deal_token:
+        raise HTTPException(status_code=401, detail="Missing deal_token")
+    if _validate_deal_token(session, deal_token).id != deliverable.deal_id:
+        raise HTTPException(status_code=404, detail="Deliverable not found")
+    return None
+
+@router.post("/sessions")
+def create_upload_session(payload: UploadSessionCreate, request: Request, session: Session = Depends(get_session)):
+    d = session.get(Deliverable, payload.deliverable_id)
+    if not d: raise HTTPException(status_code=404, detail="Deliverable not found")
+    source = "internal" if payload.deal_token is None else "portal"
+    user_id = _authorize_upload(session, request, d, source, payload.deal_token)
+    upload = upload_sessions.create(session, d.id, source, user_id, payload.file_name, payload.mime_type,
+                                    payload.size_bytes, payload.note)
+    return upload_sessions.state(upload)
+
+@router.get("/sessions/{upload_id}")
+def get_upload_session(upload_id: str, session: Session = Depends(get_session)):
+    return upload_sessions.state(upload_sessions.get_active(session, upload_id))
+
+@router.put("/sessions/{upload_id}")
+async def put_upload_chunk(upload_id: str, offset: int, request: Request, session: Session = Depends(get_session)):
+    # async to stream the body; database work goes to the threadpool
+    upload = await run_in_threadpool(upload_sessions.get_active, session, upload_id)
+    await upload_sessions.write_chunk(session, upload, offset, request)
+    return upload_sessions.state(upload)
+
+@router.post("/sessions/{upload_id}/complete")
+def complete_upload_session(upload_id: str, request: Request, deal_token: str | None = None,
+                            session: Session = Depends(get_session)):
+    upload = upload_sessions.get_active(session, upload_id, completed=True)
+    d = session.get(Deliverable, upload.deliverable_id)
+    if not d: raise HTTPException(status_code=404, detail="Deliverable not found")
+    user_id = _authorize_upload(session, request, d, upload.source, deal_token)
+    if upload.proof_id is not None:  # a retry of a completion that already succeeded
+        p = session.get(Proof, upload.proof_id)
+        if not p: raise HTTPException(status_code=404, detail="Proof not found")
+        return p
+    source, note = upload.source, upload.note
+
+    stored = upload_sessions.finish(session, upload)
+    p = Proof(deliverable_id=d.id, kind="file", note=note, file_path=stored.rel_path, file_name=stored.file_name,
+              mime_type=stored.mime_type, size_bytes=stored.size_bytes, sha256=stored.sha256)
+    session.add(p); session.commit(); session.refresh(p)
+    upload_sessions.completed(session, upload, p.id)
+
+    if source == "portal":
+        if d.status in ("posted", "proofed"):
+            d.status = "proofed"
+            session.add(d); session.commit()
+    else:
+        user = session.get(User, user_id)
+        log_activity(session, org_id_for_deal(session, d.deal_id), "proof", "uploaded",
+                     f"Proof file uploaded for deliverable: {d.title}", actor=user.email if user else None,
+                     deal_id=d.deal_id, entity_id=p.id)
+    session.refresh(p)
+    return p
+
+@router.delete("/sessions/{upload_id}")
+def abort_upload_session(upload_id: str, session: Session = Depends(get_session)):
+    upload_sessions.abort(session, upload_sessions.get_active(session, upload_id))
+    return {"ok": True}
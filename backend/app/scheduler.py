@@ -0,0 +1,131 @@
+"""
+Periodic background work, run by one worker at a time.
+
+Every SPONSOR_OPS_NOTIFY_INTERVAL_SEC the leader creates the due-soon and overdue
+notifications of every member of every org in one INSERT ... SELECT
+(``services.insert_due_notifications``), so clients no longer need to ask for them.
+
+Leadership is a ``SchedulerLease`` row per job. A worker takes it with a conditional
+UPDATE when it is free, expired or already its own (or INSERTs it the first time),
+which renews it on every tick; a leader that stops ticking loses it after
+SPONSOR_OPS_SCHEDULER_LEASE_SEC. Every API process can run the loop, the others just
+keep checking.
+
+Usage (sidecar):
+  python -m app.scheduler
+
+Configure via:
+  - SPONSOR_OPS_SCHEDULER (default: "thread", a daemon thread in each API process;
+    "external" leaves it to the sidecar; "off" disables it and makes
+    POST /api/notifications/sync compute the caller's notifications instead)
+  - SPONSOR_OPS_NOTIFY_INTERVAL_SEC (default: "300")
+  - SPONSOR_OPS_NOTIFY_DUE_SOON_DAYS (default: "3")
+  - SPONSOR_OPS_SCHEDULER_LEASE_SEC (default: "900"; keep it above the interval)
+"""
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, or_, select, update
+
+from .db import engine
+from .models import SchedulerLease
+from .services import insert_due_notifications
+
+logger = logging.getLogger(__name__)
+
+MODE = os.environ.get("SPONSOR_OPS_SCHEDULER", "thread").strip().lower()
+INTERVAL_SEC = float(os.environ.get("SPONSOR_OPS_NOTIFY_INTERVAL_SEC", "300"))
+DUE_SOON_DAYS = int(os.environ.get("SPONSOR_OPS_NOTIFY_DUE_SOON_DAYS", "3"))
+LEASE_SEC = float(os.environ.get("SPONSOR_OPS_SCHEDULER_LEASE_SEC", "900"))
+
+NOTIFICATIONS = "notifications"
+HOLDER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+def acquire(session: Session, name: str, holder: str = HOLDER, lease_sec: Optional[float] = None) -> bool:
+    """Take or renew the lease on ``name``; True if ``holder`` now leads."""
+    now = datetime.utcnow()
+    expires = now + timedelta(seconds=LEASE_SEC if lease_sec is None else lease_sec)
+    taken = session.exec(update(SchedulerLease)
+                         .where(SchedulerLease.name == name,
+                                or_(SchedulerLease.holder == holder, SchedulerLease.expires_at < now))
+                         .values(holder=holder, expires_at=expires)).rowcount
+    session.commit()
+    if taken:
+        return True
+    if session.exec(select(SchedulerLease.name).where(SchedulerLease.name == name)).first() is not None:
+        return False
+    try:
+        session.add(SchedulerLease(name=name, holder=holder, expires_at=expires))
+        session.commit()
+    except IntegrityError:  # another worker created it first
+        session.rollback()
+        return False
+    return True
+
+def release(session: Session, name: str, holder: str = HOLDER) -> None:
+    session.exec(update(SchedulerLease).where(SchedulerLease.name == name, SchedulerLease.holder == holder)
+                 .values(expires_at=datetime.utcnow()))
+    session.commit()
+
+def tick() -> Optional[int]:
+    """One scheduler round: notifications created, or None when another worker leads."""
+    with Session(engine) as session:
+        if not acquire(session, NOTIFICATIONS):
+            return None
+        created = insert_due_notifications(session, DUE_SOON_DAYS)
+        session.exec(update(SchedulerLease).where(SchedulerLease.name == NOTIFICATIONS)
+                     .values(last_run_at=datetime.utcnow()))
+        session.commit()
+    if created:
+        logger.info("notifications created", extra={"created": created})
+    return created
+
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+def run_forever() -> None:
+    while True:
+        try:
+            tick()
+        except Exception:
+            logger.exception("scheduler tick failed")
+        if _stop.wait(INTERVAL_SEC):
+            break
+    with Session(engine) as session:
+        release(session, NOTIFICATIONS)
+
+def start() -> None:
+    """Start the scheduler thread (at startup) when SPONSOR_OPS_SCHEDULER is "thread"."""
+    global _thread
+    if MODE != "thread" or (_thread is not None and _thread.is_alive()):
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=run_forever, name="scheduler", daemon=True)
+    _thread.start()
+
+def stop(timeout: float = 5) -> None:
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout)
+
+def main() -> None:
+    from .db import init_db
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    try:
+        run_forever()
+    except KeyboardInterrupt:
+        with Session(engine) as session:
+            release(session, NOTIFICATIONS)
+
+if __name__ == "__main__":
+    main()
@@ -194,4 +194,11 @@ class PortalDeliverableComment(BaseModel):
 class PortalProofLink(BaseModel):
     deal_token: str
     url: str
-    note: Optional[str] = None
\ No newline at end of file
+    note: Optional[str] = None
+class UploadSessionCreate(BaseModel):
+    deliverable_id: int
+    file_name: str
+    mime_type: str
+    size_bytes: int
+    note: Optional[str] = None
+    deal_token: Optional[str] = None  # portal uploads; internal uploads send a Bearer token
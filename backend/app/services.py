@@ -1,6 +1,9 @@
 import secrets
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
+from sqlalchemy import String, case, cast, insert, literal
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
+from .db import record_changes
 from .models import User, Organization, OrganizationMember, Sponsor, Deal, Deliverable, Activity, Notification
 from .security import hash_password
 
@@ -28,28 +31,59 @@ def log_activity(session: Session, organization_id: int, entity_type: str, actio
                  entity_id=entity_id, action=action, summary=summary, actor=actor)
     session.add(a); session.commit(); session.refresh(a); return a
 
-def sync_notifications_for_org(session: Session, organization_id: int, user_id: int, days_due_soon: int=3):
+def due_notifications(days_due_soon: int=3, organization_id: int | None=None, user_id: int | None=None):
+    """INSERT ... SELECT of the overdue and soon-due notifications members don't have yet.
+
+    The database picks, per org member, the open deliverables due by the horizon whose
+    ``dedupe_key`` (kind, deliverable, due date) the member has no notification for, so
+    the work done is proportional to the new notifications, not to the orgs. A moved
+    due date is a new key and notifies again. Optionally limited to one org or user.
+    """
     today = date.today()
-    due_soon_until = today + timedelta(days=days_due_soon)
-    existing = session.exec(select(Notification).where(Notification.organization_id==organization_id, Notification.user_id==user_id, Notification.is_read==False)).all()
-    existing_keys = set((n.kind,n.title) for n in existing)
-
-    sponsor_ids = [s.id for s in session.exec(select(Sponsor).where(Sponsor.organization_id==organization_id)).all()]
-    deal_ids = [d.id for d in session.exec(select(Deal).where(Deal.sponsor_id.in_(sponsor_ids))).all()] if sponsor_ids else []
-    created = 0
-    if deal_ids:
-        dels = session.exec(select(Deliverable).where(Deliverable.deal_id.in_(deal_ids))).all()
-        for d in dels:
-            if d.status in ("delivered","canceled"): continue
-            if d.due_date < today:
-                title = f"Overdue: {d.title}"
-                if ("overdue",title) not in existing_keys:
-                    session.add(Notification(organization_id=organization_id,user_id=user_id,kind="overdue",title=title,body=f"Deliverable #{d.id} overdue (due {d.due_date}).",link=f"/deals/{d.deal_id}"))
-                    created += 1
-            elif today <= d.due_date <= due_soon_until:
-                title = f"Due soon: {d.title}"
-                if ("due_soon",title) not in existing_keys:
-                    session.add(Notification(organization_id=organization_id,user_id=user_id,kind="due_soon",title=title,body=f"Deliverable #{d.id} due {d.due_date}.",link=f"/deals/{d.deal_id}"))
-                    created += 1
-        session.commit()
-    return {"created": created}
\ No newline at end of file
+    overdue = Deliverable.due_date < today
+    kind = case((overdue, "overdue"), else_="due_soon")
+    dedupe_key = kind + ":" + cast(Deliverable.id, String) + ":" + cast(Deliverable.due_date, String)
+    notified = (select(Notification.id)
+                .where(Notification.organization_id == OrganizationMember.organization_id,
+                       Notification.user_id == OrganizationMember.user_id, Notification.dedupe_key == dedupe_key))
+    due = (select(OrganizationMember.organization_id, OrganizationMember.user_id, kind,
+                  case((overdue, "Overdue: "), else_="Due soon: ") + Deliverable.title,
+                  "Deliverable #" + cast(Deliverable.id, String)
+                  + case((overdue, " overdue (due "), else_=" due ") + cast(Deliverable.due_date, String)
+                  + case((overdue, ")."), else_="."),
+                  "/deals/" + cast(Deliverable.deal_id, String),
+                  literal(False), literal(datetime.utcnow()), dedupe_key)
+           .join(Deal, Deal.id == Deliverable.deal_id).join(Sponsor, Sponsor.id == Deal.sponsor_id)
+           .join(OrganizationMember, OrganizationMember.organization_id == Sponsor.organization_id)
+           .where(Deliverable.status.not_in(("delivered", "canceled")),
+                  Deliverable.due_date <= today + timedelta(days=days_due_soon),
+                  ~notified.exists()))
+    if organization_id is not None:
+        due = due.where(Sponsor.organization_id == organization_id)
+    if user_id is not None:
+        due = due.where(OrganizationMember.user_id == user_id)
+    return insert(Notification).from_select(
+        ["organization_id", "user_id", "kind", "title", "body", "link", "is_read", "created_at", "dedupe_key"], due
+    ).returning(*Notification.__table__.c)
+
+def insert_due_notifications(session: Session, days_due_soon: int=3, organization_id: int | None=None,
+                             user_id: int | None=None) -> int:
+    """Run ``due_notifications``; returns the notifications created.
+
+    The unique index on the key settles concurrent runs: the loser retries and finds
+    nothing left to insert.
+    """
+    for attempt in range(2):
+        try:
+            rows = session.exec(due_notifications(days_due_soon, organization_id, user_id)).mappings().all()
+            record_changes(session, [(Notification, dict(row)) for row in rows])
+            session.commit()
+            return len(rows)
+        except IntegrityError:
+            session.rollback()
+            if attempt:
+                raise
+
+def sync_notifications_for_org(session: Session, organization_id: int, user_id: int, days_due_soon: int=3):
+    """Notify one member of the org's overdue and soon-due deliverables not notified yet."""
+    return {"created": insert_due_notifications(session, days_due_soon, organization_id, user_id)}
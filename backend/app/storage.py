@@ -0,0 +1,309 @@
+"""
+Where proof files and their derivatives (thumbnails) are kept.
+
+Code that stores or serves files goes through ``get_storage()`` with keys relative to
+the store root (``blobs/ab/cd/<sha256>``, ``thumbs/...``) instead of touching
+UPLOAD_ROOT directly, so API nodes only need a shared disk with the local backend:
+
+  - ``LocalStorage`` keeps files under SPONSOR_OPS_UPLOAD_ROOT (the original layout,
+    so switching to it needs no migration); downloads can be offloaded to the proxy.
+  - ``S3Storage`` keeps them in an S3-compatible bucket (AWS, MinIO, R2, ...) through
+    a boto3-style client. Downloads can redirect to short-lived presigned URLs so API
+    workers never proxy the bytes.
+
+Uploads are still spooled (and hashed) on local scratch space below UPLOAD_ROOT before
+``put_file`` moves them into the store; resumable upload sessions stage there as well,
+so with several nodes a session's chunks must reach the same node (or a shared
+scratch volume). boto3 (in requirements.txt) is only imported when the S3 backend is
+selected.
+
+Configure via:
+  - SPONSOR_OPS_UPLOAD_ROOT (default: "uploads"; local store and scratch space)
+  - SPONSOR_OPS_STORAGE_BACKEND (default: "local"; or "s3")
+  - SPONSOR_OPS_S3_BUCKET, SPONSOR_OPS_S3_PREFIX (default: "")
+  - SPONSOR_OPS_S3_ENDPOINT_URL, SPONSOR_OPS_S3_REGION (credentials: the usual AWS_* env)
+  - SPONSOR_OPS_STORAGE_PRESIGN_TTL_SEC (default: "300"; "0" proxies downloads instead)
+"""
+from __future__ import annotations
+
+import contextlib
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional
+from urllib.parse import quote
+
+UPLOAD_ROOT = Path(os.environ.get("SPONSOR_OPS_UPLOAD_ROOT", "uploads"))
+BACKEND = os.environ.get("SPONSOR_OPS_STORAGE_BACKEND", "local").strip().lower()
+PRESIGN_TTL_SEC = int(os.environ.get("SPONSOR_OPS_STORAGE_PRESIGN_TTL_SEC", "300"))
+
+_CHUNK = 64 * 1024
+
+@dataclass(frozen=True)
+class ObjectInfo:
+    size: int
+    mtime: float  # POSIX timestamp of the last write (or touch)
+
+def content_disposition(disposition: str, filename: str) -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"{disposition}; filename*=utf-8''{quoted}"
+    return f'{disposition}; filename="{filename}"'
+
+class Storage(ABC):
+    """Key/value file store. Keys are ``/``-separated paths relative to the store root."""
+
+    @abstractmethod
+    def put_file(self, key: str, src: Path) -> None:
+        """Store a complete local file under ``key``; ``src`` is consumed (moved or deleted)."""
+
+    @abstractmethod
+    def put_stream(self, key: str, fileobj: BinaryIO) -> None:
+        """Store everything read from ``fileobj`` under ``key``."""
+
+    @abstractmethod
+    def get_stream(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Yield the bytes of ``key`` from ``start`` to ``end`` (inclusive; None = to the end)."""
+
+    @abstractmethod
+    def stat(self, key: str) -> Optional[ObjectInfo]:
+        """Size and mtime of ``key``, or None if it does not exist."""
+
+    def exists(self, key: str) -> bool:
+        return self.stat(key) is not None
+
+    @abstractmethod
+    def touch(self, key: str) -> None:
+        """Refresh the mtime of ``key`` (keeps garbage collection away from reused blobs)."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove ``key``; missing keys are ignored."""
+
+    @abstractmethod
+    def list(self, prefix: str) -> Iterator[tuple[str, ObjectInfo]]:
+        """(key, info) for every object whose key starts with ``prefix``."""
+
+    def presigned_url(self, key: str, *, expires_sec: int, media_type: str, filename: str,
+                      disposition: str = "attachment") -> Optional[str]:
+        """A URL that serves ``key`` without the API, or None if the backend has none."""
+        return None
+
+    def local_path(self, key: str) -> Optional[Path]:
+        """Absolute path of ``key`` if the backend keeps it on this machine's disk."""
+        return None
+
+    @contextlib.contextmanager
+    def local_copy(self, key: str) -> Iterator[Path]:
+        """A local file with the content of ``key`` for the duration of the block."""
+        fd, tmp = tempfile.mkstemp(prefix="storage-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in self.get_stream(key):
+                    f.write(chunk)
+            yield Path(tmp)
+        finally:
+            os.unlink(tmp)
+
+class LocalStorage(Storage):
+    def __init__(self, root: Path):
+        self.root = root
+
+    def local_path(self, key: str) -> Optional[Path]:
+        """Older portal uploads stored keys including the UPLOAD_ROOT prefix (relative to
+        the working directory); those are still accepted. Nothing outside the root is."""
+        root = self.root.resolve()
+        for candidate in (root / key, Path(key)):
+            path = candidate.resolve()
+            if path.is_relative_to(root) and path.is_file():
+                return path
+        return None
+
+    def _dest(self, key: str) -> Path:
+        dest = (self.root / key).resolve()
+        if not dest.is_relative_to(self.root.resolve()):
+            raise ValueError(f"storage key outside the root: {key!r}")
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        return dest
+
+    def put_file(self, key: str, src: Path) -> None:
+        os.replace(src, self._dest(key))  # scratch lives below the root: same filesystem
+
+    def put_stream(self, key: str, fileobj: BinaryIO) -> None:
+        dest = self._dest(key)
+        fd, tmp = tempfile.mkstemp(dir=dest.parent, prefix=".put-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                shutil.copyfileobj(fileobj, f, _CHUNK)
+            os.replace(tmp, dest)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def get_stream(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        path = self.local_path(key)
+        if path is None:
+            raise FileNotFoundError(key)
+        with path.open("rb") as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(_CHUNK if remaining is None else min(_CHUNK, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def stat(self, key: str) -> Optional[ObjectInfo]:
+        path = self.local_path(key)
+        if path is None:
+            return None
+        st = path.stat()
+        return ObjectInfo(size=st.st_size, mtime=st.st_mtime)
+
+    def touch(self, key: str) -> None:
+        if path := self.local_path(key):
+            os.utime(path)
+
+    def delete(self, key: str) -> None:
+        if path := self.local_path(key):
+            path.unlink(missing_ok=True)
+
+    def list(self, prefix: str) -> Iterator[tuple[str, ObjectInfo]]:
+        base = self.root / prefix.rpartition("/")[0]
+        if not base.is_dir():
+            return
+        for path in base.rglob("*"):
+            key = path.relative_to(self.root).as_posix()
+            if not key.startswith(prefix) or any(part.startswith(".") for part in key.split("/")):
+                continue  # scratch (blobs/.tmp) and in-progress writes
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            if path.is_file():
+                yield key, ObjectInfo(size=st.st_size, mtime=st.st_mtime)
+
+    @contextlib.contextmanager
+    def local_copy(self, key: str) -> Iterator[Path]:
+        path = self.local_path(key)
+        if path is None:
+            raise FileNotFoundError(key)
+        yield path
+
+class S3Storage(Storage):
+    """Objects in ``bucket`` below ``prefix``, through a boto3 S3 client (or a stand-in
+    implementing the same methods)."""
+
+    def __init__(self, client, bucket: str, prefix: str = ""):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    def put_file(self, key: str, src: Path) -> None:
+        self.client.upload_file(str(src), self.bucket, self._key(key))  # multipart for large files
+        src.unlink(missing_ok=True)
+
+    def put_stream(self, key: str, fileobj: BinaryIO) -> None:
+        self.client.upload_fileobj(fileobj, self.bucket, self._key(key))
+
+    def get_stream(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        kwargs = {}
+        if start or end is not None:
+            kwargs["Range"] = f"bytes={start}-{'' if end is None else end}"
+        body = self.client.get_object(Bucket=self.bucket, Key=self._key(key), **kwargs)["Body"]
+        try:
+            yield from body.iter_chunks(_CHUNK)
+        finally:
+            body.close()
+
+    def stat(self, key: str) -> Optional[ObjectInfo]:
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except Exception as e:
+            if _is_not_found(e):
+                return None
+            raise
+        return ObjectInfo(size=head["ContentLength"], mtime=head["LastModified"].timestamp())
+
+    def touch(self, key: str) -> None:
+        # an in-place copy is the only way to move LastModified
+        self.client.copy_object(Bucket=self.bucket, Key=self._key(key), MetadataDirective="REPLACE",
+                                CopySource={"Bucket": self.bucket, "Key": self._key(key)})
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def list(self, prefix: str) -> Iterator[tuple[str, ObjectInfo]]:
+        kwargs = {"Bucket": self.bucket, "Prefix": self._key(prefix)}
+        while True:
+            page = self.client.list_objects_v2(**kwargs)
+            for obj in page.get("Contents", []):
+                yield (obj["Key"][len(self.prefix):],
+                       ObjectInfo(size=obj["Size"], mtime=obj["LastModified"].timestamp()))
+            if not page.get("IsTruncated"):
+                return
+            kwargs["ContinuationToken"] = page["NextContinuationToken"]
+
+    def presigned_url(self, key: str, *, expires_sec: int, media_type: str, filename: str,
+                      disposition: str = "attachment") -> Optional[str]:
+        return self.client.generate_presigned_url("get_object", ExpiresIn=expires_sec, Params={
+            "Bucket": self.bucket,
+            "Key": self._key(key),
+            "ResponseContentType": media_type,
+            "ResponseContentDisposition": content_disposition(disposition, filename),
+        })
+
+    @contextlib.contextmanager
+    def local_copy(self, key: str) -> Iterator[Path]:
+        fd, tmp = tempfile.mkstemp(prefix="storage-")
+        os.close(fd)
+        try:
+            self.client.download_file(self.bucket, self._key(key), tmp)
+            yield Path(tmp)
+        finally:
+            os.unlink(tmp)
+
+def _is_not_found(e: Exception) -> bool:
+    code = str(getattr(e, "response", {}).get("Error", {}).get("Code", ""))
+    return code in ("404", "NoSuchKey", "NotFound")
+
+def build_storage() -> Storage:
+    if BACKEND == "local":
+        return LocalStorage(UPLOAD_ROOT)
+    if BACKEND == "s3":
+        bucket = os.environ.get("SPONSOR_OPS_S3_BUCKET", "")
+        if not bucket:
+            raise RuntimeError("SPONSOR_OPS_STORAGE_BACKEND=s3 requires SPONSOR_OPS_S3_BUCKET")
+        try:
+            import boto3
+        except ImportError as e:
+            raise RuntimeError("SPONSOR_OPS_STORAGE_BACKEND=s3 requires boto3 (pip install boto3)") from e
+        client = boto3.client(
+            "s3",
+            endpoint_url=os.environ.get("SPONSOR_OPS_S3_ENDPOINT_URL") or None,
+            region_name=os.environ.get("SPONSOR_OPS_S3_REGION") or None,
+        )
+        return S3Storage(client, bucket, os.environ.get("SPONSOR_OPS_S3_PREFIX", ""))
+    raise RuntimeError(f"Unknown SPONSOR_OPS_STORAGE_BACKEND: {BACKEND!r} (expected local|s3)")
+
+_storage: Optional[Storage] = None
+
+def get_storage() -> Storage:
+    global _storage
+    if _storage is None:
+        _storage = build_storage()
+    return _storage
+
+def use_storage(storage: Storage) -> Storage:
+    """Replace the process-wide store (tests, tooling). Returns the previous one."""
+    global _storage
+    previous, _storage = get_storage(), storage
+    return previous
@@ -0,0 +1,180 @@
+"""
+Thumbnails for image and PDF proofs.
+
+A commit hook queues a thumbnail for every new blob-store proof of a supported type
+on a process pool, so uploads return without waiting and decoding large images never
+competes with request handling for the GIL. Thumbnails are JPEGs no larger than
+SPONSOR_OPS_THUMB_PX on either side, stored under ``thumbs/<h[0:2]>/<sha256>-<px>.jpg`` in
+the storage backend;
+like blobs they are keyed by content, so a creative reused across deliverables is
+rendered once. A request for a thumbnail that does not exist yet (queued, lost on
+restart, or uploaded before this existed) renders it on demand through the same pool.
+
+PNG/JPEG are rendered with Pillow (installed with reportlab). PDFs are rasterized from
+their first page with ``pdftoppm`` (poppler-utils) when it is on PATH; without it PDFs
+simply have no thumbnail.
+
+Configure via:
+  - SPONSOR_OPS_THUMB_PX (default: "400")
+  - SPONSOR_OPS_THUMB_WORKERS (default: "2"; "0" renders in the calling thread)
+  - SPONSOR_OPS_THUMB_TIMEOUT_SEC (default: "20"; on-demand wait and pdftoppm limit)
+"""
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from . import blobstore
+from .db import on_commit
+from .models import Proof
+from .storage import UPLOAD_ROOT, get_storage
+
+logger = logging.getLogger(__name__)
+
+THUMB_PX = int(os.environ.get("SPONSOR_OPS_THUMB_PX", "400"))
+WORKERS = int(os.environ.get("SPONSOR_OPS_THUMB_WORKERS", "2"))
+TIMEOUT_SEC = float(os.environ.get("SPONSOR_OPS_THUMB_TIMEOUT_SEC", "20"))
+
+SUPPORTED_MIME = {"image/png", "image/jpeg", "application/pdf"}
+
+_SCRATCH = UPLOAD_ROOT / "thumbs" / ".tmp"
+
+def thumb_key(sha256: str, px: int = THUMB_PX) -> str:
+    return f"thumbs/{sha256[:2]}/{sha256}-{px}.jpg"
+
+# --- rendering (runs in worker processes; module-level and picklable) -----------
+
+def _render_image(src: Path, dest: Path, px: int) -> None:
+    from PIL import Image, ImageOps
+
+    with Image.open(src) as img:
+        img.draft("RGB", (px, px))  # JPEG: decode at reduced scale
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((px, px))
+        if img.mode != "RGB":
+            background = Image.new("RGB", img.size, "white")
+            background.paste(img, mask=img.convert("RGBA").getchannel("A"))
+            img = background
+        img.save(dest, "JPEG", quality=80, optimize=True)
+
+def _render_pdf(src: Path, dest: Path, px: int) -> bool:
+    pdftoppm = shutil.which("pdftoppm")
+    if pdftoppm is None:
+        return False
+    prefix = dest.with_suffix("")  # -singlefile writes <prefix>.jpg, i.e. dest
+    subprocess.run([pdftoppm, "-f", "1", "-l", "1", "-singlefile", "-jpeg", "-scale-to", str(px),
+                    str(src), str(prefix)], check=True, timeout=TIMEOUT_SEC, capture_output=True)
+    return dest.stat().st_size > 0
+
+def render(src: str, mime_type: str, dest: str, px: int) -> bool:
+    """Write a thumbnail of ``src`` to ``dest`` atomically. Returns False if unsupported."""
+    dest_path = Path(dest)
+    dest_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=dest_path.parent, prefix=".thumb-", suffix=".jpg")
+    os.close(fd)
+    tmp_path = Path(tmp)
+    try:
+        if mime_type == "application/pdf":
+            if not _render_pdf(Path(src), tmp_path, px):
+                return False
+        else:
+            _render_image(Path(src), tmp_path, px)
+        os.replace(tmp_path, dest_path)
+        return True
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+def build(sha256: str, mime_type: str, px: int) -> bool:
+    """Render the thumbnail of blob ``sha256`` and put it into storage."""
+    storage = get_storage()
+    _SCRATCH.mkdir(parents=True, exist_ok=True)
+    dest = Path(tempfile.mkdtemp(dir=_SCRATCH)) / "thumb.jpg"
+    try:
+        with storage.local_copy(blobstore.rel_path(sha256)) as src:
+            if not render(str(src), mime_type, str(dest), px):
+                return False
+        storage.put_file(thumb_key(sha256, px), dest)
+        return True
+    finally:
+        shutil.rmtree(dest.parent, ignore_errors=True)
+
+# --- scheduling ----------------------------------------------------------------
+
+_pool: Optional[Executor] = None
+_inflight: dict[str, Future] = {}
+_lock = threading.Lock()
+
+def _executor() -> Optional[Executor]:
+    global _pool
+    if WORKERS <= 0:
+        return None
+    with _lock:
+        if _pool is None:
+            # spawn: forking a process that runs threads (uvicorn, the DB pool) is unsafe
+            _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def _done(key: str, future: Future) -> None:
+    with _lock:
+        _inflight.pop(key, None)
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning("thumbnail failed", extra={"blob": key, "error": repr(future.exception())})
+
+def submit(sha256: str, mime_type: str) -> Future:
+    """Queue (or join) rendering of the thumbnail for blob ``sha256``."""
+    with _lock:
+        future = _inflight.get(sha256)
+        if future is not None:
+            return future
+    pool = _executor()
+    if pool is None:
+        future = Future()
+        try:
+            future.set_result(build(sha256, mime_type, THUMB_PX))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    with _lock:
+        future = _inflight.get(sha256)
+        if future is None:
+            future = pool.submit(build, sha256, mime_type, THUMB_PX)
+            _inflight[sha256] = future
+            future.add_done_callback(lambda f, key=sha256: _done(key, f))
+    return future
+
+def ensure(sha256: str, mime_type: str) -> Optional[str]:
+    """Storage key of the thumbnail for blob ``sha256``, rendering it if needed; None if unavailable."""
+    key = thumb_key(sha256)
+    if get_storage().exists(key):
+        return key
+    if mime_type not in SUPPORTED_MIME:
+        return None
+    try:
+        rendered = submit(sha256, mime_type).result(timeout=TIMEOUT_SEC)
+    except Exception:
+        logger.warning("thumbnail unavailable", extra={"blob": sha256}, exc_info=True)
+        return None
+    return key if rendered and get_storage().exists(key) else None
+
+@on_commit
+def _queue_new_proofs(changes) -> None:
+    for cls, row in changes:
+        if cls is not Proof or row.get("mime_type") not in SUPPORTED_MIME:
+            continue
+        sha = blobstore.sha_of(row.get("file_path"))
+        if sha and not get_storage().exists(thumb_key(sha)):
+            submit(sha, row["mime_type"])
+
+@blobstore.on_collect
+def _drop_thumbnails(sha256: str) -> None:
+    storage = get_storage()
+    for key, _ in list(storage.list(f"thumbs/{sha256[:2]}/{sha256}-")):
+        storage.delete(key)
@@ -0,0 +1,63 @@
+"""
+Cached unread-notification counts per org member (``GET /api/notifications/unread-count``).
+
+The count is one index-only aggregate over ``ix_notification_org_user_read_created``;
+it is kept until the commit hook sees a notification of that member inserted or
+changed (including the Core INSERT/UPDATE statements of the notification sync and
+mark-read, which report their rows via ``db.record_changes``), so a badge that polls
+costs no queries while nothing happens.
+
+Configure via:
+  - SPONSOR_OPS_UNREAD_CACHE_TTL_SEC (default: "5"; "0" disables)
+  - SPONSOR_OPS_UNREAD_CACHE_MAX_ENTRIES (default: "10000")
+
+Invalidation only sees commits made in this process; the TTL bounds how long another
+worker (or the scheduler sidecar) may leave a count stale, so it is kept short: a
+badge polling every few seconds still costs at most one aggregate per TTL per worker.
+"""
+from __future__ import annotations
+
+import os
+import threading
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from .cache import TTLCache
+from .db import on_commit
+from .models import Notification
+
+CACHE_TTL_SEC = float(os.environ.get("SPONSOR_OPS_UNREAD_CACHE_TTL_SEC", "5"))
+CACHE_MAX_ENTRIES = int(os.environ.get("SPONSOR_OPS_UNREAD_CACHE_MAX_ENTRIES", "10000"))
+
+_counts = TTLCache(CACHE_MAX_ENTRIES, CACHE_TTL_SEC)  # (org id, user id) -> unread count
+_generation = 0  # bumped on every invalidation; counts taken across a bump are not stored
+_gen_lock = threading.Lock()
+
+def unread_count(session: Session, organization_id: int, user_id: int) -> int:
+    key = (organization_id, user_id)
+    count = _counts.get(key)
+    if count is not None:
+        return count
+    built_at = _generation
+    count = session.exec(select(func.count()).select_from(Notification)
+                         .where(Notification.organization_id == organization_id,
+                                Notification.user_id == user_id, Notification.is_read == False)).one()
+    with _gen_lock:
+        if built_at == _generation:
+            _counts.set(key, count)
+    return count
+
+def clear() -> None:
+    _counts.clear()
+
+@on_commit
+def _invalidate(changes) -> None:
+    global _generation
+    keys = {(row.get("organization_id"), row.get("user_id")) for cls, row in changes if cls is Notification}
+    if not keys:
+        return
+    with _gen_lock:
+        _generation += 1
+    for key in keys:
+        _counts.pop(key)
@@ -0,0 +1,183 @@
+"""
+Resumable proof uploads.
+
+Protocol (``/api/uploads/sessions``):
+  POST   /                    create a session for one file of a declared size
+  PUT    /{id}?offset=N       write the request body at byte N (N <= current offset)
+  GET    /{id}                current offset, to resume after a dropped connection
+  POST   /{id}/complete       hash, move into the blob store and create the Proof
+  DELETE /{id}                abort
+
+Completion is claimed with a conditional UPDATE, so only one request hashes and moves
+the file; a concurrent attempt gets a 409 and a retry after success gets the same
+Proof again. A claim that produced no Proof within SPONSOR_OPS_UPLOAD_COMPLETE_TIMEOUT_SEC
+(the process died while completing) is free again. A completed session only answers
+``complete`` until it expires.
+
+Request bodies are streamed to ``UPLOAD_ROOT/sessions/<id>.upload`` at their offset,
+at most ``proof_files.CHUNK_SIZE`` bytes in memory. Progress is recorded even when a
+PUT is cut off, so the client resumes from the last byte that reached disk instead of
+restarting. Type and size limits are the same as for single-request uploads; the size
+is declared up front and no chunk may write past it.
+
+Sessions expire SPONSOR_OPS_UPLOAD_SESSION_TTL_HOURS after their last chunk; expired
+sessions and their files are removed whenever a new session is created.
+
+Configure via:
+  - SPONSOR_OPS_UPLOAD_SESSION_TTL_HOURS (default: "24")
+  - SPONSOR_OPS_UPLOAD_COMPLETE_TIMEOUT_SEC (default: "300")
+"""
+from __future__ import annotations
+
+import os
+import secrets
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+from fastapi import HTTPException, Request
+from sqlalchemy import case
+from sqlmodel import Session, delete, or_, select, update
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+
+from . import blobstore
+from .models import UploadSession
+from .proof_files import CHUNK_SIZE, MAX_UPLOAD_BYTES, StoredFile, too_large, validate_type
+
+SESSION_TTL = timedelta(hours=float(os.environ.get("SPONSOR_OPS_UPLOAD_SESSION_TTL_HOURS", "24")))
+COMPLETE_TIMEOUT = timedelta(seconds=float(os.environ.get("SPONSOR_OPS_UPLOAD_COMPLETE_TIMEOUT_SEC", "300")))
+SESSION_DIR = blobstore.UPLOAD_ROOT / "sessions"
+
+def path_for(upload_id: str) -> Path:
+    return SESSION_DIR / f"{upload_id}.upload"
+
+def state(upload: UploadSession) -> dict:
+    return {"id": upload.id, "offset": upload.received_bytes, "size_bytes": upload.size_bytes,
+            "chunk_size": CHUNK_SIZE, "expires_at": upload.expires_at}
+
+def get_active(session: Session, upload_id: str, completed: bool = False) -> UploadSession:
+    """The unexpired session; completed ones only if ``completed`` is set."""
+    upload = session.get(UploadSession, upload_id)
+    if not upload or upload.expires_at < datetime.utcnow() or (upload.completed_at and not completed):
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return upload
+
+def expire_stale(session: Session) -> int:
+    now = datetime.utcnow()
+    ids = session.exec(select(UploadSession.id).where(UploadSession.expires_at < now)).all()
+    if not ids:
+        return 0
+    session.exec(delete(UploadSession).where(UploadSession.id.in_(ids)))
+    session.commit()
+    for upload_id in ids:
+        path_for(upload_id).unlink(missing_ok=True)
+    return len(ids)
+
+def create(session: Session, deliverable_id: int, source: str, user_id: Optional[int],
+           file_name: str, mime_type: str, size_bytes: int, note: Optional[str]) -> UploadSession:
+    orig, ct = validate_type(file_name, mime_type)
+    if size_bytes > MAX_UPLOAD_BYTES:
+        raise too_large()
+    if size_bytes <= 0:
+        raise HTTPException(status_code=400, detail="size_bytes must be positive")
+    expire_stale(session)
+    upload = UploadSession(id=secrets.token_urlsafe(24), deliverable_id=deliverable_id, source=source,
+                           user_id=user_id, file_name=orig, mime_type=ct, note=note or None,
+                           size_bytes=size_bytes, expires_at=datetime.utcnow() + SESSION_TTL)
+    SESSION_DIR.mkdir(parents=True, exist_ok=True)
+    path_for(upload.id).touch()
+    session.add(upload); session.commit(); session.refresh(upload)
+    return upload
+
+def _open_at(path: Path, offset: int) -> BinaryIO:
+    f = path.open("r+b")
+    f.seek(offset)
+    return f
+
+def _record(session: Session, upload: UploadSession, end: int) -> None:
+    # concurrent PUTs may finish out of order; the offset only moves forward
+    session.exec(update(UploadSession).where(UploadSession.id == upload.id).values(
+        received_bytes=case((UploadSession.received_bytes < end, end), else_=UploadSession.received_bytes),
+        expires_at=datetime.utcnow() + SESSION_TTL,
+    ))
+    session.commit()
+    session.refresh(upload)
+
+async def write_chunk(session: Session, upload: UploadSession, offset: int, request: Request) -> None:
+    if offset < 0 or offset > upload.received_bytes:
+        raise HTTPException(status_code=409, detail=f"Upload offset mismatch; resume at {upload.received_bytes}")
+    path = path_for(upload.id)
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    f = await run_in_threadpool(_open_at, path, offset)
+    end = offset
+    buf = bytearray()
+    try:
+        try:
+            async for piece in request.stream():
+                if end + len(buf) + len(piece) > upload.size_bytes:
+                    raise HTTPException(status_code=400, detail="Chunk exceeds the declared file size")
+                buf += piece
+                if len(buf) >= CHUNK_SIZE:
+                    await run_in_threadpool(f.write, buf)
+                    end += len(buf)
+                    buf = bytearray()
+        except ClientDisconnect:
+            pass  # keep whatever was received; the client resumes from there
+        if buf:
+            await run_in_threadpool(f.write, buf)
+            end += len(buf)
+    finally:
+        f.close()
+        if end > offset:
+            await run_in_threadpool(_record, session, upload, end)
+
+def _claim(session: Session, upload: UploadSession, claimed: bool) -> bool:
+    now = datetime.utcnow()
+    stmt = update(UploadSession).where(UploadSession.id == upload.id)
+    free = or_(UploadSession.completed_at.is_(None),  # or claimed by a request that died
+               (UploadSession.proof_id.is_(None)) & (UploadSession.completed_at < now - COMPLETE_TIMEOUT))
+    stmt = (stmt.where(free, UploadSession.received_bytes == UploadSession.size_bytes)
+            .values(completed_at=now) if claimed else stmt.values(completed_at=None))
+    won = session.exec(stmt).rowcount
+    session.commit()
+    session.refresh(upload)
+    return bool(won)
+
+def finish(session: Session, upload: UploadSession) -> StoredFile:
+    """Claim a fully received upload and move it into the blob store.
+
+    The caller records the resulting proof with ``completed``.
+    """
+    if not _claim(session, upload, True):
+        if upload.completed_at is not None:
+            raise HTTPException(status_code=409, detail="Upload is already being completed")
+        raise HTTPException(status_code=409, detail=f"Upload incomplete; resume at {upload.received_bytes}")
+    path = path_for(upload.id)
+    try:
+        size, sha = blobstore.hash_file(path, CHUNK_SIZE)
+        if size != upload.size_bytes:
+            raise HTTPException(status_code=409, detail="Upload file does not match the session")
+        _sync(path)
+        rel, _ = blobstore.place_file(path, sha)
+    except FileNotFoundError:
+        raise HTTPException(status_code=409, detail="Upload file is gone; start a new upload")
+    except BaseException:
+        _claim(session, upload, False)  # let the client retry
+        raise
+    return StoredFile(rel_path=rel, file_name=upload.file_name, mime_type=upload.mime_type,
+                      size_bytes=size, sha256=sha)
+
+def completed(session: Session, upload: UploadSession, proof_id: int) -> None:
+    """Remember the proof, so a retried ``complete`` returns it instead of failing."""
+    upload.proof_id = proof_id
+    session.add(upload); session.commit()
+
+def _sync(path: Path) -> None:
+    with path.open("rb") as f:
+        os.fsync(f.fileno())
+
+def abort(session: Session, upload: UploadSession) -> None:
+    session.delete(upload); session.commit()
+    path_for(upload.id).unlink(missing_ok=True)
@@ -0,0 +1,30 @@
+"""Writing zip archives to a streamed response without seeking back."""
+from __future__ import annotations
+
+import io
+from typing import Iterator
+
+class ZipSink(io.RawIOBase):
+    """Unseekable ``zipfile.ZipFile`` output that buffers bytes until they are drained.
+
+    zipfile notices the missing ``seek`` and writes sizes into data descriptors, so
+    each member can be handed to the client as soon as it (or part of it) is written.
+    """
+
+    def __init__(self):
+        self._buf = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._buf += b
+        return len(b)
+
+    def pending(self) -> int:
+        return len(self._buf)
+
+    def drain(self) -> Iterator[bytes]:
+        if self._buf:
+            data, self._buf = bytes(self._buf), bytearray()
+            yield data
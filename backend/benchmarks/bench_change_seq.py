@@ -0,0 +1,86 @@
+"""
+Concurrent writers and the change-sequence counter in ``app.db``.
+
+Run from backend/:
+  python -m benchmarks.bench_change_seq [--writers 8] [--seconds 5] [--work-ms 20] [--url postgresql://...]
+
+Each writer process mimics a request that writes a stamped row early and then keeps
+working inside the transaction (more queries, rendering) before it commits. "commit"
+is the current scheme: the counter is taken by the stamping UPDATE at commit time.
+"flush" takes it right after the first flush, as the counter did before, so the
+counter row stays locked for the rest of the transaction and writers run one at a
+time. Run it against Postgres to see the difference: "flush" tops out near one
+commit per ``--work-ms`` whatever ``--writers`` is. On SQLite (the default, a temp
+file) both are bound by the database write lock, which the flush takes anyway.
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlmodel import SQLModel, Session
+
+from app.db import make_engine
+from app.models import Organization, Sponsor, Deal, Deliverable
+
+
+def _writer(url, mode, seconds, work_ms, out):
+    eng = make_engine(url, "production")
+    ok = failed = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            with Session(eng) as s:
+                s.add(Deliverable(deal_id=1, title="bench", type="post", due_date=date.today()))
+                s.flush()
+                if mode == "flush":
+                    s.execute(text("UPDATE changecounter SET value = value + 1 WHERE id = 1"))
+                time.sleep(work_ms / 1000)
+                s.commit()
+            ok += 1
+        except OperationalError:
+            failed += 1
+    out.put((ok, failed))
+
+
+def run(url, mode, args):
+    eng = make_engine(url, "production")
+    SQLModel.metadata.drop_all(eng)
+    SQLModel.metadata.create_all(eng)
+    with Session(eng) as s:
+        s.add(Organization(name="Bench")); s.commit()
+        s.add(Sponsor(organization_id=1, name="Bench")); s.commit()
+        s.add(Deal(organization_id=1, sponsor_id=1, name="Bench", start_date=date.today(), end_date=date.today()))
+        s.commit()
+    eng.dispose()
+
+    q = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=_writer, args=(url, mode, args.seconds, args.work_ms, q))
+             for _ in range(args.writers)]
+    for p in procs: p.start()
+    results = [q.get() for _ in procs]
+    for p in procs: p.join()
+    commits = sum(r[0] for r in results)
+    print(f"{mode:<8} {commits / args.seconds:>10.1f} {sum(r[1] for r in results):>8}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--writers", type=int, default=8)
+    ap.add_argument("--seconds", type=float, default=5)
+    ap.add_argument("--work-ms", type=float, default=20, help="time spent in the transaction after the flush")
+    ap.add_argument("--url", help="database to run against (its tables are dropped); default: a temp SQLite file")
+    args = ap.parse_args()
+    print(f"{'counter':<8} {'commits/s':>10} {'failed':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        for mode in ("flush", "commit"):
+            run(url, mode, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Per-request overhead of the rate limiter stores and middleware.
+
+Run from backend/:
+  python -m benchmarks.bench_ratelimit [--requests 50000] [--keys 5000] [--workers 4] [--max-us 50]
+
+Prints the mean cost of ``take()`` and of a full middleware pass (pure ASGI, no-op
+app) for the memory and sqlite backends, then checks that several processes sharing
+one sqlite file enforce a single budget. Exits non-zero if a middleware pass costs
+more than ``--max-us`` microseconds with either backend.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+
+from app.ratelimit import MemoryTokenBuckets, SQLiteTokenBuckets, SimpleRateLimitMiddleware
+
+
+def _bench_take(store, n: int, keys: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(n):
+        store.take((f"10.0.{i % keys // 256}.{i % 256}", "other"), 4.0, 240, store.clock())
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def _bench_middleware(store, n: int, keys: int) -> float:
+    async def ok_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    mw = SimpleRateLimitMiddleware(ok_app, buckets=store)
+    mw.enabled = True
+
+    async def run():
+        t0 = time.perf_counter()
+        for i in range(n):
+            scope = {"type": "http", "path": "/api/portal/deal/x", "client": (f"10.1.{i % keys // 256}.{i % 256}", 1)}
+            await mw(scope, receive, send)
+        return (time.perf_counter() - t0) / n * 1e6
+
+    return asyncio.run(run())
+
+
+def _hammer(path: str, n: int, out):
+    store = SQLiteTokenBuckets(path)
+    allowed = sum(1 for _ in range(n) if store.take(("203.0.113.7", "auth"), 0.001, 100, store.clock()) == 0)
+    out.put(allowed)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=50000)
+    ap.add_argument("--keys", type=int, default=5000)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--max-us", type=float, default=50.0)
+    args = ap.parse_args()
+    too_slow = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stores = {
+            "memory": lambda: MemoryTokenBuckets(),
+            "sqlite": lambda: SQLiteTokenBuckets(os.path.join(tmp, f"rl_{time.monotonic_ns()}.db")),
+        }
+        print(f"{'backend':<8} {'take() us/req':>14} {'middleware us/req':>18}")
+        for name, make in stores.items():
+            take_us = _bench_take(make(), args.requests, args.keys)
+            mw_us = _bench_middleware(make(), args.requests, args.keys)
+            print(f"{name:<8} {take_us:>14.1f} {mw_us:>18.1f}")
+            if mw_us > args.max_us:
+                too_slow.append(f"{name}: {mw_us:.1f} us/req")
+
+        path = os.path.join(tmp, "shared.db")
+        q = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=_hammer, args=(path, 200, q)) for _ in range(args.workers)]
+        for p in procs: p.start()
+        total = sum(q.get() for _ in procs)
+        for p in procs: p.join()
+        print(f"sqlite shared budget: {args.workers} processes x 200 requests -> {total} allowed (capacity 100)")
+
+    if too_slow:
+        raise SystemExit(f"middleware overhead above {args.max_us:.0f} us/req: {', '.join(too_slow)}")
+
+
+if __name__ == "__main__":
+    main()
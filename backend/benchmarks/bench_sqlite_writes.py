@@ -0,0 +1,93 @@
+"""
+Concurrent write throughput of the SQLite engine profiles in ``app.db``.
+
+Run from backend/:
+  python -m benchmarks.bench_sqlite_writes [--writers 4] [--readers 2] [--seconds 5]
+
+Each writer process mimics a workspace write (read the deal, add an Activity row,
+commit); reader processes keep listing activity like open workspace tabs do. Every
+profile gets a fresh database file because journal_mode is persisted in the file.
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from datetime import date
+
+from sqlalchemy.exc import OperationalError
+from sqlmodel import SQLModel, Session, select
+
+from app.db import make_engine
+from app.models import Organization, Sponsor, Deal, Activity
+
+
+def _writer(url, profile, seconds, out):
+    eng = make_engine(url, profile)
+    ok = locked = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            with Session(eng) as s:
+                deal = s.get(Deal, 1)
+                s.add(Activity(organization_id=deal.organization_id, deal_id=deal.id, entity_type="deal",
+                               action="updated", summary="bench write", actor="bench"))
+                s.commit()
+            ok += 1
+        except OperationalError:
+            locked += 1
+    out.put(("w", ok, locked))
+
+
+def _reader(url, profile, seconds, out):
+    eng = make_engine(url, profile)
+    ok = locked = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            with Session(eng) as s:
+                s.exec(select(Activity).where(Activity.organization_id == 1).order_by(Activity.created_at.desc()).limit(100)).all()
+            ok += 1
+        except OperationalError:
+            locked += 1
+    out.put(("r", ok, locked))
+
+
+def run(profile, args, tmp):
+    path = os.path.join(tmp, f"{profile}.db")
+    url = f"sqlite:///{path}"
+    eng = make_engine(url, profile)
+    SQLModel.metadata.create_all(eng)
+    with Session(eng) as s:
+        s.add(Organization(name="Bench")); s.commit()
+        s.add(Sponsor(organization_id=1, name="Bench")); s.commit()
+        s.add(Deal(organization_id=1, sponsor_id=1, name="Bench", start_date=date.today(), end_date=date.today()))
+        s.commit()
+    eng.dispose()
+
+    q = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=_writer, args=(url, profile, args.seconds, q)) for _ in range(args.writers)]
+    procs += [multiprocessing.Process(target=_reader, args=(url, profile, args.seconds, q)) for _ in range(args.readers)]
+    for p in procs: p.start()
+    results = [q.get() for _ in procs]
+    for p in procs: p.join()
+    writes = sum(r[1] for r in results if r[0] == "w")
+    reads = sum(r[1] for r in results if r[0] == "r")
+    locked = sum(r[2] for r in results)
+    print(f"{profile:<11} {writes / args.seconds:>10.0f} {reads / args.seconds:>10.0f} {locked:>8}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--writers", type=int, default=4)
+    ap.add_argument("--readers", type=int, default=2)
+    ap.add_argument("--seconds", type=float, default=5)
+    args = ap.parse_args()
+    print(f"{'profile':<11} {'writes/s':>10} {'reads/s':>10} {'locked':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in ("dev", "production"):
+            run(profile, args, tmp)
+
+
+if __name__ == "__main__":
+    main()
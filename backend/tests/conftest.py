@@ -0,0 +1,52 @@
+import os
+import tempfile
+
+# Must run before ``app`` is imported: security.py and db.py read env at import time.
+_TMP = tempfile.mkdtemp(prefix="sponsor_ops_test_")
+os.environ.setdefault("SPONSOR_OPS_JWT_SECRET", "test-secret-" + "x" * 32)
+os.environ["SPONSOR_OPS_DB"] = os.path.join(_TMP, "test.db")
+os.environ["SPONSOR_OPS_UPLOAD_ROOT"] = os.path.join(_TMP, "uploads")
+os.environ["SPONSOR_OPS_RATE_LIMIT_ENABLED"] = "0"
+os.environ["SPONSOR_OPS_THUMB_WORKERS"] = "0"  # render inline, no process pool
+os.environ["SPONSOR_OPS_EXPORT_WORKERS"] = "0"  # run export jobs inline
+os.environ["SPONSOR_OPS_REPORT_WORKERS"] = "0"  # render batch reports inline
+os.environ["SPONSOR_OPS_SCHEDULER"] = "off"  # notifications on request, no background thread
+
+from datetime import date, timedelta
+
+import pytest
+from sqlmodel import SQLModel, Session
+
+from app.db import engine
+from app.models import User, Organization, OrganizationMember, Sponsor, Deal
+from app.security import hash_password, create_token
+from app import authz, portal_cache, unread_counts
+
+
+@pytest.fixture()
+def session():
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    authz.clear_cache()
+    portal_cache.clear()
+    unread_counts.clear()
+    with Session(engine) as s:
+        yield s
+
+
+@pytest.fixture()
+def seed(session):
+    """One org with a manager user, a sponsor and an active deal."""
+    org = Organization(name="Test Org")
+    session.add(org); session.commit(); session.refresh(org)
+    user = User(email="manager@test.local", hashed_password=hash_password("pw"), role="admin")
+    session.add(user); session.commit(); session.refresh(user)
+    session.add(OrganizationMember(organization_id=org.id, user_id=user.id, role="manager"))
+    sponsor = Sponsor(organization_id=org.id, name="ACME")
+    session.add(sponsor); session.commit(); session.refresh(sponsor)
+    today = date.today()
+    deal = Deal(organization_id=org.id, sponsor_id=sponsor.id, name="Launch", start_date=today,
+                end_date=today + timedelta(days=30), status="active")
+    session.add(deal); session.commit(); session.refresh(deal)
+    return {"org": org, "user": user, "sponsor": sponsor, "deal": deal,
+            "headers": {"Authorization": f"Bearer {create_token(user.id, user.email)}", "X-Org-Id": str(org.id)}}
@@ -0,0 +1,48 @@
+from contextlib import contextmanager
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import select
+
+from app.db import engine
+from app.main import app
+from app.models import OrganizationMember
+
+client = TestClient(app)
+
+
+@contextmanager
+def _count_selects(table: str):
+    hits = []
+    def _before(conn, cursor, statement, params, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and f"FROM {table}" in statement:
+            hits.append(statement)
+    event.listen(engine, "before_cursor_execute", _before)
+    try:
+        yield hits
+    finally:
+        event.remove(engine, "before_cursor_execute", _before)
+
+
+def test_membership_loaded_once_per_request_and_cached(seed):
+    with _count_selects("organizationmember") as hits:
+        r = client.get("/api/claims/", headers=seed["headers"])
+    assert r.status_code == 200
+    assert len(hits) == 1
+
+    with _count_selects("organizationmember") as hits, _count_selects("user") as user_hits:
+        r = client.get("/api/claims/", headers=seed["headers"])
+    assert r.status_code == 200
+    assert hits == [] and user_hits == []
+
+
+def test_role_change_invalidates_cache(seed, session):
+    deal_id = seed["deal"].id
+    assert client.post(f"/api/deals/{deal_id}/archive", headers=seed["headers"]).status_code == 200
+
+    m = session.exec(select(OrganizationMember).where(OrganizationMember.user_id == seed["user"].id)).one()
+    m.role = "viewer"
+    session.add(m); session.commit()
+
+    r = client.post(f"/api/deals/{deal_id}/unarchive", headers=seed["headers"])
+    assert r.status_code == 403
@@ -0,0 +1,102 @@
+from datetime import date
+
+from fastapi.testclient import TestClient
+from sqlmodel import select
+
+from app import blobstore
+from app.main import app
+from app.models import Deliverable, Proof, ProofBlob
+
+client = TestClient(app)
+
+
+def _deliverables(seed, session, n):
+    ds = [Deliverable(deal_id=seed["deal"].id, title=f"D{i}", type="post", due_date=date.today()) for i in range(n)]
+    session.add_all(ds); session.commit()
+    for d in ds:
+        session.refresh(d)
+    return ds
+
+
+def test_duplicate_uploads_share_one_blob_until_gc(seed, session):
+    content = b"%PDF-1.4 recap deck " + bytes(range(256)) * 8
+    paths = []
+    for d in _deliverables(seed, session, 2):
+        r = client.post(f"/api/deals/deliverables/{d.id}/proofs/upload", headers=seed["headers"],
+                        files={"file": ("recap.pdf", content, "application/pdf")})
+        assert r.status_code == 200
+        paths.append(r.json()["file_path"])
+    assert paths[0] == paths[1]
+    sha = paths[0].rsplit("/", 1)[-1]
+    assert session.get(ProofBlob, sha).refcount == 2
+
+    for p in session.exec(select(Proof)).all():
+        session.delete(p)
+        session.commit()
+    session.expire_all()
+    assert session.get(ProofBlob, sha).refcount == 0
+
+    blob = blobstore.UPLOAD_ROOT / paths[0]
+    assert blobstore.collect_garbage(session, grace_sec=3600) == 0  # recently touched
+    assert blob.exists()
+    assert blobstore.collect_garbage(session, grace_sec=-1) >= 1  # plus files left by other tests
+    assert not blob.exists()
+    assert session.get(ProofBlob, sha) is None
+
+
+def test_backfill_moves_legacy_files_into_the_store(seed, session):
+    d1, d2 = _deliverables(seed, session, 2)
+    legacy = []
+    for d in (d1, d2):
+        path = blobstore.UPLOAD_ROOT / str(d.id) / "20260101000000_old.png"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"\x89PNG same bytes")
+        legacy.append(path)
+        session.add(Proof(deliverable_id=d.id, kind="file", file_path=f"{d.id}/{path.name}", file_name="old.png"))
+    session.add(Proof(deliverable_id=d1.id, kind="file", file_path=f"{d1.id}/gone.png"))
+    session.commit()
+
+    assert blobstore.backfill(session) == (2, 1)
+
+    proofs = session.exec(select(Proof).where(Proof.file_path.like("blobs/%"))).all()
+    assert len(proofs) == 2 and proofs[0].file_path == proofs[1].file_path
+    assert session.get(ProofBlob, proofs[0].sha256).refcount == 2
+    assert (blobstore.UPLOAD_ROOT / proofs[0].file_path).read_bytes() == b"\x89PNG same bytes"
+    assert not any(p.exists() for p in legacy)
+    assert blobstore.backfill(session) == (0, 1)
+
+
+def test_gc_racing_a_dedup_upload_keeps_the_file(seed, session, monkeypatch):
+    import os
+    import threading
+    from app.storage import get_storage
+
+    content = b"%PDF-1.4 reused creative " * 64
+    d, = _deliverables(seed, session, 1)
+    r = client.post(f"/api/deals/deliverables/{d.id}/proofs/upload", headers=seed["headers"],
+                    files={"file": ("a.pdf", content, "application/pdf")})
+    rel = r.json()["file_path"]
+    sha = rel.rsplit("/", 1)[-1]
+    session.delete(session.get(Proof, r.json()["id"])); session.commit()
+
+    # the upload of the same content arrives just as the collector deletes the file
+    storage = get_storage()
+    remove, uploads = storage.delete, []
+    def upload_then_delete(key):
+        if key == rel and not uploads:
+            uploads.append(threading.Thread(target=lambda: client.post(
+                f"/api/deals/deliverables/{d.id}/proofs/upload", headers=seed["headers"],
+                files={"file": ("b.pdf", content, "application/pdf")})))
+            uploads[0].start()
+            uploads[0].join(0.3)  # it touches the blob, then waits for the collector's claim
+        remove(key)
+    monkeypatch.setattr(storage, "delete", upload_then_delete)
+
+    old = os.path.getmtime(blobstore.UPLOAD_ROOT / rel) - 120
+    os.utime(blobstore.UPLOAD_ROOT / rel, (old, old))
+    blobstore.collect_garbage(session, grace_sec=60)  # the upload's fresh scratch file stays
+    uploads[0].join()
+    session.expire_all()
+    proof = session.exec(select(Proof).where(Proof.deliverable_id == d.id)).one()
+    assert proof.file_path == rel and (blobstore.UPLOAD_ROOT / rel).read_bytes() == content
+    assert session.get(ProofBlob, sha).refcount == 1
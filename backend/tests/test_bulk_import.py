@@ -0,0 +1,78 @@
+import json
+
+from fastapi.testclient import TestClient
+from sqlmodel import select
+
+from app import bulk_import
+from app.main import app
+from app.models import Activity, Deal, Deliverable, Sponsor
+
+client = TestClient(app)
+
+
+def _import(seed, kind, body, content_type="text/csv"):
+    r = client.post(f"/api/import/{kind}", content=body,
+                    headers={**seed["headers"], "Content-Type": content_type})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_import_sponsors_deals_and_deliverables(seed, session):
+    report = _import(seed, "sponsors", "name,contact_email\nNorthwind,ops@northwind.test\nACME,\n,x@y.z\n")
+    assert report | {"errors": []} == {"kind": "sponsors", "rows": 3, "created": 1, "skipped": 1, "failed": 1, "errors": []}
+    assert report["errors"][0]["line"] == 4
+
+    deals = ("sponsor,name,start_date,end_date,total_value\n"
+             "Northwind,Spring,2026-03-01,2026-05-31,12000\n"
+             "ACME,Spring,2026-03-01,2026-05-31,\n"
+             "Nobody,Spring,2026-03-01,2026-05-31,\n"
+             "ACME,Summer,not-a-date,2026-08-31,\n")
+    report = _import(seed, "deals", deals)
+    assert (report["created"], report["failed"]) == (2, 2)
+    assert [e["line"] for e in report["errors"]] == [4, 5]
+    assert "start_date" in report["errors"][1]["error"]
+
+    rows = [{"sponsor": "Northwind", "deal": "Spring", "title": f"Post {i}", "type": "post", "due_date": "2026-04-01"}
+            for i in range(5)]
+    rows += [{"deal": "Spring", "title": "Ambiguous", "type": "post", "due_date": "2026-04-01"},
+             {"deal_id": seed["deal"].id, "title": "Launch post", "type": "story", "due_date": "2026-04-02",
+              "guaranteed": True}]
+    body = "\n".join(map(json.dumps, rows)) + "\nnot json\n"
+    report = _import(seed, "deliverables", body, "application/x-ndjson")
+    assert (report["rows"], report["created"], report["failed"]) == (8, 6, 2)
+    assert "ambiguous" in report["errors"][0]["error"]
+
+    northwind = session.exec(select(Sponsor).where(Sponsor.name == "Northwind")).one()
+    spring = session.exec(select(Deal).where(Deal.sponsor_id == northwind.id)).one()
+    assert spring.portal_token and spring.organization_id == seed["org"].id
+    assert len(session.exec(select(Deliverable).where(Deliverable.deal_id == spring.id)).all()) == 5
+    assert session.exec(select(Deliverable).where(Deliverable.title == "Launch post")).one().guaranteed
+    assert len(session.exec(select(Activity).where(Activity.action == "imported")).all()) == 3
+
+    # re-running is idempotent
+    assert _import(seed, "deliverables", body, "application/x-ndjson")["skipped"] == 6
+
+
+def test_large_import_is_batched(seed, session, monkeypatch):
+    monkeypatch.setattr(bulk_import, "BATCH", 500)
+    lines = ["title,type,due_date,deal_id"] + [f"Post {i},post,2026-04-01,{seed['deal'].id}" for i in range(5000)]
+    report = bulk_import.run(session, seed["org"].id, "deliverables", (l + "\n" for l in lines), "csv")
+    assert report["created"] == 5000 and report["failed"] == 0
+    assert client.post("/api/import/widgets", content="", headers=seed["headers"]).status_code == 404
+
+
+def test_row_rejected_by_the_database_does_not_skip_its_copies(seed, session, monkeypatch):
+    from sqlalchemy.exc import OperationalError
+
+    insert, calls = bulk_import.Importer._insert, []
+    def flaky(self, rows):
+        calls.append(len(rows))
+        if len(calls) <= 2:  # the batch insert and the per-row retry of the first row
+            raise OperationalError("INSERT", {}, Exception("database is locked"))
+        insert(self, rows)
+    monkeypatch.setattr(bulk_import.Importer, "_insert", flaky)
+
+    lines = ["name\n", "Northwind\n", "Northwind\n"]
+    report = bulk_import.run(session, seed["org"].id, "sponsors", iter(lines), "csv", batch_size=1)
+    assert (report["created"], report["skipped"], report["failed"]) == (1, 0, 1)
+    assert session.exec(select(Sponsor).where(Sponsor.name == "Northwind")).one()
@@ -0,0 +1,79 @@
+import io
+import json
+import zipfile
+from datetime import date
+
+from fastapi.testclient import TestClient
+
+from app import org_export
+from app.main import app
+from app.models import Deliverable, Organization, Sponsor
+
+client = TestClient(app)
+
+
+def _ndjson(z, name):
+    return [json.loads(line) for line in z.read(name).decode().splitlines()]
+
+
+def test_org_export_streams_ndjson_members(seed, session):
+    other = Organization(name="Other Org")
+    session.add(other); session.commit(); session.refresh(other)
+    session.add(Sponsor(organization_id=other.id, name="Not ours"))
+    session.add_all([Deliverable(deal_id=seed["deal"].id, title=f"Post {i}", type="post", due_date=date.today())
+                     for i in range(3)])
+    session.commit()
+
+    r = client.get("/api/export/org.zip", headers=seed["headers"])
+    assert r.status_code == 200 and r.headers["content-type"] == "application/zip"
+    z = zipfile.ZipFile(io.BytesIO(r.content))
+    assert json.loads(z.read("export.json"))["organization_id"] == seed["org"].id
+    assert [s["name"] for s in _ndjson(z, "sponsors.ndjson")] == ["ACME"]
+    assert [d["title"] for d in _ndjson(z, "deliverables.ndjson")] == ["Post 0", "Post 1", "Post 2"]
+    assert [u["email"] for u in _ndjson(z, "users.ndjson")] == ["manager@test.local"]
+    assert _ndjson(z, "claims.ndjson") == []
+
+
+def test_org_export_flushes_while_reading(seed, session, monkeypatch):
+    session.add_all([Deliverable(deal_id=seed["deal"].id, title=f"Post {i} " + "x" * (i % 97), type="post",
+                                 due_date=date.today()) for i in range(2000)])
+    session.commit()
+    monkeypatch.setattr(org_export, "FLUSH_BYTES", 4096)
+    monkeypatch.setattr(org_export, "YIELD_PER", 100)
+
+    chunks = list(org_export.stream_org_zip(session, seed["org"].id))
+    assert len(chunks) > 3 and max(len(c) for c in chunks) < 4096 + 64 * 1024
+    z = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    assert len(_ndjson(z, "deliverables.ndjson")) == 2000
+
+
+def test_delta_export_returns_only_changed_rows(seed, session):
+    from datetime import datetime
+    from app.models import OrganizationMember, User
+
+    old = Deliverable(deal_id=seed["deal"].id, title="Old", type="post", due_date=date.today())
+    archived = Deliverable(deal_id=seed["deal"].id, title="Archived later", type="post", due_date=date.today())
+    session.add_all([old, archived]); session.commit()
+
+    full = zipfile.ZipFile(io.BytesIO(client.get("/api/export/org.zip", headers=seed["headers"]).content))
+    cursor = json.loads(full.read("export.json"))["cursor"]
+    assert len(_ndjson(full, "deliverables.ndjson")) == 2
+
+    # timestamps do not matter, only the order of commits
+    archived.archived_at = datetime.utcnow()
+    archived.updated_at = datetime(2020, 1, 1)
+    colleague = User(email="new@test.local", hashed_password="x", updated_at=datetime(2020, 1, 1))
+    session.add_all([archived, colleague]); session.commit()
+    session.add(OrganizationMember(organization_id=seed["org"].id, user_id=colleague.id, role="viewer",
+                                   updated_at=datetime(2020, 1, 1)))
+    session.commit()
+
+    r = client.get("/api/export/delta.zip", params={"since": cursor}, headers=seed["headers"])
+    assert r.status_code == 200
+    z = zipfile.ZipFile(io.BytesIO(r.content))
+    meta = json.loads(z.read("export.json"))
+    assert meta["delta"] and meta["cursor"] != cursor
+    assert [d["title"] for d in _ndjson(z, "deliverables.ndjson")] == ["Archived later"]
+    assert [u["email"] for u in _ndjson(z, "users.ndjson")] == ["new@test.local"]
+    assert _ndjson(z, "sponsors.ndjson") == [] and _ndjson(z, "deals.ndjson") == []
+    assert client.get("/api/export/delta.zip", params={"since": "garbage!"}, headers=seed["headers"]).status_code == 400
@@ -0,0 +1,119 @@
+import io
+import json
+import zipfile
+from datetime import date
+
+from fastapi.testclient import TestClient
+
+from app import export_jobs
+from app.main import app
+from app.models import Deliverable, ExportJob
+from app.storage import get_storage
+
+client = TestClient(app)
+
+
+def _upload(seed, session, name, content):
+    d = Deliverable(deal_id=seed["deal"].id, title=name, type="post", due_date=date.today())
+    session.add(d); session.commit(); session.refresh(d)
+    r = client.post(f"/api/deals/deliverables/{d.id}/proofs/upload", headers=seed["headers"],
+                    files={"file": (name, content, "application/pdf")})
+    assert r.status_code == 200
+    return r.json()
+
+
+def _export(seed):
+    r = client.post("/api/export/jobs", headers=seed["headers"])
+    assert r.status_code == 202
+    job = client.get(f"/api/export/jobs/{r.json()['id']}", headers=seed["headers"]).json()
+    assert job["status"] == "done", job
+    return job
+
+
+def test_export_job_bundles_rows_and_proof_files(seed, session):
+    first = _upload(seed, session, "a.pdf", b"%PDF-1.4 first " * 100)
+    job = _export(seed)
+    assert job["progress_done"] == job["progress_total"] == 10 + 1
+    url = f"/api/export/jobs/{job['id']}/download"
+    r = client.get(url, headers=seed["headers"])
+    assert r.status_code == 200 and r.headers["content-type"] == "application/zip"
+    z = zipfile.ZipFile(io.BytesIO(r.content))
+    assert z.read(f"files/{first['file_path']}") == b"%PDF-1.4 first " * 100
+    assert json.loads(z.read("export.json"))["files"] == 1
+    assert [p["id"] for p in map(json.loads, z.read("proofs.ndjson").splitlines())] == [first["id"]]
+
+    part = client.get(url, headers={**seed["headers"], "Range": "bytes=0-3"})
+    assert part.status_code == 206 and part.content == b"PK\x03\x04"
+
+    second = _upload(seed, session, "b.pdf", b"%PDF-1.4 second " * 100)
+    again = _export(seed)
+    z = zipfile.ZipFile(io.BytesIO(client.get(f"/api/export/jobs/{again['id']}/download", headers=seed["headers"]).content))
+    assert z.read(f"files/{second['file_path']}") == b"%PDF-1.4 second " * 100
+    assert z.read(f"files/{first['file_path']}") == b"%PDF-1.4 first " * 100
+
+
+def test_old_artifacts_are_pruned(seed, session, monkeypatch):
+    monkeypatch.setattr(export_jobs, "KEEP", 1)
+    old, new = _export(seed), _export(seed)
+    assert client.get(f"/api/export/jobs/{old['id']}", headers=seed["headers"]).json()["status"] == "expired"
+    assert client.get(f"/api/export/jobs/{old['id']}/download", headers=seed["headers"]).status_code == 404
+    assert not get_storage().exists(f"exports/{seed['org'].id}/{old['id']}-1.zip")
+    assert session.get(ExportJob, new["id"]).artifact_key
+
+
+def test_running_export_is_not_downloadable_or_duplicated(seed, session):
+    job = ExportJob(organization_id=seed["org"].id, status="running")
+    session.add(job); session.commit(); session.refresh(job)
+    assert client.post("/api/export/jobs", headers=seed["headers"]).json()["id"] == job.id
+    assert client.get(f"/api/export/jobs/{job.id}/download", headers=seed["headers"]).status_code == 409
+
+
+def test_one_active_export_per_org(seed, session, monkeypatch):
+    import pytest
+    from sqlalchemy.exc import IntegrityError
+
+    queued = ExportJob(organization_id=seed["org"].id, status="queued")
+    session.add(queued); session.commit(); session.refresh(queued)
+    session.add(ExportJob(organization_id=seed["org"].id, status="running"))
+    with pytest.raises(IntegrityError):
+        session.commit()
+    session.rollback()
+
+    # a request that checked before the other one committed gets the other's job
+    active, misses = export_jobs._active, [None]
+    monkeypatch.setattr(export_jobs, "_active", lambda s, org_id: misses.pop() if misses else active(s, org_id))
+    assert export_jobs.create(session, seed["org"].id, None).id == queued.id
+
+
+def test_export_of_a_dead_worker_is_requeued(seed, session):
+    from datetime import datetime, timedelta
+
+    stale = datetime.utcnow() - timedelta(seconds=export_jobs.STALE_SEC + 1)
+    job = ExportJob(organization_id=seed["org"].id, status="running", attempts=1, updated_at=stale)
+    session.add(job); session.commit(); session.refresh(job)
+    r = client.post("/api/export/jobs", headers=seed["headers"])
+    assert r.json()["id"] == job.id and r.json()["status"] == "done" and r.json()["attempts"] == 2
+
+    gone = ExportJob(organization_id=seed["org"].id, status="running", attempts=export_jobs.MAX_ATTEMPTS,
+                     updated_at=stale)
+    session.add(gone); session.commit(); session.refresh(gone)
+    assert export_jobs.sweep() == 0
+    session.refresh(gone)
+    assert gone.status == "failed" and gone.error == "interrupted"
+
+
+def test_superseded_run_stops_without_touching_the_job(seed, session):
+    import pytest
+    from sqlmodel import update
+
+    job = ExportJob(organization_id=seed["org"].id)
+    session.add(job); session.commit(); session.refresh(job)
+    assert export_jobs._claim(job.id) == 1
+    # the first worker stalls past STALE_SEC; the job is re-queued and claimed again
+    session.exec(update(ExportJob).where(ExportJob.id == job.id).values(status="queued")); session.commit()
+    assert export_jobs._claim(job.id) == 2
+
+    with pytest.raises(export_jobs.JobLost):
+        export_jobs._build(session, session.get(ExportJob, job.id), 1)
+    session.refresh(job)
+    assert (job.status, job.attempts, job.artifact_key) == ("running", 2, None)
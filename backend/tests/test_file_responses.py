@@ -0,0 +1,58 @@
+from datetime import date
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models import Deliverable
+from app.querystats import query_budget
+
+client = TestClient(app)
+
+CONTENT = bytes(range(256)) * 64  # 16 KiB
+
+
+def _uploaded_proof(seed, session):
+    d = Deliverable(deal_id=seed["deal"].id, title="Reel", type="video", due_date=date.today())
+    session.add(d); session.commit(); session.refresh(d)
+    r = client.post(f"/api/deals/deliverables/{d.id}/proofs/upload", headers=seed["headers"],
+                    files={"file": ("reel.mp4", CONTENT, "video/mp4")})
+    assert r.status_code == 200
+    return r.json()
+
+
+def test_proof_download_validators_and_ranges(seed, session):
+    proof = _uploaded_proof(seed, session)
+    url = f"/api/uploads/proof/{proof['id']}"
+    params = {"deal_token": seed["deal"].portal_token}
+
+    with query_budget(1):
+        full = client.get(url, params=params)
+    assert full.status_code == 200 and full.content == CONTENT
+    assert full.headers["etag"] == f'"{proof["sha256"]}"'
+    assert full.headers["accept-ranges"] == "bytes"
+    assert "immutable" in full.headers["cache-control"]
+
+    assert client.get(url, params=params, headers={"If-None-Match": full.headers["etag"]}).status_code == 304
+    assert client.get(url, params=params, headers={"If-Modified-Since": full.headers["last-modified"]}).status_code == 304
+
+    part = client.get(url, params=params, headers={"Range": "bytes=1000-1999"})
+    assert part.status_code == 206 and part.content == CONTENT[1000:2000]
+    assert part.headers["content-range"] == f"bytes 1000-1999/{len(CONTENT)}"
+    assert client.get(url, params=params, headers={"Range": "bytes=-100"}).content == CONTENT[-100:]
+    assert client.get(url, params=params, headers={"Range": "bytes=16000-"}).content == CONTENT[16000:]
+    assert client.get(url, params=params, headers={"Range": "bytes=99999-"}).status_code == 416
+    stale = client.get(url, params=params, headers={"Range": "bytes=0-9", "If-Range": '"other"'})
+    assert stale.status_code == 200 and stale.content == CONTENT
+
+    assert client.get(url, params={"deal_token": "wrong"}).status_code == 404
+    assert client.get(url, headers=seed["headers"], params={}).content == CONTENT
+
+
+def test_offload_hands_the_body_to_the_proxy(seed, session, monkeypatch):
+    from app import file_responses
+    proof = _uploaded_proof(seed, session)
+    monkeypatch.setattr(file_responses, "OFFLOAD", "x-accel")
+    r = client.get(f"/api/uploads/proof/{proof['id']}", params={"deal_token": seed["deal"].portal_token})
+    assert r.status_code == 200 and r.content == b""
+    assert r.headers["x-accel-redirect"] == "/_proof_files/" + proof["file_path"]
+    assert r.headers["content-type"] == "video/mp4"
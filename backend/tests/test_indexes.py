@@ -0,0 +1,54 @@
+from pathlib import Path
+
+import sqlalchemy as sa
+from alembic import command
+from alembic.config import Config
+from sqlmodel import SQLModel, select
+
+from app.models import Ticket, Claim, Notification, Activity, Deliverable
+
+BACKEND = Path(__file__).resolve().parents[1]
+
+
+def _plan(session, stmt) -> str:
+    sql = str(stmt.compile(dialect=session.get_bind().dialect, compile_kwargs={"literal_binds": True}))
+    rows = session.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + sql).all()
+    return "\n".join(r[-1] for r in rows)
+
+
+def test_list_queries_use_composite_indexes(session):
+    cases = {
+        "ix_ticket_org_active_created":
+            select(Ticket).where(Ticket.organization_id == 1, Ticket.archived_at.is_(None)).order_by(Ticket.created_at.desc()),
+        "ix_claim_org_active_created":
+            select(Claim).where(Claim.organization_id == 1, Claim.archived_at.is_(None)).order_by(Claim.created_at.desc()),
+        "ix_notification_org_user_read_created":
+            select(Notification).where(Notification.organization_id == 1, Notification.user_id == 1,
+                                       Notification.is_read == False).order_by(Notification.created_at.desc()),
+        "ix_activity_org_deal_created":
+            select(Activity).where(Activity.organization_id == 1, Activity.deal_id == 1).order_by(Activity.created_at.desc()),
+        "ix_deliverable_deal_due":
+            select(Deliverable).where(Deliverable.deal_id == 1).order_by(Deliverable.due_date.asc()),
+    }
+    for index, stmt in cases.items():
+        plan = _plan(session, stmt.limit(200))
+        assert index in plan, plan
+        assert "TEMP B-TREE" not in plan, plan
+
+
+def test_migration_adds_indexes_to_existing_tables(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'legacy.db'}"
+    eng = sa.create_engine(url)
+    SQLModel.metadata.create_all(eng)
+    with eng.begin() as conn:
+        for name in ("ix_ticket_org_active_created", "ix_deliverable_deal_due"):
+            conn.exec_driver_sql(f"DROP INDEX {name}")
+
+    monkeypatch.setenv("SPONSOR_OPS_DATABASE_URL", url)
+    cfg = Config(str(BACKEND / "alembic.ini"))
+    cfg.set_main_option("script_location", str(BACKEND / "alembic"))
+    command.upgrade(cfg, "head")
+
+    insp = sa.inspect(eng)
+    assert "ix_ticket_org_active_created" in {ix["name"] for ix in insp.get_indexes("ticket")}
+    assert "ix_deliverable_deal_due" in {ix["name"] for ix in insp.get_indexes("deliverable")}
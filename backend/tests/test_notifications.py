@@ -0,0 +1,118 @@
+from datetime import date, timedelta
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app.db import engine
+from app.main import app
+from app.models import Deliverable, Notification
+from app.services import sync_notifications_for_org
+
+client = TestClient(app)
+
+
+def test_sync_notifies_each_due_deliverable_once(seed, session):
+    today = date.today()
+    deal = seed["deal"]
+    late, soon, later, done = (
+        Deliverable(deal_id=deal.id, title="Late post", type="post", due_date=today - timedelta(days=2)),
+        Deliverable(deal_id=deal.id, title="Soon post", type="post", due_date=today + timedelta(days=1)),
+        Deliverable(deal_id=deal.id, title="Later post", type="post", due_date=today + timedelta(days=20)),
+        Deliverable(deal_id=deal.id, title="Done post", type="post", due_date=today, status="delivered"),
+    )
+    session.add_all([late, soon, later, done]); session.commit()
+
+    r = client.post("/api/notifications/sync", headers=seed["headers"])
+    assert r.status_code == 200 and r.json() == {"created": 2}
+    notes = {n.kind: n for n in session.exec(select(Notification)).all()}
+    assert notes["overdue"].title == "Overdue: Late post"
+    assert notes["overdue"].body == f"Deliverable #{late.id} overdue (due {late.due_date})."
+    assert notes["overdue"].dedupe_key == f"overdue:{late.id}:{late.due_date}"
+    assert notes["due_soon"].body == f"Deliverable #{soon.id} due {soon.due_date}."
+    assert notes["due_soon"].link == f"/deals/{deal.id}" and not notes["due_soon"].is_read
+
+    # read notifications are not repeated; a moved due date is news
+    notes["overdue"].is_read = True
+    session.add(notes["overdue"]); session.commit()
+    assert sync_notifications_for_org(session, seed["org"].id, seed["user"].id) == {"created": 0}
+    soon.due_date = today + timedelta(days=2)
+    session.add(soon); session.commit()
+    assert sync_notifications_for_org(session, seed["org"].id, seed["user"].id) == {"created": 1}
+
+
+def test_scheduler_lease_has_one_holder_until_it_expires(session):
+    from app import scheduler
+
+    assert scheduler.acquire(session, "job", "a", lease_sec=60)
+    assert not scheduler.acquire(session, "job", "b", lease_sec=60)
+    assert scheduler.acquire(session, "job", "a", lease_sec=-1)  # renewing, but already expired
+    assert scheduler.acquire(session, "job", "b", lease_sec=60)
+    scheduler.release(session, "job", "b")
+    assert scheduler.acquire(session, "job", "a", lease_sec=60)
+
+
+def test_scheduler_notifies_every_member_of_every_org(seed, session, monkeypatch):
+    from app import scheduler
+    from app.models import Deal, Organization, OrganizationMember, Sponsor, User
+
+    today = date.today()
+    other = Organization(name="Other Org")
+    viewer = User(email="viewer@test.local", hashed_password="x")
+    session.add_all([other, viewer]); session.commit()
+    sponsor = Sponsor(organization_id=other.id, name="Globex")
+    session.add_all([sponsor, OrganizationMember(organization_id=seed["org"].id, user_id=viewer.id, role="viewer"),
+                     OrganizationMember(organization_id=other.id, user_id=viewer.id, role="viewer")])
+    session.commit()
+    deal = Deal(organization_id=other.id, sponsor_id=sponsor.id, name="Other", start_date=today, end_date=today)
+    session.add(deal); session.commit()
+    session.add_all([Deliverable(deal_id=seed["deal"].id, title="Late post", type="post", due_date=today - timedelta(days=1)),
+                     Deliverable(deal_id=deal.id, title="Soon post", type="post", due_date=today)])
+    session.commit()
+
+    assert scheduler.tick() == 3  # two members of the seed org, one of the other
+    assert scheduler.tick() == 0
+    assert {(n.organization_id, n.user_id, n.kind) for n in session.exec(select(Notification)).all()} == {
+        (seed["org"].id, seed["user"].id, "overdue"), (seed["org"].id, viewer.id, "overdue"),
+        (other.id, viewer.id, "due_soon")}
+
+    with Session(engine) as s:
+        assert not scheduler.acquire(s, scheduler.NOTIFICATIONS, "elsewhere")
+        scheduler.release(s, scheduler.NOTIFICATIONS)
+        assert scheduler.acquire(s, scheduler.NOTIFICATIONS, "elsewhere")
+    assert scheduler.tick() is None
+
+    monkeypatch.setattr(scheduler, "MODE", "thread")
+    r = client.post("/api/notifications/sync", headers=seed["headers"])
+    assert r.status_code == 200 and r.json() == {"created": 0}
+
+
+def test_unread_count_is_cached_until_notifications_change(seed, session, monkeypatch):
+    from app import unread_counts
+    from app.models import Notification
+
+    org_id, user_id = seed["org"].id, seed["user"].id
+    session.add_all([Notification(organization_id=org_id, user_id=user_id, kind="info", title=f"n{i}", body="")
+                     for i in range(3)])
+    session.commit()
+    url = "/api/notifications/unread-count"
+    assert client.get(url, headers=seed["headers"]).json() == {"unread": 3}
+
+    queries = []
+    real_count = unread_counts.select
+    monkeypatch.setattr(unread_counts, "select", lambda *a: queries.append(a) or real_count(*a))
+    assert client.get(url, headers=seed["headers"]).json() == {"unread": 3}
+    assert queries == []
+
+    first = session.exec(select(Notification.id).order_by(Notification.id)).first()
+    r = client.post("/api/notifications/mark-read", json={"ids": [first, first]}, headers=seed["headers"])
+    assert r.json() == {"ok": True, "updated": 1}
+    assert client.get(url, headers=seed["headers"]).json() == {"unread": 2}
+
+    session.add(Deliverable(deal_id=seed["deal"].id, title="Late post", type="post", due_date=date.today() - timedelta(days=1)))
+    session.commit()
+    assert client.post("/api/notifications/sync", headers=seed["headers"]).json() == {"created": 1}
+    assert client.get(url, headers=seed["headers"]).json() == {"unread": 3}
+
+    assert client.post("/api/notifications/mark-all-read", headers=seed["headers"]).json() == {"ok": True, "updated": 3}
+    assert client.get(url, headers=seed["headers"]).json() == {"unread": 0}
+    assert len(queries) == 3
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models import Sponsor, Ticket
+
+client = TestClient(app)
+
+
+def _pages(url, headers, **params):
+    pages, cursor = [], ""
+    while True:
+        r = client.get(url, headers=headers, params={**params, "cursor": cursor})
+        assert r.status_code == 200
+        pages.append(r.json()["items"])
+        cursor = r.json()["next_cursor"]
+        if not cursor:
+            return pages
+
+
+def test_tickets_page_by_created_at_then_id(seed, session):
+    t0 = datetime(2026, 1, 1)
+    # pairs of tickets share a timestamp so the id tie-break matters
+    session.add_all([Ticket(organization_id=seed["org"].id, sponsor_id=seed["sponsor"].id, subject=f"T{i}", body="",
+                            created_at=t0 + timedelta(minutes=i // 2)) for i in range(7)])
+    session.commit()
+
+    pages = _pages("/api/tickets", seed["headers"], limit=3)
+    assert [len(p) for p in pages] == [3, 3, 1]
+    rows = [t for p in pages for t in p]
+    assert [(t["created_at"], t["id"]) for t in rows] == sorted(((t["created_at"], t["id"]) for t in rows), reverse=True)
+    assert len({t["id"] for t in rows}) == 7
+
+    # without a cursor: the plain list, up to MAX_LIMIT rows unless limited
+    assert len(client.get("/api/tickets", headers=seed["headers"]).json()) == 7
+    assert len(client.get("/api/tickets", params={"limit": 2}, headers=seed["headers"]).json()) == 2
+    assert client.get("/api/tickets", params={"cursor": "garbage"}, headers=seed["headers"]).status_code == 400
+
+
+def test_sponsors_page_by_name(seed, session):
+    session.add_all([Sponsor(organization_id=seed["org"].id, name=n) for n in ["Zeta", "Beta", "Alpha"]])
+    session.commit()
+    pages = _pages("/api/sponsors", seed["headers"], limit=2)
+    assert [[s["name"] for s in p] for p in pages] == [["ACME", "Alpha"], ["Beta", "Zeta"]]
+
+
+def test_plain_lists_are_capped_at_max_limit(seed, session, monkeypatch):
+    from app import pagination
+    monkeypatch.setattr(pagination, "DEFAULT_LIMIT", 2)
+    monkeypatch.setattr(pagination, "MAX_LIMIT", 3)
+    session.add_all([Sponsor(organization_id=seed["org"].id, name=f"S{i}") for i in range(4)])
+    session.commit()
+    assert len(client.get("/api/sponsors", headers=seed["headers"]).json()) == 3
+    assert len(client.get("/api/sponsors", params={"limit": 1000}, headers=seed["headers"]).json()) == 3
+    first = client.get("/api/sponsors", params={"cursor": ""}, headers=seed["headers"]).json()
+    assert len(first["items"]) == 2 and first["next_cursor"]
+    assert sum(map(len, _pages("/api/sponsors", seed["headers"]))) == 5
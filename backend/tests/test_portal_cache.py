@@ -0,0 +1,110 @@
+from datetime import date
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models import Deliverable
+from app.querystats import query_budget
+
+client = TestClient(app)
+
+
+def test_deal_portal_snapshot_etag_and_invalidation(seed, session):
+    deal = seed["deal"]
+    d = Deliverable(deal_id=deal.id, title="Kickoff", type="post", due_date=date.today())
+    session.add(d); session.commit(); session.refresh(d)
+    url = f"/api/portal/deal/{deal.portal_token}"
+
+    first = client.get(url)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert [x["title"] for x in first.json()["deliverables"]] == ["Kickoff"]
+
+    with query_budget(2):  # one token lookup per request
+        assert client.get(url).headers["etag"] == etag
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    r = client.post(f"/api/portal/deliverables/{d.id}/comments",
+                    json={"deal_token": deal.portal_token, "body": "Looks good"})
+    assert r.status_code == 200
+
+    fresh = client.get(url, headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["etag"] != etag
+    assert [c["body"] for c in fresh.json()["comments"]] == ["Looks good"]
+
+
+def test_revoked_token_is_not_served_from_cache(seed, session):
+    deal = seed["deal"]
+    url = f"/api/portal/deal/{deal.portal_token}"
+    assert client.get(url).status_code == 200
+    deal.portal_token_revoked = True
+    session.add(deal); session.commit()
+    assert client.get(url).status_code == 404
+
+
+def test_token_revoked_by_another_worker_is_rejected_despite_the_cache(seed, session):
+    from sqlmodel import update
+    from app.models import Deal
+
+    deal = seed["deal"]
+    url = f"/api/portal/deal/{deal.portal_token}"
+    assert client.get(url).status_code == 200
+    # a Core UPDATE bypasses the commit hooks, like a write made in another process
+    session.exec(update(Deal).where(Deal.id == deal.id).values(portal_token_revoked=True))
+    session.commit()
+    assert client.get(url).status_code == 404
+
+
+def test_deal_portal_since_cursor_returns_only_changes(seed, session):
+    deal = seed["deal"]
+    old = Deliverable(deal_id=deal.id, title="Old", type="post", due_date=date.today())
+    session.add(old); session.commit(); session.refresh(old)
+    url = f"/api/portal/deal/{deal.portal_token}"
+
+    cursor = client.get(url).json()["cursor"]
+    new = Deliverable(deal_id=deal.id, title="New", type="post", due_date=date.today())
+    session.add(new); session.commit()
+    client.post(f"/api/portal/deliverables/{old.id}/comments", json={"deal_token": deal.portal_token, "body": "hi"})
+
+    delta = client.get(url, params={"since": cursor}).json()
+    assert delta["full"] is False and delta["deal"] is None
+    assert [d["title"] for d in delta["deliverables"]] == ["New"]
+    assert [c["body"] for c in delta["comments"]] == ["hi"]
+    assert delta["tickets"] == [] and delta["claims"] == []
+
+    again = client.get(url, params={"since": delta["cursor"]}).json()
+    assert again["deliverables"] == [] and again["comments"] == []
+
+    assert client.get(url, params={"since": "not-a-cursor"}).status_code == 400
+
+
+def test_deal_portal_since_cursor_keeps_rows_committed_late(seed, session):
+    from datetime import datetime, timedelta
+
+    deal = seed["deal"]
+    url = f"/api/portal/deal/{deal.portal_token}"
+    cursor = client.get(url).json()["cursor"]
+    # written by a slow transaction (or a node with a lagging clock): its timestamp
+    # predates the cursor, but it committed after it
+    late = Deliverable(deal_id=deal.id, title="Late", type="post", due_date=date.today(),
+                       created_at=datetime.utcnow() - timedelta(hours=1),
+                       updated_at=datetime.utcnow() - timedelta(hours=1))
+    session.add(late); session.commit()
+
+    delta = client.get(url, params={"since": cursor}).json()
+    assert [d["title"] for d in delta["deliverables"]] == ["Late"]
+
+
+def test_change_seq_is_taken_at_commit_not_at_flush(seed, session):
+    from app.db import committed_change_seq
+
+    before = committed_change_seq(session)
+    d = Deliverable(deal_id=seed["deal"].id, title="Flushed", type="post", due_date=date.today())
+    session.add(d); session.flush()
+    d.title = "Renamed"; session.flush()
+    assert committed_change_seq(session) == before  # the counter row is left alone until the commit
+    session.commit()
+    assert committed_change_seq(session) == before + 1 and d.change_seq == before + 1  # one number per transaction
+    session.commit()
+    assert committed_change_seq(session) == before + 1  # a transaction with nothing stamped takes none
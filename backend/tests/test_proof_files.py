@@ -0,0 +1,98 @@
+import hashlib
+from datetime import date
+
+from fastapi.testclient import TestClient
+
+from app import blobstore, proof_files
+from app.main import app
+from app.models import Deliverable
+
+client = TestClient(app)
+
+
+def _deliverable(seed, session):
+    d = Deliverable(deal_id=seed["deal"].id, title="Kickoff", type="post", due_date=date.today())
+    session.add(d); session.commit(); session.refresh(d)
+    return d
+
+
+def test_upload_streams_hashes_and_serves(seed, session, monkeypatch):
+    monkeypatch.setattr(proof_files, "CHUNK_SIZE", 1024)
+    d = _deliverable(seed, session)
+    content = b"%PDF-1.4\n" + b"x" * 5000
+
+    r = client.post(f"/api/deals/deliverables/{d.id}/proofs/upload", headers=seed["headers"],
+                    files={"file": ("../../report.pdf", content, "application/pdf")})
+    assert r.status_code == 200
+    proof = r.json()
+    assert proof["size_bytes"] == len(content)
+    assert proof["sha256"] == hashlib.sha256(content).hexdigest()
+    assert proof["file_name"] == "report.pdf"
+    assert proof["file_path"] == blobstore.rel_path(proof["sha256"])
+
+    r = client.get(f"/api/uploads/proof/{proof['id']}", params={"deal_token": seed["deal"].portal_token})
+    assert r.status_code == 200 and r.content == content
+
+
+def test_portal_upload_over_limit_leaves_nothing_behind(seed, session, monkeypatch):
+    monkeypatch.setattr(proof_files, "CHUNK_SIZE", 1024)
+    monkeypatch.setattr(proof_files, "MAX_UPLOAD_BYTES", 4096)
+    d = _deliverable(seed, session)
+    before = set(blobstore.BLOB_DIR.rglob("*"))
+
+    r = client.post(f"/api/portal/deliverables/{d.id}/proofs/upload",
+                    data={"deal_token": seed["deal"].portal_token},
+                    files={"file": ("clip.mp4", b"\0" * 5000, "video/mp4")})
+    assert r.status_code == 413
+    assert set(blobstore.BLOB_DIR.rglob("*")) == before
+
+    r = client.post(f"/api/portal/deliverables/{d.id}/proofs/upload",
+                    data={"deal_token": seed["deal"].portal_token},
+                    files={"file": ("clip.mp4", b"\0" * 4096, "video/mp4")})
+    assert r.status_code == 200
+    assert r.json()["file_path"].startswith("blobs/")
+
+
+def test_chunked_upload_without_content_length_is_cut_off_at_the_limit(seed, session, monkeypatch):
+    import asyncio
+    import pytest
+    from fastapi import HTTPException
+
+    monkeypatch.setattr(proof_files, "CHUNK_SIZE", 1024)
+    monkeypatch.setattr(proof_files, "MAX_UPLOAD_BYTES", 4096)
+    d = _deliverable(seed, session)
+    before = set(blobstore.BLOB_DIR.rglob("*"))
+    sent = []
+
+    def body():
+        head = (b'--b\r\nContent-Disposition: form-data; name="file"; filename="clip.mp4"\r\n'
+                b"Content-Type: video/mp4\r\n\r\n")
+        for chunk in [head] + [b"\0" * 1024] * 1000:  # ~1 MB, far over the limit
+            sent.append(len(chunk))
+            yield chunk
+        yield b"\r\n--b--\r\n"
+
+    headers = {"Content-Type": "multipart/form-data; boundary=b"}
+    r = client.post(f"/api/deals/deliverables/{d.id}/proofs/upload", content=body(),
+                    headers={**seed["headers"], **headers})
+    assert r.status_code == 413
+    assert set(blobstore.BLOB_DIR.rglob("*")) == before
+
+    class _ChunkedRequest:  # the test client buffers bodies; a server hands them over as they arrive
+        def __init__(self):
+            self.headers = {k.lower(): v for k, v in headers.items()}
+
+        async def stream(self):
+            for chunk in body():
+                yield chunk
+
+    async def receive():
+        async with proof_files.receive_upload(_ChunkedRequest()) as upload:
+            await upload.store()
+
+    sent.clear()
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(receive())
+    assert e.value.status_code == 413
+    assert sum(sent) < 8 * 1024  # stopped reading right after the limit
+    assert set(blobstore.BLOB_DIR.rglob("*")) == before
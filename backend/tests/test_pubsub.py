@@ -0,0 +1,71 @@
+import asyncio
+import json
+from datetime import date
+
+from sqlmodel import Session
+
+from app import pubsub
+from app.db import engine
+from app.models import Deliverable, DeliverableComment
+
+
+class _FakeRequest:
+    headers: dict = {}
+
+    async def is_disconnected(self):
+        return False
+
+
+def _add_comment(deliverable_id, body):
+    with Session(engine) as s:
+        s.add(DeliverableComment(deliverable_id=deliverable_id, author="sponsor", body=body))
+        s.commit()
+
+
+def test_stream_pushes_committed_comments_then_ends_when_access_is_lost(seed, session, monkeypatch):
+    monkeypatch.setattr(pubsub, "HEARTBEAT_SEC", 0.2)
+    d = Deliverable(deal_id=seed["deal"].id, title="Kickoff", type="post", due_date=date.today())
+    session.add(d); session.commit(); session.refresh(d)
+    _add_comment(d.id, "before")
+    access = {"ok": True}
+
+    def catch_up(after_id):
+        if not access["ok"]:
+            raise PermissionError
+        with Session(engine) as s:
+            rows = s.query(DeliverableComment).filter(DeliverableComment.id > after_id).all()
+            return [r.model_dump() for r in rows]
+
+    async def run():
+        seen = []
+        stream = pubsub._stream(_FakeRequest(), f"deliverable:{d.id}", "comment", catch_up, 0)
+        async for chunk in stream:
+            if chunk.startswith("id: "):
+                name = chunk.split("event: ", 1)[1].split("\n", 1)[0]
+                body = json.loads(chunk.split("data: ", 1)[1])["body"]
+                seen.append((name, body))
+                if body == "before":
+                    # committed from a worker thread, delivered through the broker
+                    await asyncio.to_thread(_add_comment, d.id, "pushed")
+                else:
+                    access["ok"] = False
+            elif chunk.startswith("event: end"):
+                seen.append(("end", None))
+        return seen
+
+    assert asyncio.run(run()) == [("comment", "before"), ("comment", "pushed"), ("end", None)]
+    assert pubsub.broker.subscriber_count() == 0
+
+
+def test_broker_overflow_resets_slow_subscriber():
+    async def run():
+        b = pubsub.Broker(queue_size=2)
+        sub = b.subscribe("t")
+        for i in range(5):
+            b.publish("t", {"id": i})
+        await asyncio.sleep(0)
+        assert sub.queue.get_nowait() is pubsub._OVERFLOW
+        b.unsubscribe(sub)
+        assert b.subscriber_count() == 0
+
+    asyncio.run(run())
@@ -0,0 +1,27 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.querystats import query_budget
+
+client = TestClient(app)
+
+
+def test_server_timing_header_reports_queries(seed):
+    r = client.get("/api/claims/", headers=seed["headers"])
+    assert r.status_code == 200
+    timing = r.headers["server-timing"]
+    assert timing.startswith("db;dur=") and "queries" in timing and "app;dur=" in timing
+
+
+def test_query_budget_fails_when_exceeded(seed):
+    with pytest.raises(AssertionError, match="query budget exceeded"):
+        with query_budget(0):
+            client.get("/api/claims/", headers=seed["headers"])
+
+
+def test_list_endpoints_stay_within_budget(seed):
+    with query_budget(3):
+        assert client.get("/api/claims/", headers=seed["headers"]).status_code == 200
+    with query_budget(3):
+        assert client.get("/api/tickets/", headers=seed["headers"]).status_code == 200
@@ -0,0 +1,74 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.ratelimit import MemoryTokenBuckets, SimpleRateLimitMiddleware
+
+
+def test_token_bucket_refills_and_evicts_idle_keys():
+    b = MemoryTokenBuckets(max_keys=100, idle_sec=10, sweep_interval_sec=0)
+    assert b.take(("1.1.1.1", "auth"), rate=1.0, capacity=2, now=0.0) == 0
+    assert b.take(("1.1.1.1", "auth"), rate=1.0, capacity=2, now=0.0) == 0
+    assert b.take(("1.1.1.1", "auth"), rate=1.0, capacity=2, now=0.0) > 0
+    assert b.take(("1.1.1.1", "auth"), rate=1.0, capacity=2, now=1.0) == 0
+
+    b.take(("2.2.2.2", "other"), rate=1.0, capacity=2, now=20.0)
+    assert list(b.buckets) == [("2.2.2.2", "other")]
+
+
+def test_token_bucket_caps_tracked_keys():
+    b = MemoryTokenBuckets(max_keys=3, idle_sec=1000, sweep_interval_sec=1000)
+    for i in range(10):
+        b.take((f"10.0.0.{i}", "other"), rate=1.0, capacity=5, now=float(i))
+    assert list(b.buckets) == [("10.0.0.7", "other"), ("10.0.0.8", "other"), ("10.0.0.9", "other")]
+
+
+def test_middleware_returns_429_per_group(monkeypatch):
+    monkeypatch.setenv("SPONSOR_OPS_RATE_LIMIT_ENABLED", "1")
+    monkeypatch.setenv("SPONSOR_OPS_RATE_LIMIT_REQUESTS_PER_MIN", "60")
+    monkeypatch.setenv("SPONSOR_OPS_RATE_LIMIT_BURST", "2")
+    app = FastAPI()
+    app.add_middleware(SimpleRateLimitMiddleware)
+
+    @app.get("/api/portal/ping")
+    def portal_ping():
+        return {"ok": True}
+
+    @app.get("/api/other")
+    def other():
+        return {"ok": True}
+
+    client = TestClient(app)
+    assert [client.get("/api/portal/ping").status_code for _ in range(3)] == [200, 200, 429]
+    r = client.get("/api/portal/ping")
+    assert r.status_code == 429 and int(r.headers["retry-after"]) >= 1
+    assert client.get("/api/other").status_code == 200
+
+
+def test_sqlite_buckets_share_budget_across_instances(tmp_path):
+    from app.ratelimit import SQLiteTokenBuckets
+
+    path = tmp_path / "rl.db"
+    a = SQLiteTokenBuckets(str(path), sweep_interval_sec=1000)
+    b = SQLiteTokenBuckets(str(path), sweep_interval_sec=1000)  # e.g. a second worker
+    key = ("1.1.1.1", "portal")
+    results = [store.take(key, rate=1.0, capacity=3, now=100.0) for store in (a, b, a, b)]
+    assert results[:3] == [0.0, 0.0, 0.0]
+    assert results[3] == 1.0
+    assert b.take(key, rate=1.0, capacity=3, now=101.0) == 0.0
+
+
+def test_sqlite_store_fails_open_quickly_when_locked(tmp_path):
+    import sqlite3
+    import time
+    from app.ratelimit import SQLiteTokenBuckets
+
+    store = SQLiteTokenBuckets(str(tmp_path / "rl.db"))
+    store.take(("1.1.1.1", "other"), 1.0, 1, 100.0)  # create the table
+    holder = sqlite3.connect(str(tmp_path / "rl.db"), isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")  # another worker holding the write lock
+    try:
+        t0 = time.perf_counter()
+        assert store.take(("1.1.1.1", "other"), 1.0, 1, 100.0) == 0.0  # would be limited; fails open
+        assert time.perf_counter() - t0 < 0.1  # the event loop is not stalled
+    finally:
+        holder.execute("ROLLBACK")
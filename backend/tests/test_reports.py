@@ -0,0 +1,83 @@
+from datetime import date
+
+from fastapi.testclient import TestClient
+
+from app import reporting
+from app.main import app
+from app.models import Deliverable, Proof
+
+client = TestClient(app)
+
+
+def test_deal_report_is_cached_until_the_deal_changes(seed, session, monkeypatch):
+    deal = seed["deal"]
+    ds = [Deliverable(deal_id=deal.id, title=f"Post {i}", type="post", due_date=date.today()) for i in range(3)]
+    session.add_all(ds); session.commit()
+    session.add_all([Proof(deliverable_id=ds[0].id, url="https://x.test/1"), Proof(deliverable_id=ds[0].id, url="https://x.test/2")])
+    session.commit()
+    assert [d["proofs"] for d in reporting.report_data(session, deal.id)["deliverables"]] == [2, 0, 0]
+
+    renders = []
+    real_render = reporting.render_pdf
+    monkeypatch.setattr(reporting, "render_pdf", lambda data: renders.append(data) or real_render(data))
+    url = f"/api/reports/deal/{deal.id}.pdf"
+
+    first = client.get(url, headers=seed["headers"])
+    assert first.status_code == 200 and first.content.startswith(b"%PDF")
+    assert client.get(url, headers=seed["headers"]).content == first.content
+    assert client.get(url, headers={**seed["headers"], "If-None-Match": first.headers["etag"]}).status_code == 304
+    assert len(renders) == 1
+
+    session.add(Proof(deliverable_id=ds[1].id, url="https://x.test/3")); session.commit()
+    second = client.get(url, headers=seed["headers"])
+    assert second.headers["etag"] != first.headers["etag"] and len(renders) == 2
+    assert [d["proofs"] for d in renders[-1]["deliverables"]] == [2, 1, 0]
+    assert len(list(reporting.CACHE_DIR.glob(f"{deal.id}-*.pdf"))) == 1
+
+    session.delete(session.get(Proof, 1)); session.commit()
+    assert client.get(url, headers=seed["headers"]).headers["etag"] != second.headers["etag"]
+
+
+def test_batch_reports_stream_a_zip_and_reuse_the_cache(seed, session, monkeypatch):
+    import io
+    import zipfile
+    from datetime import timedelta
+    from app import report_batch
+    from app.models import Deal
+
+    today = date.today()
+    draft = Deal(organization_id=seed["org"].id, sponsor_id=seed["sponsor"].id, name="Later", start_date=today,
+                 end_date=today + timedelta(days=10), status="draft")
+    session.add(draft); session.commit()
+    client.get(f"/api/reports/deal/{seed['deal'].id}.pdf", headers=seed["headers"])  # warm the cache
+
+    renders = []
+    real_render = reporting.render_pdf
+    monkeypatch.setattr(reporting, "render_pdf", lambda data: renders.append(data["deal"]["id"]) or real_render(data))
+    r = client.get("/api/reports/deals.zip", headers=seed["headers"])
+    assert r.status_code == 200
+    z = zipfile.ZipFile(io.BytesIO(r.content))
+    assert sorted(z.namelist()) == [f"deal_{seed['deal'].id}.pdf", f"deal_{draft.id}.pdf"]
+    assert all(z.read(n).startswith(b"%PDF") for n in z.namelist())
+    assert renders == [draft.id]
+
+    active = zipfile.ZipFile(io.BytesIO(client.get("/api/reports/deals.zip", params={"status": "active"},
+                                                   headers=seed["headers"]).content))
+    assert active.namelist() == [f"deal_{seed['deal'].id}.pdf"]
+    assert renders == [draft.id]
+
+
+def test_batch_reports_render_in_worker_processes(seed, session, monkeypatch):
+    import io
+    import zipfile
+    from app import report_batch
+
+    monkeypatch.setattr(report_batch, "WORKERS", 2)
+    monkeypatch.setattr(report_batch, "_pool", None)
+    monkeypatch.setattr(reporting, "CACHE_DIR", None)
+    try:
+        chunks = list(report_batch.stream_reports(session, [seed["deal"].id]))
+    finally:
+        report_batch._pool.shutdown()
+    z = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    assert z.read(f"deal_{seed['deal'].id}.pdf").startswith(b"%PDF")
@@ -0,0 +1,155 @@
+import io
+from datetime import date, datetime, timezone
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+from sqlmodel import select
+
+from app import blobstore, file_responses, storage, thumbnails
+from app.main import app
+from app.models import Deliverable, Proof
+
+client = TestClient(app)
+
+
+class _NotFound(Exception):
+    response = {"Error": {"Code": "404"}}
+
+
+class _Body:
+    def __init__(self, data):
+        self._data = data
+
+    def iter_chunks(self, size):
+        for i in range(0, len(self._data), size):
+            yield self._data[i:i + size]
+
+    def close(self):
+        pass
+
+
+class FakeS3:
+    """In-memory stand-in for the subset of the boto3 S3 client that S3Storage uses."""
+
+    def __init__(self):
+        self.objects = {}  # (bucket, key) -> (bytes, last_modified)
+
+    def _get(self, bucket, key):
+        if (bucket, key) not in self.objects:
+            raise _NotFound()
+        return self.objects[(bucket, key)]
+
+    def upload_fileobj(self, fileobj, bucket, key):
+        self.objects[(bucket, key)] = (fileobj.read(), datetime.now(timezone.utc))
+
+    def upload_file(self, filename, bucket, key):
+        with open(filename, "rb") as f:
+            self.upload_fileobj(f, bucket, key)
+
+    def download_file(self, bucket, key, filename):
+        with open(filename, "wb") as f:
+            f.write(self._get(bucket, key)[0])
+
+    def get_object(self, Bucket, Key, Range=None):
+        data = self._get(Bucket, Key)[0]
+        if Range:
+            start, _, end = Range.removeprefix("bytes=").partition("-")
+            data = data[int(start):int(end) + 1 if end else None]
+        return {"Body": _Body(data)}
+
+    def head_object(self, Bucket, Key):
+        data, modified = self._get(Bucket, Key)
+        return {"ContentLength": len(data), "LastModified": modified}
+
+    def copy_object(self, Bucket, Key, CopySource, MetadataDirective):
+        data, _ = self._get(CopySource["Bucket"], CopySource["Key"])
+        self.objects[(Bucket, Key)] = (data, datetime.now(timezone.utc))
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+    def list_objects_v2(self, Bucket, Prefix, ContinuationToken=None):
+        keys = sorted(k for b, k in self.objects if b == Bucket and k.startswith(Prefix))
+        start = int(ContinuationToken or 0)
+        page = keys[start:start + 2]  # tiny pages exercise pagination
+        return {
+            "Contents": [{"Key": k, "Size": len(self.objects[(Bucket, k)][0]),
+                          "LastModified": self.objects[(Bucket, k)][1]} for k in page],
+            "IsTruncated": start + 2 < len(keys),
+            "NextContinuationToken": str(start + 2),
+        }
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn):
+        return (f"https://s3.test/{Params['Bucket']}/{Params['Key']}?expires={ExpiresIn}"
+                f"&type={Params['ResponseContentType']}")
+
+
+@pytest.fixture
+def s3():
+    fake = FakeS3()
+    previous = storage.use_storage(storage.S3Storage(fake, "proofs", prefix="tenant-a"))
+    yield fake
+    storage.use_storage(previous)
+
+
+def _upload(seed, session, name, content, mime):
+    d = Deliverable(deal_id=seed["deal"].id, title="Post", type="post", due_date=date.today())
+    session.add(d); session.commit(); session.refresh(d)
+    r = client.post(f"/api/deals/deliverables/{d.id}/proofs/upload", headers=seed["headers"],
+                    files={"file": (name, content, mime)})
+    assert r.status_code == 200
+    return r.json()
+
+
+def test_s3_backend_stores_and_redirects_downloads(seed, session, s3):
+    content = bytes(range(256)) * 40
+    proof = _upload(seed, session, "clip.mp4", content, "video/mp4")
+    assert s3.objects[("proofs", "tenant-a/" + proof["file_path"])][0] == content
+    assert not (blobstore.UPLOAD_ROOT / proof["file_path"]).exists()
+
+    url = f"/api/uploads/proof/{proof['id']}"
+    params = {"deal_token": seed["deal"].portal_token}
+    r = client.get(url, params=params, follow_redirects=False)
+    assert r.status_code == 307
+    target = urlsplit(r.headers["location"])
+    assert target.path == f"/proofs/tenant-a/{proof['file_path']}"
+    assert parse_qs(target.query)["type"] == ["video/mp4"]
+    assert client.get(url, params={"deal_token": "wrong"}, follow_redirects=False).status_code == 404
+
+
+def test_s3_backend_can_proxy_ranges(seed, session, s3, monkeypatch):
+    content = bytes(range(256)) * 40
+    proof = _upload(seed, session, "clip.mp4", content, "video/mp4")
+    monkeypatch.setattr(file_responses, "PRESIGN_TTL_SEC", 0)
+    url = f"/api/uploads/proof/{proof['id']}"
+    params = {"deal_token": seed["deal"].portal_token}
+    full = client.get(url, params=params)
+    assert full.status_code == 200 and full.content == content
+    part = client.get(url, params=params, headers={"Range": "bytes=100-199"})
+    assert part.status_code == 206 and part.content == content[100:200]
+
+
+def test_s3_backend_thumbnails_and_gc(seed, session, s3):
+    buf = io.BytesIO()
+    Image.new("RGB", (800, 400), "navy").save(buf, "PNG")
+    proof = _upload(seed, session, "banner.png", buf.getvalue(), "image/png")
+    thumb = "tenant-a/" + thumbnails.thumb_key(proof["sha256"])
+    assert ("proofs", thumb) in s3.objects
+
+    for p in session.exec(select(Proof)).all():
+        session.delete(p)
+    session.commit()
+    assert blobstore.collect_garbage(session, grace_sec=-1) >= 1
+    assert ("proofs", "tenant-a/" + proof["file_path"]) not in s3.objects
+    assert ("proofs", thumb) not in s3.objects
+
+
+def test_backends_must_implement_the_whole_interface():
+    class Partial(storage.Storage):
+        def stat(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
@@ -0,0 +1,64 @@
+import io
+from datetime import date
+
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app import thumbnails
+from app.main import app
+from app.models import Deliverable
+from app.storage import get_storage
+
+client = TestClient(app)
+
+
+def _png(width, height):
+    buf = io.BytesIO()
+    Image.new("RGBA", (width, height), (200, 30, 30, 128)).save(buf, "PNG")
+    return buf.getvalue()
+
+
+def _upload(seed, session, name, content, mime):
+    d = Deliverable(deal_id=seed["deal"].id, title="Post", type="post", due_date=date.today())
+    session.add(d); session.commit(); session.refresh(d)
+    r = client.post(f"/api/deals/deliverables/{d.id}/proofs/upload", headers=seed["headers"],
+                    files={"file": (name, content, mime)})
+    assert r.status_code == 200
+    return r.json()
+
+
+def test_image_proof_gets_a_cached_thumbnail(seed, session):
+    proof = _upload(seed, session, "banner.png", _png(1600, 900), "image/png")
+    assert get_storage().exists(thumbnails.thumb_key(proof["sha256"]))  # rendered after commit
+
+    url = f"/api/uploads/proof/{proof['id']}/thumbnail"
+    params = {"deal_token": seed["deal"].portal_token}
+    r = client.get(url, params=params)
+    assert r.status_code == 200 and r.headers["content-type"] == "image/jpeg"
+    assert r.headers["content-disposition"].startswith("inline")
+    assert Image.open(io.BytesIO(r.content)).size == (400, 225)
+    assert client.get(url, params=params, headers={"If-None-Match": r.headers["etag"]}).status_code == 304
+    assert client.get(url, params={"deal_token": "nope"}).status_code == 404
+
+    # a missing thumbnail is rendered on demand
+    get_storage().delete(thumbnails.thumb_key(proof["sha256"]))
+    assert client.get(url, headers=seed["headers"]).status_code == 200
+
+
+def test_unsupported_proof_has_no_thumbnail(seed, session):
+    proof = _upload(seed, session, "clip.mp4", b"\0" * 64, "video/mp4")
+    r = client.get(f"/api/uploads/proof/{proof['id']}/thumbnail", headers=seed["headers"])
+    assert r.status_code == 404
+
+
+def test_render_runs_in_a_worker_process(tmp_path, monkeypatch):
+    src = tmp_path / "big.png"
+    src.write_bytes(_png(800, 800))
+    monkeypatch.setattr(thumbnails, "WORKERS", 1)
+    monkeypatch.setattr(thumbnails, "_pool", None)
+    pool = thumbnails._executor()
+    try:
+        assert pool.submit(thumbnails.render, str(src), "image/png", str(tmp_path / "t.jpg"), 64).result(timeout=60)
+    finally:
+        pool.shutdown()
+    assert Image.open(tmp_path / "t.jpg").size == (64, 64)
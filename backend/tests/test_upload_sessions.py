@@ -0,0 +1,112 @@
+import hashlib
+from datetime import date, datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+from app import upload_sessions
+from app.main import app
+from app.models import Deliverable, UploadSession
+
+client = TestClient(app)
+
+
+def _deliverable(seed, session, status="posted"):
+    d = Deliverable(deal_id=seed["deal"].id, title="Reel", type="video", due_date=date.today(), status=status)
+    session.add(d); session.commit(); session.refresh(d)
+    return d
+
+
+def test_portal_upload_resumes_from_last_offset(seed, session):
+    d = _deliverable(seed, session)
+    token = seed["deal"].portal_token
+    content = bytes(range(256)) * 40  # 10240 bytes
+    r = client.post("/api/uploads/sessions", json={"deliverable_id": d.id, "file_name": "reel.mp4",
+                                                   "mime_type": "video/mp4", "size_bytes": len(content),
+                                                   "deal_token": token})
+    assert r.status_code == 200
+    upload_id = r.json()["id"]
+    url = f"/api/uploads/sessions/{upload_id}"
+
+    assert client.put(url, params={"offset": 0}, content=content[:6000]).json()["offset"] == 6000
+    assert client.put(url, params={"offset": 8000}, content=content[8000:]).status_code == 409  # gap
+    assert client.post(f"{url}/complete", params={"deal_token": token}).status_code == 409  # incomplete
+    # resend an overlapping range after a "failure", then finish
+    assert client.get(url).json()["offset"] == 6000
+    assert client.put(url, params={"offset": 5000}, content=content[5000:]).json()["offset"] == len(content)
+    assert client.put(url, params={"offset": 0}, content=content + b"x").status_code == 400
+
+    assert client.post(f"{url}/complete").status_code == 401
+    r = client.post(f"{url}/complete", params={"deal_token": token})
+    assert r.status_code == 200
+    proof = r.json()
+    assert proof["sha256"] == hashlib.sha256(content).hexdigest()
+    assert proof["size_bytes"] == len(content) and proof["file_name"] == "reel.mp4"
+    assert client.get(f"/api/uploads/proof/{proof['id']}", params={"deal_token": token}).content == content
+    assert client.get(url).status_code == 404
+    # a retried completion returns the same proof instead of failing on the moved file
+    again = client.post(f"{url}/complete", params={"deal_token": token})
+    assert again.status_code == 200 and again.json()["id"] == proof["id"]
+    assert client.put(url, params={"offset": 0}, content=content).status_code == 404
+    assert not upload_sessions.path_for(upload_id).exists()
+    session.refresh(d)
+    assert d.status == "proofed"
+
+
+def test_internal_session_enforces_type_size_and_expiry(seed, session):
+    d = _deliverable(seed, session)
+    body = {"deliverable_id": d.id, "file_name": "reel.mp4", "mime_type": "video/mp4", "size_bytes": 10}
+    assert client.post("/api/uploads/sessions", json=body).status_code == 401
+    assert client.post("/api/uploads/sessions", headers=seed["headers"],
+                       json={**body, "mime_type": "text/html"}).status_code == 400
+    assert client.post("/api/uploads/sessions", headers=seed["headers"],
+                       json={**body, "size_bytes": 10**10}).status_code == 413
+
+    stale = client.post("/api/uploads/sessions", headers=seed["headers"], json=body).json()["id"]
+    row = session.get(UploadSession, stale)
+    row.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    session.add(row); session.commit()
+    assert client.get(f"/api/uploads/sessions/{stale}").status_code == 404
+
+    fresh = client.post("/api/uploads/sessions", headers=seed["headers"], json=body).json()["id"]
+    session.expire_all()
+    assert session.get(UploadSession, stale) is None
+    assert not upload_sessions.path_for(stale).exists()
+
+    client.put(f"/api/uploads/sessions/{fresh}", params={"offset": 0}, content=b"0123456789")
+    r = client.post(f"/api/uploads/sessions/{fresh}/complete", headers=seed["headers"])
+    assert r.status_code == 200 and r.json()["size_bytes"] == 10
+
+
+def test_dropped_connection_keeps_bytes_already_written(seed, session):
+    import asyncio
+    from starlette.requests import ClientDisconnect
+
+    class _DroppedRequest:
+        async def stream(self):
+            yield b"a" * 700
+            yield b"b" * 300
+            raise ClientDisconnect()
+
+    d = _deliverable(seed, session)
+    upload = upload_sessions.create(session, d.id, "internal", seed["user"].id, "reel.mp4", "video/mp4", 2000, None)
+    asyncio.run(upload_sessions.write_chunk(session, upload, 0, _DroppedRequest()))
+    assert upload.received_bytes == 1000
+    assert upload_sessions.path_for(upload.id).read_bytes() == b"a" * 700 + b"b" * 300
+
+
+def test_concurrent_completion_is_rejected(seed, session):
+    d = _deliverable(seed, session)
+    r = client.post("/api/uploads/sessions", headers=seed["headers"],
+                    json={"deliverable_id": d.id, "file_name": "a.pdf", "mime_type": "application/pdf", "size_bytes": 4})
+    url = f"/api/uploads/sessions/{r.json()['id']}"
+    client.put(url, params={"offset": 0}, content=b"%PDF")
+    upload = session.get(UploadSession, r.json()["id"])
+    upload.completed_at = datetime.utcnow()  # another request is hashing it right now
+    session.add(upload); session.commit()
+    r = client.post(f"{url}/complete", headers=seed["headers"])
+    assert r.status_code == 409 and "being completed" in r.json()["detail"]
+    # the claiming request never finished (its process died): the claim times out
+    upload.completed_at = datetime.utcnow() - upload_sessions.COMPLETE_TIMEOUT - timedelta(seconds=1)
+    session.add(upload); session.commit()
+    r = client.post(f"{url}/complete", headers=seed["headers"])
+    assert r.status_code == 200 and r.json()["size_bytes"] == 4
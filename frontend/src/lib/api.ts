@@ -37,6 +37,53 @@ async function request(path: string, opts: RequestInit = {}) {
   return res.json();
 }
 
+// Large proof files go through a resumable upload session (backend: app/upload_sessions.py):
+// chunks are PUT by offset, and after a failed chunk the upload continues from the offset
+// the server reports instead of starting over.
+const RESUMABLE_UPLOAD_MIN_BYTES = 8 * 1024 * 1024;
+const RESUMABLE_CHUNK_BYTES = 5 * 1024 * 1024;
+
+async function uploadResumable(deliverable_id: number, file: File, note: string, deal_token?: string) {
+  const portal = deal_token ? { "Authorization": "" } : {};
+  const s = await request("/api/uploads/sessions", {
+    method: "POST",
+    headers: portal,
+    body: JSON.stringify({ deliverable_id, file_name: file.name, mime_type: file.type, size_bytes: file.size, note, deal_token }),
+  });
+  let offset = 0;
+  let failures = 0;
+  while (offset < file.size) {
+    try {
+      const chunk = file.slice(offset, Math.min(offset + RESUMABLE_CHUNK_BYTES, file.size));
+      const r = await request(`/api/uploads/sessions/${s.id}?offset=${offset}`, {
+        method: "PUT", body: chunk, headers: { ...portal, "Content-Type": "application/octet-stream" },
+      });
+      offset = r.offset;
+      failures = 0;
+    } catch (e) {
+      if (++failures > 5) throw e;
+      await new Promise((resolve) => setTimeout(resolve, 1000 * failures));
+      try { offset = (await request(`/api/uploads/sessions/${s.id}`, { headers: portal })).offset; } catch {}
+    }
+  }
+  const q = deal_token ? `?deal_token=${encodeURIComponent(deal_token)}` : "";
+  return request(`/api/uploads/sessions/${s.id}/complete${q}`, { method: "POST", headers: portal });
+}
+
+// List endpoints page by keyset cursor (backend: app/pagination.py); without ?cursor= they
+// return at most one capped page, so whole lists are fetched page by page.
+async function requestAll(path: string, opts: RequestInit = {}) {
+  const items: any[] = [];
+  let cursor = "";
+  do {
+    const sep = path.includes("?") ? "&" : "?";
+    const page = await request(`${path}${sep}cursor=${encodeURIComponent(cursor)}`, opts);
+    items.push(...page.items);
+    cursor = page.next_cursor;
+  } while (cursor);
+  return items;
+}
+
 export const api = {
   // low-level helpers (keep a single request() implementation)
   get: (path: string) => request(path),
@@ -54,25 +101,26 @@ export const api = {
   updateOrg: (orgId: number, payload: any) => request(`/api/orgs/${orgId}`, { method: "PATCH", body: JSON.stringify(payload) }),
 
   // Sponsors are scoped to the user's current org (from the JWT). orgId is kept only for backwards compatibility in UI.
-  listSponsors: (_orgId?: number, include_archived: boolean = false) => request(`/api/sponsors?include_archived=${include_archived ? 1 : 0}`),
+  listSponsors: (_orgId?: number, include_archived: boolean = false) => requestAll(`/api/sponsors?include_archived=${include_archived ? 1 : 0}`),
   createSponsor: (organization_id: number, name: string, contact_email?: string) =>
     request("/api/sponsors", { method: "POST", body: JSON.stringify({ organization_id, name, contact_email }) }),
   updateSponsor: (sponsorId: number, payload: any) => request(`/api/sponsors/${sponsorId}`, { method: "PATCH", body: JSON.stringify(payload) }),
   archiveSponsor: (sponsorId: number) => request(`/api/sponsors/${sponsorId}/archive`, { method: "POST", body: JSON.stringify({}) }),
   restoreSponsor: (sponsorId: number) => request(`/api/sponsors/${sponsorId}/restore`, { method: "POST", body: JSON.stringify({}) }),
 
-  listDeals: (sponsorId: number, include_archived: boolean = false) => request(`/api/sponsors/${sponsorId}/deals?include_archived=${include_archived ? 1 : 0}`),
+  listDeals: (sponsorId: number, include_archived: boolean = false) => requestAll(`/api/sponsors/${sponsorId}/deals?include_archived=${include_archived ? 1 : 0}`),
   getSponsor: (sponsorId: number) => request(`/api/sponsors/${sponsorId}`),
   createDeal: (payload: any) => request("/api/deals", { method: "POST", body: JSON.stringify(payload) }),
 
   getDeal: (dealId: number) => request(`/api/deals/${dealId}`),
   updateDeal: (dealId: number, payload: any) => request(`/api/deals/${dealId}`, { method: "PATCH", body: JSON.stringify(payload) }),
-  listDeliverables: (dealId: number, include_archived: boolean = false) => request(`/api/deals/${dealId}/deliverables?include_archived=${include_archived ? 1 : 0}`),
+  listDeliverables: (dealId: number, include_archived: boolean = false) => requestAll(`/api/deals/${dealId}/deliverables?include_archived=${include_archived ? 1 : 0}`),
   createDeliverable: (dealId: number, payload: any) => request(`/api/deals/${dealId}/deliverables`, { method: "POST", body: JSON.stringify(payload) }),
   updateDeliverable: (deliverableId: number, payload: any) => request(`/api/deals/deliverables/${deliverableId}`, { method: "PATCH", body: JSON.stringify(payload) }),
   addProof: (deliverableId: number, payload: any) => request(`/api/deals/deliverables/${deliverableId}/proofs`, { method: "POST", body: JSON.stringify(payload) }),
-  listProofs: (deliverableId: number) => request(`/api/deals/deliverables/${deliverableId}/proofs`),
+  listProofs: (deliverableId: number) => requestAll(`/api/deals/deliverables/${deliverableId}/proofs`),
   uploadProofFile: (deliverableId: number, file: File, note: string) => {
+    if (file.size >= RESUMABLE_UPLOAD_MIN_BYTES) return uploadResumable(deliverableId, file, note);
     const fd = new FormData();
     fd.append("file", file);
     fd.append("note", note);
@@ -91,15 +139,17 @@ export const api = {
   listNotifications: (orgId: number) => request(`/api/notifications?org_id=${orgId}`),
   syncNotifications: (orgId: number) => request(`/api/notifications/sync?org_id=${orgId}`, { method: "POST", body: JSON.stringify({}) }),
   markNotificationsRead: (orgId: number, ids: number[]) => request(`/api/notifications/mark-read?org_id=${orgId}`, { method: "POST", body: JSON.stringify({ ids }) }),
+  unreadNotificationCount: () => request(`/api/notifications/unread-count`),
+  markAllNotificationsRead: () => request(`/api/notifications/mark-all-read`, { method: "POST", body: JSON.stringify({}) }),
 
-  listTickets: (orgId: number, include_archived: boolean = false) => request(`/api/tickets?org_id=${orgId}&include_archived=${include_archived ? 1 : 0}`),
+  listTickets: (orgId: number, include_archived: boolean = false) => requestAll(`/api/tickets?org_id=${orgId}&include_archived=${include_archived ? 1 : 0}`),
   getTicket: (id: number) => request(`/api/tickets/${id}`),
   replyTicket: (id: number, message: string) => request(`/api/tickets/${id}/reply`, { method: "POST", body: JSON.stringify({ message }) }),
   updateTicket: (id: number, payload: any) => request(`/api/tickets/${id}`, { method: "PATCH", body: JSON.stringify(payload) }),
   archiveTicket: (id: number) => request(`/api/tickets/${id}/archive`, { method: "POST", body: JSON.stringify({}) }),
   restoreTicket: (id: number) => request(`/api/tickets/${id}/restore`, { method: "POST", body: JSON.stringify({}) }),
 
-  listClaims: (orgId: number, include_archived: boolean = false) => request(`/api/claims?org_id=${orgId}&include_archived=${include_archived ? 1 : 0}`),
+  listClaims: (orgId: number, include_archived: boolean = false) => requestAll(`/api/claims?org_id=${orgId}&include_archived=${include_archived ? 1 : 0}`),
   updateClaim: (id: number, payload: any) => request(`/api/claims/${id}`, { method: "PATCH", body: JSON.stringify(payload) }),
   archiveClaim: (id: number) => request(`/api/claims/${id}/archive`, { method: "POST" }),
   restoreClaim: (id: number) => request(`/api/claims/${id}/restore`, { method: "POST" }),
@@ -133,6 +183,7 @@ export const api = {
     request(`/api/portal/deliverables/${deliverable_id}/proofs`, { method: "POST", body: JSON.stringify(payload), headers: { "Authorization": "" } }),
 
   uploadProofFilePortal: async (deliverable_id: number, file: File, note: string, deal_token: string) => {
+    if (file.size >= RESUMABLE_UPLOAD_MIN_BYTES) return uploadResumable(deliverable_id, file, note || "", deal_token);
     const fd = new FormData();
     fd.append("file", file);
     fd.append("note", note || "");